@@ -0,0 +1,294 @@
+"""
+Batch collaborative scoring: top-N picks for every member (or a filtered set) in one pass.
+
+Same signal as recommendation.recommend_books (loan = 5 points, view = 1, cosine similarity
+between members), computed for many members at once instead of refitting a model per member:
+
+    R  = members x books interaction matrix (sparse), R^ = R with L2-normalized rows
+    S  = R^[chunk] @ R^.T                -> cosine similarity of each member with every other one
+    W  = S keeping each row's BATCH_NEIGHBORS best (self excluded)
+    scores = W @ R                       -> neighbours' points, weighted by how similar they are
+    top-N of scores, minus what the member already borrowed / viewed
+
+Training reads the memory-mapped interaction snapshot (interaction_snapshot.py), appending only
+the loans / views added since the last run, instead of pulling every row out of Postgres.
+Chunks of members are scored in a process pool. The trained model is written to
+RECOMMENDER_MODEL_DIR as plain .npy arrays (transposed copy included), and pool workers
+memory-map them, so all processes share one copy through the page cache. Results replace the
+members' rows in member_recommendations, which /api/recommendations reads before falling back
+to the live model.
+
+Run it from cron (weekly newsletter, nightly refresh):
+
+    python batch_recommendation.py                  # every member with history
+    python batch_recommendation.py --active-only    # members with status 'Active'
+    python batch_recommendation.py --member-id 7 --member-id 42
+"""
+import argparse
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sqlalchemy import select, delete, insert
+
+from database import ReadSessionLocal, SessionLocal
+import models
+import interaction_snapshot
+
+RECOMMENDER_MODEL_DIR = os.getenv("RECOMMENDER_MODEL_DIR", "data/recommender")
+BATCH_TOP_N = 10              # Picks stored per member
+BATCH_NEIGHBORS = 3           # recommend_books looks at the 3 nearest members too
+BATCH_CHUNK_CELLS = 20_000_000  # Members per chunk = this / total members (dense similarity block, float32)
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+LOAN_POINTS, VIEW_POINTS = 5, 1
+MODEL_FILES = ("members", "books", "indptr", "indices", "data", "normalized", "t_indptr", "t_indices", "t_normalized")
+
+_model = None  # Per process: loaded once by the pool initializer
+
+
+# ==========================================
+# Training: interaction matrix -> .npy files
+# ==========================================
+
+def train(db=None):
+    """
+    Interaction matrix as {name: array} (CSR over sorted member / book ids); None without data.
+    Reads the memory-mapped interaction snapshot (loans, and the views of the last VIEW_WINDOW),
+    after appending what's new when given a session.
+    """
+    if db is not None:
+        interaction_snapshot.export(db, LOAN_POINTS, VIEW_POINTS)
+    columns = interaction_snapshot.load()
+    if columns is None:
+        return None
+    columns = interaction_snapshot.training_rows(columns)
+    if not len(columns["member_id"]):
+        return None
+    return build_model(columns["member_id"], columns["book_id"], columns["weight"])
+
+
+def build_model(member_ids, book_ids, points):
+    """Model arrays from one (member_id, book_id, points) triple per event; repeated pairs are summed"""
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+    members, member_rows = np.unique(member_ids, return_inverse=True)
+    books, book_columns = np.unique(book_ids, return_inverse=True)
+    matrix = sp.csr_matrix(
+        (np.asarray(points, dtype=np.float32), (member_rows, book_columns)), shape=(len(members), len(books))
+    )
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+    normalized = normalize(matrix).astype(np.float32)
+    # Books x members: right-hand side of every similarity product, stored so no process rebuilds it
+    transposed = normalized.T.tocsr()
+    transposed.sort_indices()
+    return {
+        "members": members, "books": books,
+        # scipy's own index dtype (int32 below 2**31 interactions): mapped back without a copy
+        "indptr": matrix.indptr, "indices": matrix.indices, "data": matrix.data, "normalized": normalized.data,
+        "t_indptr": transposed.indptr, "t_indices": transposed.indices, "t_normalized": transposed.data,
+    }
+
+
+def attach_matrices(model):
+    """Adds the CSR views scoring works on (no copies: they wrap the arrays, mapped or not)"""
+    import scipy.sparse as sp
+    shape = (len(model["members"]), len(model["books"]))
+    structure = (model["indices"], model["indptr"])
+    model["matrix"] = sp.csr_matrix((model["data"], *structure), shape=shape, copy=False)
+    model["matrix_normalized"] = sp.csr_matrix((model["normalized"], *structure), shape=shape, copy=False)
+    model["normalized_t"] = sp.csr_matrix(
+        (model["t_normalized"], model["t_indices"], model["t_indptr"]), shape=shape[::-1], copy=False
+    )
+    return model
+
+
+def save_model(model, model_dir=RECOMMENDER_MODEL_DIR):
+    """Writes a new version directory, then points CURRENT at it (readers never see half a model)"""
+    import numpy as np
+    version = f"model-{time.time_ns()}"
+    path = os.path.join(model_dir, version)
+    os.makedirs(path)
+    for name in MODEL_FILES:
+        np.save(os.path.join(path, f"{name}.npy"), model[name])
+    current = os.path.join(model_dir, "CURRENT")
+    with open(current + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(current + ".tmp", current)
+    # Keep the previous version: a process may still be mapping it
+    versions = sorted(d for d in os.listdir(model_dir) if d.startswith("model-"))
+    for old in versions[:-2]:
+        shutil.rmtree(os.path.join(model_dir, old), ignore_errors=True)
+    return path
+
+
+def load_model(model_dir=RECOMMENDER_MODEL_DIR, mmap=True):
+    """{name: array} plus the CSR matrices; None if no model was trained yet"""
+    import numpy as np
+    try:
+        with open(os.path.join(model_dir, "CURRENT")) as f:
+            path = os.path.join(model_dir, f.read().strip())
+    except FileNotFoundError:
+        return None
+    model = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in MODEL_FILES}
+    model["path"] = path
+    return attach_matrices(model)
+
+
+# ==========================================
+# Scoring (runs in pool workers)
+# ==========================================
+
+def _init_worker(model_dir):
+    global _model
+    _model = load_model(model_dir)
+
+
+def score_rows(model, rows, top_n=BATCH_TOP_N, neighbors=BATCH_NEIGHBORS):
+    """[(member_id, [(book_id, score), ...])] for the given member row numbers"""
+    import numpy as np
+    rows = np.asarray(rows)
+    picks = score_vectors(model, model["matrix"][rows], rows, top_n, neighbors)
+    return [(int(model["members"][r]), member_picks) for r, member_picks in zip(rows, picks)]
+
+
+def score_vectors(model, interactions, self_rows, top_n=BATCH_TOP_N, neighbors=BATCH_NEIGHBORS):
+    """
+    Picks for members given as interaction rows (CSR over the model's books).
+    self_rows: each member's own row in the model, excluded from its neighbours (-1 = none).
+    """
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+    matrix, normalized_t = model["matrix"], model["normalized_t"]
+    n, n_members = interactions.shape[0], matrix.shape[0]
+    self_rows = np.asarray(self_rows)
+
+    # 1. Similarity block (n x members), self excluded
+    similarity = (normalize(interactions) @ normalized_t).toarray()
+    own = self_rows >= 0
+    similarity[np.nonzero(own)[0], self_rows[own]] = 0
+    k = min(neighbors, n_members - 1 if own.any() else n_members)
+    if k <= 0:
+        return [[] for _ in range(n)]
+
+    # 2. Keep the k nearest members per row
+    nearest = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+    weights = np.take_along_axis(similarity, nearest, axis=1)
+    neighbourhood = sp.csr_matrix(
+        (weights.ravel(), nearest.ravel(), np.arange(0, n * k + 1, k)), shape=(n, n_members)
+    )
+
+    # 3. Neighbours' points, minus titles the member already has
+    scores = (neighbourhood @ matrix).tocsr()
+    scores = (scores - scores.multiply(interactions.astype(bool))).tocsr()
+    scores.eliminate_zeros()
+
+    picks = []
+    for i in range(n):
+        start, end = scores.indptr[i], scores.indptr[i + 1]
+        columns, values = scores.indices[start:end], scores.data[start:end]
+        if len(values) > top_n:
+            keep = np.argpartition(-values, top_n - 1)[:top_n]
+            columns, values = columns[keep], values[keep]
+        order = np.argsort(-values, kind="stable")
+        picks.append([(int(model["books"][columns[j]]), float(values[j])) for j in order])
+    return picks
+
+
+def _score_chunk(rows, top_n):
+    return score_rows(_model, rows, top_n)
+
+
+# ==========================================
+# Driver
+# ==========================================
+
+def selected_rows(model, member_ids=None, active_only=False):
+    """Member row numbers to score: all members with history, or the requested / active subset"""
+    import numpy as np
+    members = np.asarray(model["members"])
+    if active_only:
+        db = ReadSessionLocal()
+        try:
+            active = db.execute(select(models.Member.id).where(models.Member.status == "Active")).scalars().all()
+        finally:
+            db.close()
+        member_ids = active if member_ids is None else set(member_ids) & set(active)
+    if member_ids is None:
+        return np.arange(len(members))
+    wanted = np.fromiter(member_ids, dtype=np.int64)
+    return np.nonzero(np.isin(members, wanted))[0]
+
+
+def write_results(db, results, computed_at):
+    """Replaces the stored picks of every member in results (one transaction per chunk)"""
+    table = models.MemberRecommendation.__table__
+    db.execute(delete(table).where(table.c.member_id.in_([member_id for member_id, _ in results])))
+    # Titles deleted since the model was trained would violate the foreign key
+    picked = {book_id for _, picks in results for book_id, _ in picks}
+    existing = set(db.execute(select(models.Book.id).where(models.Book.id.in_(picked))).scalars()) if picked else set()
+    rows = [
+        {"member_id": member_id, "rank": rank, "book_id": book_id, "score": score, "computed_at": computed_at}
+        for member_id, picks in results
+        for rank, (book_id, score) in enumerate([p for p in picks if p[0] in existing])
+    ]
+    if rows:
+        db.execute(insert(table), rows)
+    db.commit()
+
+
+def run(member_ids=None, active_only=False, top_n=BATCH_TOP_N, workers=BATCH_WORKERS, retrain=True):
+    from datetime import datetime, timezone
+    started = time.perf_counter()
+    if retrain:
+        db = ReadSessionLocal()
+        try:
+            trained = train(db)
+        finally:
+            db.close()
+        if trained is None:
+            print("⚠️ No loans or views yet: nothing to recommend")
+            return 0
+        save_model(trained)
+        print(f"   -> model: {len(trained['members']):,} members x {len(trained['books']):,} titles, "
+              f"{len(trained['data']):,} interactions in {time.perf_counter() - started:.1f}s")
+
+    model = load_model()
+    if model is None:
+        print("⚠️ No trained model: run without --no-retrain first")
+        return 0
+    rows = selected_rows(model, member_ids, active_only)
+    chunk = max(1, BATCH_CHUNK_CELLS // max(len(model["members"]), 1))
+    chunks = [rows[i:i + chunk] for i in range(0, len(rows), chunk)]
+    computed_at = datetime.now(timezone.utc)
+
+    scoring_started = time.perf_counter()
+    scored = 0
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(RECOMMENDER_MODEL_DIR,)) as pool:
+            futures = [pool.submit(_score_chunk, c, top_n) for c in chunks]
+            for future in as_completed(futures):
+                results = future.result()
+                write_results(db, results, computed_at)
+                scored += len(results)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - scoring_started
+    print(f"✅ Top-{top_n} picks for {scored:,} members in {elapsed:.1f}s "
+          f"({scored / max(elapsed, 1e-9):,.0f} members/s, {len(chunks)} chunks, {workers} workers)")
+    return scored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute member_recommendations for many members at once")
+    parser.add_argument("--member-id", type=int, action="append", help="Only these members (repeatable)")
+    parser.add_argument("--active-only", action="store_true", help="Only members with status 'Active'")
+    parser.add_argument("--top-n", type=int, default=BATCH_TOP_N)
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--no-retrain", action="store_true", help="Score with the model already on disk")
+    args = parser.parse_args()
+    run(args.member_id, args.active_only, args.top_n, args.workers, retrain=not args.no_retrain)
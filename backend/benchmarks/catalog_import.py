@@ -0,0 +1,154 @@
+"""
+Throughput of the bulk catalog importer (catalog_import.py) on generated CSV and MARC files,
+next to the old way: POST /api/books per title + POST /api/books/{id}/items per copy (timed on
+--api-sample records, then extrapolated).
+
+Every --match-every'th record reuses an ISBN already in the catalog (its copies attach to that
+title), every --bad-every'th one has no author (reported, skipped). Everything written is
+deleted again at the end.
+
+    python -m benchmarks.catalog_import --records 100000 --copies 2
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import delete, select, text
+
+import catalog_import
+import models
+from database import SessionLocal
+from synth import book_rows
+
+FIELDS = ["title", "author", "isbn", "publisher", "publication_year", "genre", "description", "copies"]
+
+
+def records(n, copies, isbn_prefix, existing_isbns, match_every, bad_every, seed):
+    for i, row in enumerate(book_rows(seed, n), start=1):
+        _, title, author, _, publisher, year, genre, description, _ = row
+        isbn = f"{isbn_prefix}{i:07d}"
+        if match_every and i % match_every == 0 and existing_isbns:
+            isbn = existing_isbns[i % len(existing_isbns)]
+        if bad_every and i % bad_every == 0:
+            author = ""
+        yield {"title": title, "author": author, "isbn": isbn, "publisher": publisher,
+               "publication_year": year, "genre": genre, "description": description, "copies": copies}
+
+
+def marc_field(tag, subfields):
+    return tag, b"  " + b"".join(b"\x1f" + code.encode() + value.encode() for code, value in subfields) + b"\x1e"
+
+
+def marc_bytes(record):
+    """Minimal ISO 2709 record for catalog_import.read_marc"""
+    fields = [
+        marc_field("020", [("a", record["isbn"])]),
+        marc_field("100", [("a", record["author"])]),
+        marc_field("245", [("a", record["title"])]),
+        marc_field("260", [("b", record["publisher"]), ("c", record["publication_year"])]),
+        marc_field("520", [("a", record["description"])]),
+        marc_field("650", [("a", record["genre"])]),
+    ]
+    directory, body = b"", b""
+    for tag, data in fields:
+        directory += f"{tag}{len(data):04d}{len(body):05d}".encode()
+        body += data
+    base = 24 + len(directory) + 1
+    length = base + len(body) + 1
+    leader = f"{length:05d}nam a22{base:05d} a 4500".encode()
+    return leader + directory + b"\x1e" + body + b"\x1d"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--copies", type=int, default=2, help="Copies per record")
+    parser.add_argument("--match-every", type=int, default=10)
+    parser.add_argument("--bad-every", type=int, default=1000)
+    parser.add_argument("--api-sample", type=int, default=200)
+    parser.add_argument("--format", choices=("csv", "marc", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    run_id = f"{rng.randrange(10 ** 5):05d}"
+    isbn_prefix, barcode_prefix = f"979{run_id}", f"IMP{run_id}-"
+    db = SessionLocal()
+    existing = db.execute(select(models.Book.isbn).where(models.Book.isbn.is_not(None)).limit(1000)).scalars().all()
+    db.close()
+
+    def generated():
+        return records(args.records, args.copies, isbn_prefix, existing, args.match_every, args.bad_every, args.seed)
+
+    files = {}
+    tmp = tempfile.mkdtemp()
+    if args.format in ("csv", "both"):
+        files["csv"] = os.path.join(tmp, "import.csv")
+        with open(files["csv"], "w", newline="") as f:
+            writer = csv.DictWriter(f, FIELDS)
+            writer.writeheader()
+            writer.writerows(generated())
+    if args.format in ("marc", "both"):
+        files["marc"] = os.path.join(tmp, "import.mrc")
+        with open(files["marc"], "wb") as f:
+            for record in generated():
+                f.write(marc_bytes(record))
+
+    try:
+        for fmt, path in files.items():
+            db = SessionLocal()
+            try:
+                started = time.perf_counter()
+                with open(path, "rb") as f:
+                    report = catalog_import.import_file(db, f, fmt, barcode_prefix=barcode_prefix, default_copies=args.copies)
+                elapsed = time.perf_counter() - started
+            finally:
+                db.close()
+            print(f"{fmt:<5} {report['records']:,} records in {elapsed:.1f}s = {report['records'] / elapsed:,.0f} records/s, "
+                  f"{report['copies_created'] / elapsed:,.0f} copies/s ({os.path.getsize(path) / 2 ** 20:.0f}MB file): "
+                  f"{report['titles_created']:,} new titles, {report['titles_matched']:,} matched, "
+                  f"{report['copies_created']:,} copies, {report['error_count']:,} errors")
+            cleanup(isbn_prefix, barcode_prefix)
+
+        print(f"old way, one request per title / copy: {api_rate(args, isbn_prefix, barcode_prefix):,.0f} records/s")
+    finally:
+        cleanup(isbn_prefix, barcode_prefix)
+
+
+def api_rate(args, isbn_prefix, barcode_prefix):
+    """POST /api/books + POST /api/books/{id}/items per copy, in-process"""
+    from fastapi.testclient import TestClient
+    import instrumentation
+    import main as app_main
+    from scheduler import scheduler
+
+    instrumentation.SQL_STATS_LOG = False
+    sample = list(records(args.api_sample, args.copies, isbn_prefix, [], 0, 0, args.seed + 1))
+    with TestClient(app_main.app) as client:
+        scheduler.pause()
+        started = time.perf_counter()
+        for i, record in enumerate(sample):
+            book = client.post("/api/books", json={k: v for k, v in record.items() if k != "copies"}).json()
+            for copy in range(args.copies):
+                client.post(f"/api/books/{book['id']}/items", json={"barcode": f"{barcode_prefix}api-{i}-{copy}"})
+        return len(sample) / (time.perf_counter() - started)
+
+
+def cleanup(isbn_prefix, barcode_prefix):
+    db = SessionLocal()
+    if db.get_bind().dialect.name == "postgresql":
+        # Nothing references the rows we just made: skip the FK checks (book_views.book_id has no index,
+        # so each deleted title would scan it)
+        db.execute(text("SET LOCAL session_replication_role = replica"))
+    db.execute(delete(models.BookItem).where(models.BookItem.barcode.startswith(barcode_prefix)))
+    db.execute(delete(models.Book).where(models.Book.isbn.startswith(isbn_prefix)))
+    db.commit()
+    db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Top-k latency of the content-based index (content_recommendation.py) at catalog sizes the
+database doesn't need to hold: titles come straight from synth.book_rows, nothing is written
+to DATABASE_URL.
+
+    python -m benchmarks.content --titles 1000000 --queries 500
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import content_recommendation
+from content_recommendation import ContentIndex
+from synth import book_rows
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--titles", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--updates", type=int, default=1000, help="Single-title upserts to time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = {row[0]: (row[1], row[2], row[6], row[7]) for row in book_rows(args.seed, args.titles)}
+    index = ContentIndex.build(list(rows), list(rows.values()))
+    build_s = time.perf_counter() - started
+    matrix_mb = (index.base.data.nbytes + index.base.indices.nbytes + index.base.indptr.nbytes) / 2 ** 20
+    print(f"build: {args.titles:,} titles in {build_s:.1f}s, {index.base.nnz / args.titles:.1f} features/title, "
+          f"{matrix_mb:.0f}MB")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "content_index.npz")
+        started = time.perf_counter()
+        index.save(path)
+        save_s = time.perf_counter() - started
+        started = time.perf_counter()
+        index = ContentIndex.load(path)
+        print(f"save {save_s:.1f}s, load {time.perf_counter() - started:.1f}s, {os.path.getsize(path) / 2 ** 20:.0f}MB on disk")
+
+    rng = random.Random(args.seed)
+    queried = [rng.randint(1, args.titles) for _ in range(args.queries)]
+
+    def run_queries():
+        vectorize, lookup = [], []
+        for book_id in queried:
+            t0 = time.perf_counter()
+            query = index.vectorize([rows[book_id]])
+            t1 = time.perf_counter()
+            index.top_k(query, args.k, exclude={book_id})
+            t2 = time.perf_counter()
+            vectorize.append((t1 - t0) * 1000)
+            lookup.append((t2 - t1) * 1000)
+        return vectorize, lookup
+
+    vectorize, lookup = run_queries()
+    print(f"vectorize query: p50 {statistics.median(vectorize):.2f}ms  p95 {percentile(vectorize, 0.95):.2f}ms")
+    print(f"top-{args.k} lookup:   p50 {statistics.median(lookup):.2f}ms  p95 {percentile(lookup, 0.95):.2f}ms  "
+          f"p99 {percentile(lookup, 0.99):.2f}ms")
+
+    # Incremental path: edits land in the delta matrix, lookups then read both
+    updated = [rng.randint(1, args.titles) for _ in range(args.updates)]
+    started = time.perf_counter()
+    for book_id in updated:
+        title, author, genre, description = rows[book_id]
+        index.upsert([book_id], [(title + " revised", author, genre, description)])
+    per_update = (time.perf_counter() - started) / max(args.updates, 1) * 1000
+    _, lookup = run_queries()
+    print(f"upsert: {per_update:.2f}ms/title ({len(index.delta)} in delta, max {content_recommendation.CONTENT_DELTA_MAX}); "
+          f"top-{args.k} with delta: p50 {statistics.median(lookup):.2f}ms  p95 {percentile(lookup, 0.95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
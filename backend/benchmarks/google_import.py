@@ -0,0 +1,126 @@
+"""
+Bulk ISBN import (POST /api/books/import/bulk) against a local Google Books stub, next to the
+old way: one blocking request per ISBN, no connection reuse.
+
+The stub answers /books/v1/volumes?q=isbn:<n> after --latency ms and fails --error-rate of the
+calls with a 503 (the client retries those). Imported titles are deleted again at the end.
+
+    python -m benchmarks.google_import --isbns 500 --latency 150
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def stub_server(latency, error_rate, seed):
+    rng = random.Random(seed)
+    calls = {"n": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like Google
+
+        def do_GET(self):
+            calls["n"] += 1
+            time.sleep(latency)
+            query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+            if rng.random() < error_rate:
+                status, body = 503, b"{}"
+            else:
+                isbn = query.removeprefix("isbn:")
+                status, body = 200, json.dumps({"items": [{"volumeInfo": {
+                    "title": f"Stub title {isbn}", "authors": ["Stub Author"], "publishedDate": "2001-01-01",
+                    "industryIdentifiers": [{"type": "ISBN_13", "identifier": isbn}], "categories": ["Fiction"],
+                }}]}).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--isbns", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=150, help="Stub response time, ms")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--serial-sample", type=int, default=50, help="ISBNs timed the old way (then extrapolated)")
+    parser.add_argument("--password", default="123")
+    parser.add_argument("--staff-email", default="lib@library.com")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    server, calls = stub_server(args.latency / 1000, args.error_rate, args.seed)
+    url = f"http://127.0.0.1:{server.server_port}/books/v1/volumes"
+    os.environ["GOOGLE_BOOKS_URL"] = url  # Before google_books is imported
+    os.environ["GOOGLE_BOOKS_CACHE_DIR"] = tempfile.mkdtemp()
+
+    import httpx
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete
+    import instrumentation
+    import main as app_main
+    import models
+    from benchmarks.run import login_headers
+    from database import SessionLocal
+    from scheduler import scheduler
+
+    rng = random.Random(args.seed)
+    prefix = f"979{rng.randrange(10 ** 5):05d}"
+    isbns = [f"{prefix}{i:05d}" for i in range(args.isbns)]
+
+    # Before: a fresh connection and a blocking round trip per ISBN
+    started = time.perf_counter()
+    for isbn in isbns[:args.serial_sample]:
+        try:
+            httpx.get(url, params={"q": f"isbn:{isbn}"}, timeout=5).json()
+        except ValueError:
+            pass
+    serial = (time.perf_counter() - started) / args.serial_sample * args.isbns
+
+    instrumentation.SQL_STATS_LOG = False
+    try:
+        with TestClient(app_main.app) as client:
+            scheduler.pause()
+            staff = login_headers(client, args.staff_email, args.password)
+            calls["n"] = 0
+            started = time.perf_counter()
+            res = client.post("/api/books/import/bulk", json={"isbns": isbns}, headers=staff)
+            cold = time.perf_counter() - started
+            res.raise_for_status()
+            body = res.json()
+            cold_calls = calls["n"]
+
+            # Same list again: everything exists, nothing is looked up
+            started = time.perf_counter()
+            again = client.post("/api/books/import/bulk", json={"isbns": isbns}, headers=staff).json()
+            warm = time.perf_counter() - started
+    finally:
+        db = SessionLocal()
+        db.execute(delete(models.Book).where(models.Book.isbn.startswith(prefix)))
+        db.commit()
+        db.close()
+        server.shutdown()
+
+    print(f"{args.isbns} ISBNs, stub latency {args.latency:.0f}ms, {args.error_rate:.0%} errors")
+    print(f"one request per ISBN (extrapolated from {args.serial_sample}): {serial:.1f}s")
+    print(f"bulk import:        {cold:.1f}s  imported {len(body['imported'])}, failed {len(body['failed'])}, "
+          f"not found {len(body['not_found'])}, {cold_calls} HTTP calls (retries included)")
+    print(f"same list again:    {warm:.2f}s  existing {len(again['existing'])}, imported {len(again['imported'])}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
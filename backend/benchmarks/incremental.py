@@ -0,0 +1,62 @@
+"""
+Cost of one incremental recommender update (recommendation.update_member), i.e. what the
+background consumer spends per loan / view event, next to a full batch rebuild.
+
+Runs against whatever DATABASE_URL holds and rewrites the sampled members' picks. Trains a
+model first if RECOMMENDER_MODEL_DIR has none.
+
+    python -m benchmarks.incremental --events 500
+"""
+import argparse
+import random
+import statistics
+import time
+
+import batch_recommendation
+import recommendation
+from database import SessionLocal
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=500, help="Members updated, one event each")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        model = recommendation.current_model()
+        if model is None:
+            started = time.perf_counter()
+            batch_recommendation.save_model(batch_recommendation.train(db))
+            print(f"trained a model in {time.perf_counter() - started:.1f}s")
+            recommendation._model_checked = 0
+            model = recommendation.current_model()
+
+        members = model["members"]
+        print(f"model: {len(members):,} members x {len(model['books']):,} titles, {len(model['data']):,} interactions")
+        rng = random.Random(args.seed)
+        sample = [int(members[rng.randrange(len(members))]) for _ in range(args.events)]
+
+        recommendation.update_member(db, sample[0], model)  # Warm-up: imports, transposed matrix
+        timings = []
+        for member_id in sample:
+            started = time.perf_counter()
+            recommendation.update_member(db, member_id, model)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        db.close()
+
+    print(f"per event: p50 {statistics.median(timings):.1f}ms  p95 {percentile(timings, 0.95):.1f}ms  "
+          f"max {max(timings):.1f}ms  ({1000 / statistics.mean(timings):,.0f} events/s per consumer thread)")
+    print(f"full rebuild of every member at that rate: {len(members) * statistics.mean(timings) / 1000:.0f}s "
+          f"(python batch_recommendation.py is the cheaper way to do that)")
+
+
+if __name__ == "__main__":
+    main()
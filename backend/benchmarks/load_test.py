@@ -0,0 +1,94 @@
+"""
+HTTP load test for the catalog / self-service read endpoints.
+
+Runs N concurrent clients against a running server and reports latency
+percentiles and throughput per endpoint. To compare the sync and async
+paths, run it once against a server started from a commit before the async
+port and once against the current one, same database and worker count:
+
+    uvicorn main:app --port 8000 --workers 1
+    python -m benchmarks.load_test --base-url http://localhost:8000 --clients 500 \\
+        --requests 20000 --email alice@test.com --password 123 \\
+        --staff-email lib@library.com --staff-password 123 --book-id 1 --barcode ITEM-1-1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def login(client, email, password):
+    res = await client.post("/api/auth/login", data={"username": email, "password": password})
+    res.raise_for_status()
+    return {"Authorization": f"Bearer {res.json()['access_token']}"}
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        member = await login(client, args.email, args.password)
+        endpoints = [
+            ("catalog search", f"/api/books?search={args.search}", None),
+            ("book detail", f"/api/books/{args.book_id}", None),
+            ("my loans", "/api/my/loans", member),
+            ("my fines", "/api/my/fines", member),
+            ("my notifications", "/api/my/notifications", member),
+        ]
+        if args.staff_email:
+            staff = await login(client, args.staff_email, args.staff_password)
+            endpoints.append(("item details", f"/api/items/{args.barcode}/details", staff))
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        counter = iter(range(args.requests))
+
+        async def worker():
+            for i in counter:
+                name, url, headers = endpoints[i % len(endpoints)]
+                start = time.perf_counter()
+                try:
+                    res = await client.get(url, headers=headers)
+                    ok = res.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies[name].append(time.perf_counter() - start)
+                if not ok:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.clients)))
+        elapsed = time.perf_counter() - started
+
+    print(f"{args.requests} requests, {args.clients} concurrent clients, {elapsed:.1f}s "
+          f"-> {args.requests / elapsed:,.0f} req/s")
+    print(f"{'endpoint':<18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8} {'errors':>7}")
+    for name, samples in latencies.items():
+        print(f"{name:<18} {percentile(samples, 50) * 1000:>8.1f} {percentile(samples, 95) * 1000:>8.1f} "
+              f"{percentile(samples, 99) * 1000:>8.1f} {statistics.mean(samples) * 1000:>8.1f} {errors[name]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--email", default="alice@test.com")
+    parser.add_argument("--password", default="123")
+    parser.add_argument("--staff-email", default=None)
+    parser.add_argument("--staff-password", default="123")
+    parser.add_argument("--search", default="the")
+    parser.add_argument("--book-id", type=int, default=1)
+    parser.add_argument("--barcode", default="ITEM-1-1")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
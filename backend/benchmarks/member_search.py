@@ -0,0 +1,91 @@
+"""
+Fuzzy member lookup latency of the in-memory trigram index (member_search.MemberIndex, what
+SQLite and servers without pg_trgm use) at member counts the database doesn't need to hold:
+members come straight from synth.member_rows, nothing is written to DATABASE_URL.
+
+Queries are what the circulation desk types: full names, name prefixes, names with two letters
+swapped, email local parts, the last digits of a phone number and single letters.
+
+    python -m benchmarks.member_search --members 1000000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from member_search import MEMBER_SEARCH_LIMIT, MemberIndex
+from synth import member_rows
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def typo(rng, word):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def queries(rng, rows, n):
+    """{kind: [(query, member id it should find or None)]}"""
+    picked = [rows[rng.randrange(len(rows))] for _ in range(n)]
+    return {
+        "full name": [(name, None) for _, name, _, _ in picked],
+        "prefix": [(name.split()[0][:3], None) for _, name, _, _ in picked],
+        "typo": [(" ".join(typo(rng, w) for w in name.split()), None) for _, name, _, _ in picked],
+        "email local part": [(email.split("@")[0], member_id) for member_id, _, email, _ in picked],
+        "phone digits": [(phone[-6:], member_id) for member_id, _, _, phone in picked],
+        "one letter": [(name[0], None) for _, name, _, _ in picked],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200, help="Per kind")
+    parser.add_argument("--limit", type=int, default=MEMBER_SEARCH_LIMIT)
+    parser.add_argument("--updates", type=int, default=1000, help="Edited members to time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = [(member_id, full_name, email, phone)
+            for member_id, email, _, full_name, phone, _, _ in member_rows(args.seed, args.members, "x")]
+    started = time.perf_counter()
+    index = MemberIndex.build(rows)
+    print(f"build: {args.members:,} members in {time.perf_counter() - started:.1f}s, "
+          f"{len(index.grams):,} trigrams, {index.postings.nbytes / 2 ** 20:.0f}MB of postings")
+
+    rng = random.Random(args.seed)
+    everything = []
+    for kind, batch in queries(rng, rows, args.queries).items():
+        timings, found = [], 0
+        for q, expected in batch:
+            t0 = time.perf_counter()
+            ids = index.search(q, args.limit)
+            timings.append((time.perf_counter() - t0) * 1000)
+            found += expected is not None and expected in ids
+        everything += timings
+        hits = f"  expected member in results {found / len(batch):.0%}" if batch[0][1] is not None else ""
+        print(f"{kind:<17} p50 {statistics.median(timings):6.2f}ms  p95 {percentile(timings, 0.95):6.2f}ms  "
+              f"p99 {percentile(timings, 0.99):6.2f}ms{hits}")
+    print(f"{'all':<17} p50 {statistics.median(everything):6.2f}ms  p95 {percentile(everything, 0.95):6.2f}ms")
+
+    # Registrations / profile edits after the build land in the delta
+    started = time.perf_counter()
+    for member_id, full_name, email, phone in rows[:args.updates]:
+        index.add(member_id, full_name + " Revised", email, phone)
+    per_add = (time.perf_counter() - started) / max(args.updates, 1) * 1000
+    timings = []
+    for q, _ in queries(rng, rows, args.queries)["full name"]:
+        t0 = time.perf_counter()
+        index.search(q, args.limit)
+        timings.append((time.perf_counter() - t0) * 1000)
+    print(f"edit: {per_add:.3f}ms/member ({args.updates} in delta); full name with delta: "
+          f"p50 {statistics.median(timings):.2f}ms  p95 {percentile(timings, 0.95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Offline quality check for the recommenders: does a change to the weights, the neighbour count
+or the scoring code still pick the titles members actually borrowed next?
+
+Time-based split over loans and book_views: everything up to the last --test-days days trains
+the variant, then each sampled member's picks are compared with the titles they borrowed in the
+test window (and hadn't touched before). For every variant:
+
+    precision@k  hits / k, averaged over members
+    recall@k     hits / titles borrowed in the test window, averaged over members
+    coverage     share of the catalog that shows up in anybody's picks
+    train s      building the variant from the training events
+    serve p50/p95  one member's picks, from data already in memory (no SQL)
+    model MB     arrays kept for serving; peak MB = traced peak while training
+
+Variants: the collaborative model (batch_recommendation) under several loan/view weights and
+neighbour counts, the decayed-popularity fallback, the content index, and the blend served by
+/api/recommendations. Quality is compared with benchmarks/recommendation_quality.json and the
+exit code is non-zero when precision or recall drops by more than --tolerance. Timings are
+reported, not checked (see benchmarks/run.py for latency budgets).
+
+    python synth.py                                       # the synthetic seed data (small profile)
+    python -m benchmarks.recommendation_quality
+    python -m benchmarks.recommendation_quality --write-baseline   # after an intended change
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import select
+
+import batch_recommendation
+import content_recommendation
+import models
+import popularity
+from database import ReadSessionLocal
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "recommendation_quality.json")
+
+# (name, loan points, view points, neighbours); the first one is what production serves
+COLLABORATIVE_VARIANTS = [
+    ("knn 5/1 k=3", 5, 1, 3),
+    ("knn 5/1 k=10", 5, 1, 10),
+    ("knn 5/1 k=25", 5, 1, 25),
+    ("knn 1/1 k=3", 1, 1, 3),
+    ("knn 3/1 k=3", 3, 1, 3),
+    ("knn 5/0 k=3", 5, 0, 3),
+]
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def load_events(db):
+    """Loans and views as numpy columns: member_id, book_id, day (datetime64[D]), is_loan"""
+    import numpy as np
+    loans = db.execute(
+        select(models.Loan.member_id, models.BookItem.book_id, models.Loan.issue_date)
+        .join(models.BookItem, models.Loan.book_item_id == models.BookItem.barcode)
+        .where(models.Loan.member_id.is_not(None), models.Loan.issue_date.is_not(None))
+    ).all()
+    views = db.execute(
+        select(models.BookView.member_id, models.BookView.book_id, models.BookView.view_date)
+        .where(models.BookView.member_id.is_not(None), models.BookView.book_id.is_not(None),
+               models.BookView.view_date.is_not(None))
+    ).all()
+    rows = [(m, b, d) for m, b, d in loans] + [(m, b, d.date()) for m, b, d in views]
+    return {
+        "member": np.array([r[0] for r in rows], dtype=np.int64),
+        "book": np.array([r[1] for r in rows], dtype=np.int64),
+        "day": np.array([r[2] for r in rows], dtype="datetime64[D]"),
+        "is_loan": np.arange(len(rows)) < len(loans),
+    }
+
+
+def split(events, test_days):
+    """Training events, the cutoff day, and {member_id: titles borrowed after it for the first time}"""
+    import numpy as np
+    cutoff = events["day"].max() - np.timedelta64(test_days, "D")
+    train_mask = events["day"] <= cutoff
+    train = {name: column[train_mask] for name, column in events.items()}
+
+    seen = defaultdict(set)
+    for member_id, book_id in zip(train["member"].tolist(), train["book"].tolist()):
+        seen[member_id].add(book_id)
+    test_mask = ~train_mask & events["is_loan"]
+    relevant = defaultdict(set)
+    for member_id, book_id in zip(events["member"][test_mask].tolist(), events["book"][test_mask].tolist()):
+        if book_id not in seen[member_id]:
+            relevant[member_id].add(book_id)
+    return train, cutoff.item(), seen, relevant
+
+
+def measure_training(build):
+    """(result, seconds, traced peak bytes)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = build()
+        return result, time.perf_counter() - started, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def array_bytes(values):
+    return sum(getattr(v, "nbytes", 0) for v in values)
+
+
+# ==========================================
+# Variants: build() -> (serve(member_id, k) -> [book_id], model bytes)
+# ==========================================
+
+def popular_variant(train, seen):
+    def build():
+        scores = defaultdict(float)
+        loans = train["is_loan"]
+        for book_id, day in zip(train["book"][loans].tolist(), train["day"][loans].tolist()):
+            scores[book_id] += popularity.loan_weight(day)
+        return sorted(scores, key=lambda b: -scores[b])
+
+    def factory(ranked):
+        def serve(member_id, k):
+            history = seen.get(member_id, ())
+            picks = []
+            for book_id in ranked:
+                if book_id not in history:
+                    picks.append(book_id)
+                    if len(picks) == k:
+                        break
+            return picks
+        return serve, len(ranked) * 8
+    return build, factory
+
+
+def collaborative_variant(train, loan_points, view_points, neighbors, fallback):
+    import numpy as np
+
+    def build():
+        points = np.where(train["is_loan"], loan_points, view_points).astype(np.float32)
+        keep = points > 0
+        model = batch_recommendation.build_model(train["member"][keep], train["book"][keep], points[keep])
+        return batch_recommendation.attach_matrices(model)
+
+    def factory(model):
+        rows = {member_id: row for row, member_id in enumerate(model["members"].tolist())}
+
+        def serve(member_id, k):
+            row = rows.get(member_id)
+            if row is None:
+                return fallback(member_id, k)  # /api/recommendations falls back to popular too
+            picks = batch_recommendation.score_vectors(model, model["matrix"][row], [row], k, neighbors)[0]
+            return [book_id for book_id, _ in picks]
+        return serve, array_bytes(model[name] for name in batch_recommendation.MODEL_FILES)
+    return build, factory
+
+
+def content_variant(catalog, train, seen):
+    import numpy as np
+    import scipy.sparse as sp
+    from sklearn.preprocessing import normalize
+
+    def build():
+        weights = defaultdict(lambda: defaultdict(float))
+        for member_id, book_id, is_loan in zip(train["member"].tolist(), train["book"].tolist(),
+                                               train["is_loan"].tolist()):
+            weights[member_id][book_id] += content_recommendation.LOAN_WEIGHT if is_loan else content_recommendation.VIEW_WEIGHT
+        ids = list(catalog)
+        return content_recommendation.ContentIndex.build(ids, [catalog[i] for i in ids]), weights
+
+    def factory(built):
+        index, weights = built
+
+        def serve(member_id, k):
+            profile_weights = weights.get(member_id)
+            if not profile_weights:
+                return []
+            books = [b for b in profile_weights if b in catalog]
+            vectors = index.vectorize([catalog[b] for b in books])
+            profile = vectors.multiply(np.array([[profile_weights[b]] for b in books], dtype=np.float32)).sum(axis=0)
+            query = normalize(sp.csr_matrix(profile))
+            return [book_id for book_id, _ in index.top_k(query, k, exclude=seen.get(member_id, set()))]
+        base = index.base
+        return serve, array_bytes([base.data, base.indices, base.indptr, index.idf])
+    return build, factory
+
+
+# ==========================================
+# Evaluation
+# ==========================================
+
+def evaluate(serve, members, relevant, k, catalog_size):
+    hits_precision, hits_recall, latencies = [], [], []
+    recommended = set()
+    for member_id in members:
+        started = time.perf_counter()
+        picks = serve(member_id, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits = len(set(picks) & relevant[member_id])
+        hits_precision.append(hits / k)
+        hits_recall.append(hits / len(relevant[member_id]))
+        recommended.update(picks)
+    return {
+        "precision": round(statistics.mean(hits_precision), 4),
+        "recall": round(statistics.mean(hits_recall), 4),
+        "coverage": round(len(recommended) / catalog_size, 4),
+        "serve_p50_ms": round(statistics.median(latencies), 2),
+        "serve_p95_ms": round(percentile(latencies, 0.95), 2),
+    }
+
+
+def print_table(results, baseline, k):
+    print(f"\n{'variant':<16} {f'P@{k}':>7} {f'R@{k}':>7} {'cover':>7} {'train s':>8} {'serve p50':>10} "
+          f"{'serve p95':>10} {'model MB':>9} {'peak MB':>8}  vs baseline")
+    for name, r in results.items():
+        base = baseline.get(name)
+        delta = (f"P {r['precision'] - base['precision']:+.4f}  R {r['recall'] - base['recall']:+.4f}"
+                 if base else "(new)")
+        print(f"{name:<16} {r['precision']:>7.4f} {r['recall']:>7.4f} {r['coverage']:>7.3f} {r['train_s']:>8.2f} "
+              f"{r['serve_p50_ms']:>8.2f}ms {r['serve_p95_ms']:>8.2f}ms {r['model_mb']:>9.1f} {r['peak_mb']:>8.1f}  {delta}")
+
+
+def check_baseline(results, baseline, tolerance):
+    failures = []
+    for name, base in baseline.items():
+        r = results.get(name)
+        if r is None:
+            continue
+        for metric in ("precision", "recall"):
+            floor = base[metric] * (1 - tolerance)
+            if r[metric] < floor:
+                failures.append(f"{name}: {metric}@k {r[metric]:.4f} < {floor:.4f} "
+                                f"(baseline {base[metric]:.4f} - {tolerance:.0%})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline precision / recall / coverage of the recommenders")
+    parser.add_argument("--test-days", type=int, default=60, help="Last N days of activity form the test window")
+    parser.add_argument("--k", type=int, default=batch_recommendation.BATCH_TOP_N)
+    parser.add_argument("--members", type=int, default=1000, help="Members sampled for evaluation")
+    parser.add_argument("--variant", action="append", help="Only run these variants (repeatable)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative precision / recall drop allowed")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--write-baseline", action="store_true", help="Record this run as the new baseline")
+    args = parser.parse_args()
+
+    db = ReadSessionLocal()
+    try:
+        started = time.perf_counter()
+        events = load_events(db)
+        catalog = {row[0]: tuple(row[1:]) for row in db.execute(
+            select(models.Book.id, *content_recommendation.BOOK_FIELDS))}
+    finally:
+        db.close()
+    if not len(events["member"]):
+        print("❌ No loans or views to evaluate (python synth.py loads the synthetic seed data)")
+        return 1
+
+    train, cutoff, seen, relevant = split(events, args.test_days)
+    candidates = sorted(m for m in relevant if relevant[m] and m in seen)
+    members = random.Random(args.seed).sample(candidates, min(args.members, len(candidates)))
+    print(f"📚 {len(events['member']):,} events loaded in {time.perf_counter() - started:.1f}s; "
+          f"train up to {cutoff} ({len(train['member']):,} events), "
+          f"test {cutoff + timedelta(days=1)}.. ({sum(len(r) for r in relevant.values()):,} first-time loans)")
+    print(f"🎯 {len(members):,} of {len(candidates):,} members with history and test-window loans, k={args.k}")
+
+    production = COLLABORATIVE_VARIANTS[0][0]
+    servers = {}
+    variants = {"popular": popular_variant(train, seen)}
+    for name, loan_points, view_points, neighbors in COLLABORATIVE_VARIANTS:
+        variants[name] = collaborative_variant(train, loan_points, view_points, neighbors,
+                                               fallback=lambda m, k: servers["popular"](m, k))
+    variants["content"] = content_variant(catalog, train, seen)
+    variants["blend"] = None  # Served from production + content
+    reported = set(args.variant or variants)
+    needed = reported | {"popular"} | ({production, "content"} if "blend" in reported else set())
+
+    results = {}
+    for name, variant in variants.items():
+        if name not in needed:
+            continue
+        if name == "blend":
+            collaborative, content = servers[production], servers["content"]
+
+            def serve(member_id, k):
+                return content_recommendation.blend(collaborative(member_id, k), content(member_id, k), k)
+            size, train_s, peak = 0, 0.0, 0
+        else:
+            build, factory = variant
+            built, train_s, peak = measure_training(build)
+            serve, size = factory(built)
+        serve(members[0], args.k)  # Warm-up: imports, lazily built structures
+        servers[name] = serve
+        if name not in reported:
+            continue
+        results[name] = evaluate(serve, members, relevant, args.k, len(catalog))
+        results[name].update(train_s=round(train_s, 2), model_mb=round(size / 2 ** 20, 1), peak_mb=round(peak / 2 ** 20, 1))
+        print(f"   {name}: P@{args.k} {results[name]['precision']:.4f} in {train_s:.1f}s")
+
+    baseline_file = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline_file = json.load(f)
+    baseline = baseline_file.get("variants", {})
+    print_table(results, baseline, args.k)
+
+    settings = {"k": args.k, "test_days": args.test_days, "members": args.members, "seed": args.seed}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({**settings, "evaluated": len(members), "variants": results}, f, indent=2)
+
+    if args.write_baseline:
+        baseline_file = {**settings, "variants": {
+            name: {metric: r[metric] for metric in ("precision", "recall", "coverage")} for name, r in results.items()
+        }}
+        with open(args.baseline, "w") as f:
+            json.dump(baseline_file, f, indent=2)
+            f.write("\n")
+        print(f"\n📝 Baseline written to {args.baseline}")
+        return 0
+
+    if baseline_file and {k: baseline_file.get(k) for k in settings} != settings:
+        print(f"\n⚠️  Baseline was recorded with {({k: baseline_file.get(k) for k in settings})}, not comparing")
+        return 0
+    failures = check_baseline(results, baseline, args.tolerance)
+    if failures:
+        print("\n❌ Quality regression:")
+        for failure in failures:
+            print(f"   {failure}")
+        return 1
+    print("\n✅ No variant below its baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
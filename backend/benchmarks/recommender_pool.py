@@ -0,0 +1,89 @@
+"""
+Does recommendation work stall unrelated requests? Latency of GET /api/books/{id} (the probe)
+while other threads compute recommendations, three ways:
+
+    idle    - probe alone
+    inline  - recommendations computed on the calling thread (what the threadpool used to do)
+    pool    - recommendation.recommend_with_deadline: recommender process pool + deadline
+
+In-process against whatever DATABASE_URL holds. --no-model hides the batch model so the
+snapshot path (recommend_books) runs: a model trained per pool process first.
+
+    python -m benchmarks.recommender_pool --seconds 10 --threads 4 --no-model
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10, help="Per mode")
+    parser.add_argument("--threads", type=int, default=4, help="Threads requesting recommendations")
+    parser.add_argument("--no-model", action="store_true", help="Ignore the batch model: snapshot path")
+    args = parser.parse_args()
+    if args.no_model:
+        os.environ["RECOMMENDER_MODEL_DIR"] = tempfile.mkdtemp()  # Before the imports below, and inherited by the pool
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+    import instrumentation
+    import main as app_main
+    import models
+    import recommendation
+    from database import SessionLocal
+    from scheduler import scheduler
+
+    instrumentation.SQL_STATS_LOG = False
+    db = SessionLocal()
+    member_ids = [m for (m,) in db.execute(select(models.Member.id).limit(200))]
+    book_id = db.execute(select(models.Book.id).limit(1)).scalar()
+    db.close()
+
+    def inline(member_id):
+        recommendation.compute_recommendations(member_id, 5)
+
+    def pooled(member_id):
+        recommendation.recommend_with_deadline(member_id, 5)
+
+    with TestClient(app_main.app) as client:
+        scheduler.pause()
+        recommendation.warm_up()
+        print(f"{'mode':<8} {'probe n':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'recs/s':>8}")
+        for mode, work in (("idle", None), ("inline", inline), ("pool", pooled)):
+            stop = time.monotonic() + args.seconds
+            done = [0]
+
+            def worker(offset):
+                i = offset
+                while time.monotonic() < stop:
+                    work(member_ids[i % len(member_ids)])
+                    done[0] += 1
+                    i += args.threads
+
+            threads = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)] if work else []
+            for t in threads:
+                t.start()
+            latencies = []
+            while time.monotonic() < stop:
+                started = time.perf_counter()
+                client.get(f"/api/books/{book_id}")
+                latencies.append((time.perf_counter() - started) * 1000)
+            for t in threads:
+                t.join()
+            print(f"{mode:<8} {len(latencies):>8} {statistics.median(latencies):>8.1f} {percentile(latencies, 0.95):>8.1f} "
+                  f"{max(latencies):>8.1f} {done[0] / args.seconds:>8.1f}")
+    recommendation.shutdown_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Throughput benchmark for the due-date reminder fan-out (scheduler.send_due_date_reminders).
+
+Point DATABASE_URL at a throwaway database, it is wiped first:
+    DATABASE_URL=sqlite:///bench_reminders.db python -m benchmarks.reminders --loans 100000
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from database import SessionLocal, engine, Base
+import models
+import scheduler
+
+
+def load_fixture(db, n_loans):
+    """One title, one member per loan, every loan due in REMINDER_DAYS_BEFORE_DUE days"""
+    due = date.today() + timedelta(days=scheduler.REMINDER_DAYS_BEFORE_DUE)
+    db.execute(insert(models.Book.__table__), [{"id": 1, "title": "Bench Title", "author": "Bench"}])
+    chunk = 10000
+    for start in range(0, n_loans, chunk):
+        ids = range(start + 1, min(start + chunk, n_loans) + 1)
+        db.execute(insert(models.Member.__table__), [
+            {"id": i, "email": f"m{i}@bench", "hashed_password": "x", "full_name": f"Member {i}", "status": "Active"}
+            for i in ids
+        ])
+        db.execute(insert(models.BookItem.__table__), [
+            {"barcode": f"B{i}", "book_id": 1, "status": "Borrowed"} for i in ids
+        ])
+        db.execute(insert(models.Loan.__table__), [
+            {"id": i, "book_item_id": f"B{i}", "member_id": i, "issue_date": date.today(),
+             "due_date": due, "status": "Active", "renewal_count": 0}
+            for i in ids
+        ])
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--loans", type=int, default=100000)
+    args = parser.parse_args()
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        load_fixture(db, args.loans)
+
+        start = time.perf_counter()
+        sent = scheduler.send_due_date_reminders(db)
+        elapsed = time.perf_counter() - start
+        print(f"first run : {sent} reminders in {elapsed:.2f}s ({sent / elapsed:,.0f}/s)")
+
+        start = time.perf_counter()
+        resent = scheduler.send_due_date_reminders(db)
+        elapsed = time.perf_counter() - start
+        print(f"second run: {resent} reminders in {elapsed:.2f}s (idempotency check, expect 0)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
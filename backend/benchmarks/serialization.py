@@ -0,0 +1,77 @@
+"""
+CPU per row of the large list endpoints: regular response_model path vs the ?stream=true orjson path.
+
+Runs in-process against whatever DATABASE_URL holds (load it with synth.py first).
+The numbers are process CPU time, so the app, the DB driver and JSON encoding are
+all included, and waiting on the database is not. Each pair of responses is also
+checked for identical content.
+
+    python -m benchmarks.serialization --repeat 5
+"""
+import argparse
+import time
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+import instrumentation
+import main
+from scheduler import scheduler
+
+ENDPOINTS = [
+    # (name, url, sort key for the content comparison)
+    ("books", "/api/books", "id"),
+    ("report overdue", "/api/reports/overdue", "loan_id"),
+    ("report active_loans", "/api/reports/active_loans", "loan_id"),
+    ("report member_activity", "/api/reports/member_activity", "member_id"),
+    ("reservations search", "/api/admin/reservations/search", "id"),
+]
+
+
+def normalize(rows, key):
+    """Same rows whatever the encoder: sorted, datetimes parsed, floats rounded"""
+    def value(v):
+        if isinstance(v, str) and len(v) >= 19 and v[4] == "-" and "T" in v:
+            return datetime.fromisoformat(v.replace("Z", "+00:00"))
+        if isinstance(v, float):
+            return round(v, 6)
+        return v
+    return sorted(({k: value(v) for k, v in row.items()} for row in rows), key=lambda r: r[key])
+
+
+def measure(client, url, headers, repeat):
+    cpu = []
+    for _ in range(repeat):
+        started = time.process_time()
+        res = client.get(url, headers=headers)
+        body = res.content  # Drain the stream inside the timed block
+        cpu.append(time.process_time() - started)
+        assert res.status_code == 200, (url, res.status_code, body[:200])
+    return min(cpu), res.json()
+
+
+def main_():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--staff-email", default="lib@library.com")
+    parser.add_argument("--password", default="123")
+    args = parser.parse_args()
+
+    instrumentation.SQL_STATS_LOG = False
+    with TestClient(main.app) as client:
+        scheduler.pause()
+        token = client.post("/api/auth/login", data={"username": args.staff_email, "password": args.password}).json()
+        headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+        print(f"{'endpoint':<24} {'rows':>7} {'regular us/row':>15} {'stream us/row':>14} {'speedup':>8}  same content")
+        for name, url, key in ENDPOINTS:
+            regular_cpu, regular = measure(client, url, headers, args.repeat)
+            fast_cpu, fast = measure(client, f"{url}?stream=true", headers, args.repeat)
+            rows = max(len(regular), 1)
+            same = normalize(regular, key) == normalize(fast, key)
+            print(f"{name:<24} {len(regular):>7} {regular_cpu / rows * 1e6:>15.1f} {fast_cpu / rows * 1e6:>14.1f} "
+                  f"{regular_cpu / max(fast_cpu, 1e-9):>7.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,46 @@
+"""
+Cold-start cost of one API worker: time to import main.py and resident memory afterwards.
+
+Each sample runs in a fresh interpreter, so nothing is cached in-process
+(the OS page cache still is: the first sample is usually the slowest).
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+with open("/proc/self/status") as f:
+    rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+heavy = sorted(name for name in ("pandas", "sklearn", "scipy", "numpy") if name in sys.modules)
+print(json.dumps({"import_s": elapsed, "rss_mb": rss_kb / 1024, "heavy_modules": heavy}))
+"""
+
+
+def sample():
+    out = subprocess.run([sys.executable, "-W", "ignore", "-c", PROBE], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [sample() for _ in range(args.runs)]
+    imports = [s["import_s"] * 1000 for s in samples]
+    rss = [s["rss_mb"] for s in samples]
+    print(f"import main: median {statistics.median(imports):.0f}ms (min {min(imports):.0f}, max {max(imports):.0f})")
+    print(f"RSS after import: median {statistics.median(rss):.0f}MB")
+    print(f"ML modules loaded at startup: {', '.join(samples[0]['heavy_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Small in-process cache with stampede protection.
+
+- TTL: entries expire `ttl` seconds after they were computed.
+- Single flight: concurrent misses on the same key wait on one computation
+  instead of all hitting the database.
+- Refresh ahead: once an entry is past `refresh_after` (a fraction of the
+  TTL), the next reader starts one background recomputation and keeps being
+  served the current value, so hot keys never actually expire under traffic.
+
+Compute functions take no arguments and must open their own DB session:
+a refresh runs on a background thread, after the request that triggered it
+has finished. Async callers compute themselves and use peek() / put()
+(no single flight / refresh ahead there). `max_entries` bounds caches
+keyed by something unbounded (barcodes): the oldest entries go first.
+The cache is per worker process.
+"""
+import threading
+import time
+
+import metrics
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "refresh_at", "refreshing")
+
+    def __init__(self, value, ttl, refresh_after):
+        now = time.monotonic()
+        self.value = value
+        self.expires_at = now + ttl
+        self.refresh_at = now + ttl * refresh_after
+        self.refreshing = False
+
+
+class Cache:
+    def __init__(self, name, ttl, refresh_after=0.8, max_entries=None):
+        self.name = name
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()      # Guards entries / key_locks
+        self.key_locks = {}
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry and now < entry.expires_at:
+            if now >= entry.refresh_at:
+                self._refresh_in_background(key, entry, compute)
+            metrics.CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return entry.value
+
+        # Miss: one computation per key, everyone else waits for it
+        with self._key_lock(key):
+            entry = self.entries.get(key)
+            if entry and time.monotonic() < entry.expires_at:
+                metrics.CACHE_REQUESTS.labels(self.name, "hit").inc()
+                return entry.value
+            metrics.CACHE_REQUESTS.labels(self.name, "miss").inc()
+            value = compute()
+            self._store(key, value)
+            return value
+
+    def peek(self, key):
+        """(hit, value) without computing anything"""
+        entry = self.entries.get(key)
+        if entry and time.monotonic() < entry.expires_at:
+            metrics.CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return True, entry.value
+        metrics.CACHE_REQUESTS.labels(self.name, "miss").inc()
+        return False, None
+
+    def put(self, key, value):
+        self._store(key, value)
+
+    def _store(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)  # Re-inserted at the end: insertion order = age
+            self.entries[key] = _Entry(value, self.ttl, self.refresh_after)
+            if self.max_entries is not None:
+                while len(self.entries) > self.max_entries:
+                    self.entries.pop(next(iter(self.entries)))
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _refresh_in_background(self, key, entry, compute):
+        with self.lock:
+            if entry.refreshing:
+                return
+            entry.refreshing = True
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._store(key, compute())
+                metrics.CACHE_REQUESTS.labels(self.name, "refresh").inc()
+            except Exception as e:
+                # Keep serving the current value until it expires; the next reader retries
+                print(f"⚠️ Cache '{self.name}': background refresh of {key!r} failed: {e}")
+                entry.refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
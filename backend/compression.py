@@ -0,0 +1,184 @@
+"""
+Response compression and precompressed static files.
+
+CompressionMiddleware compresses text-like responses of at least
+COMPRESS_MIN_SIZE bytes. It uses brotli when the package is installed and the
+client accepts it, gzip otherwise. Streamed responses (?stream=true) are
+compressed chunk by chunk. Responses that already carry a Content-Encoding
+(precompressed assets) or are sent with http.response.pathsend pass through
+untouched.
+
+PrecompressedStaticFiles serves 'x.js.br' / 'x.js.gz' in place of 'x.js'
+when they exist and the client accepts them. Vite names its output by content
+hash, so /assets responses are marked immutable for a year. Build the
+compressed copies once, after `npm run build` (the Dockerfile does this):
+
+    python compression.py static_ui
+"""
+import gzip
+import os
+import stat
+import sys
+import zlib
+from mimetypes import guess_type
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:  # Optional: without it everything is gzip
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))  # Bytes; smaller bodies aren't worth it
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4         # On the fly: cheap. Precompressed assets use the maximum (11).
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml", "image/svg+xml")
+COMPRESSIBLE_EXTENSIONS = (".js", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def accepted_encodings(scope):
+    accepted = set()
+    for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        if encoding == "br":
+            self.engine = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.process, self.sync_flush, self.finish = self.engine.process, self.engine.flush, self.engine.finish
+        else:
+            self.engine = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+            self.process = self.engine.compress
+            self.sync_flush = lambda: self.engine.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.engine.flush
+
+    def chunk(self, data):
+        """Compressed bytes for a streamed chunk, flushed so the client sees it now"""
+        return self.process(data) + self.sync_flush()
+
+    def last(self, data):
+        return self.process(data) + self.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accepted = accepted_encodings(scope)
+        encoding = "br" if brotli and "br" in accepted else "gzip" if "gzip" in accepted else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message  # Held back until the first body chunk tells us the size
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if compressor is None and not passthrough and start is not None:
+                    # http.response.pathsend (FileResponse on servers that support it): the body is a
+                    # file the server sends itself, so it goes out as is, after the held start message
+                    passthrough = True
+                    await send(start)
+                return await send(message)
+
+            body, more = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                if compressible:
+                    headers.add_vary_header("Accept-Encoding")
+                if (not compressible or "content-encoding" in headers or start["status"] in (204, 304)
+                        or (not more and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    return await send(message)
+
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not more:
+                    data = compressor.last(body)
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": data})
+                await send(start)
+
+            data = compressor.chunk(body) if more else compressor.last(body)
+            await send({"type": "http.response.body", "body": data, "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers a precompressed sibling and sets a Cache-Control header"""
+
+    def __init__(self, *args, cache_control=IMMUTABLE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+
+    async def get_response(self, path, scope):
+        accepted = accepted_encodings(scope)
+        response = None
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                response = FileResponse(
+                    full_path, stat_result=stat_result, media_type=guess_type(path)[0] or "text/plain",
+                    headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+                )
+                if self.is_not_modified(response.headers, Headers(scope=scope)):
+                    response = NotModifiedResponse(response.headers)
+                break
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
+def precompress(directory):
+    """Writes .gz (and .br when brotli is installed) next to every compressible file worth it"""
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                raw = f.read()
+            if len(raw) < COMPRESS_MIN_SIZE:
+                continue
+            variants = [(".gz", gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli:
+                variants.append((".br", brotli.compress(raw, quality=11)))
+            for suffix, data in variants:
+                if len(data) < len(raw):
+                    with open(path + suffix, "wb") as f:
+                        f.write(data)
+                    written += 1
+    print(f"✅ Precompressed {written} files in {directory}" + ("" if brotli else " (gzip only: brotli not installed)"))
+
+
+if __name__ == "__main__":
+    precompress(sys.argv[1] if len(sys.argv) > 1 else "static_ui")
@@ -0,0 +1,398 @@
+"""
+Content-based recommendations: "more like this" from title, author, genre and description.
+
+Every title is a hashed TF-IDF vector (HashingVectorizer: no vocabulary to fit, so titles can be
+added one at a time), L2-normalized, so a dot product is the cosine similarity. The matrix is kept
+column-major (CSC), i.e. as an inverted index: scoring a query only reads the postings of the
+query's own features instead of the whole catalog. Features found in more than CONTENT_MAX_DF of
+the titles carry almost no signal and would dominate that cost, so they are dropped.
+
+Persistence: `python content_recommendation.py` vectorizes the catalog and writes
+CONTENT_INDEX_PATH (seed.py / synth.py do it after a load). API workers never build it: until the
+file exists, "more like this" serves popular titles of the same genre and the member blend gets
+no content picks. A worker loads the file on first use, then catches up from books.updated_at
+every CONTENT_SYNC_INTERVAL seconds, so a title added or edited through any worker reaches all
+of them; create / import / update also index the title at once in the worker that served them.
+Changed titles go to a small delta matrix and their old row is masked. At CONTENT_DELTA_MAX rows
+a background thread merges the delta into a new base and rewrites the file, while requests keep
+reading (and updating) the current one. Deleted titles simply disappear when the caller loads
+the ids from the database.
+
+numpy / scipy / scikit-learn are imported on first use (see recommendation.py).
+"""
+import argparse
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func
+
+from database import ReadSessionLocal
+import models
+import popularity
+
+CONTENT_INDEX_PATH = os.getenv("CONTENT_INDEX_PATH", "data/content_index.npz")
+CONTENT_SYNC_INTERVAL = 30        # Seconds between catch-up queries on books.updated_at
+CONTENT_SYNC_LAG = 60             # Seconds re-read on every catch-up (a transaction commits after its now())
+CONTENT_DELTA_MAX = 1000          # Changed titles kept aside before merging them into the base matrix
+CONTENT_MAX_DF = 0.1              # Drop features found in more than 10% of the titles...
+CONTENT_MAX_DF_MIN_TITLES = 1000  # ... once the catalog is big enough for that to mean anything
+CONTENT_PROFILE_SIZE = 50         # Most recent loans / views that make up a member's taste
+BLEND_CONTENT_WEIGHT = 0.3        # Share of the content ranking in the blended recommendations
+
+N_FEATURES = 2 ** 20
+# Repeats per token: an author or genre match says more than a shared description word
+FIELD_WEIGHTS = {"title": 2, "author": 3, "genre": 2, "description": 1}
+LOAN_WEIGHT, VIEW_WEIGHT = 5, 1   # Same signal weights as recommendation.recommend_books
+
+BOOK_FIELDS = (models.Book.title, models.Book.author, models.Book.genre, models.Book.description)
+WORD = re.compile(r"[^\W\d_]{2,}")
+
+_index = None
+_index_lock = threading.Lock()
+_last_sync = 0.0
+_missing_reported = False
+_merging = False
+
+
+def _words(text):
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    return [w for w in WORD.findall(text.lower()) if w not in ENGLISH_STOP_WORDS] if text else []
+
+
+def _features(fields):
+    """(title, author, genre, description) -> weighted token list"""
+    title, author, genre, description = fields
+    tokens = _words(title) * FIELD_WEIGHTS["title"] + _words(description) * FIELD_WEIGHTS["description"]
+    for name in (author or "").split(","):
+        if name.strip():
+            tokens += [f"author:{name.strip().lower()}"] * FIELD_WEIGHTS["author"]
+    if genre:
+        tokens += [f"genre:{genre.strip().lower()}"] * FIELD_WEIGHTS["genre"]
+    return tokens
+
+
+def _counts(rows):
+    """Raw hashed term counts, one CSR row per (title, author, genre, description)"""
+    import numpy as np
+    from sklearn.feature_extraction.text import HashingVectorizer
+    vectorizer = HashingVectorizer(
+        analyzer=_features, n_features=N_FEATURES, alternate_sign=False, norm=None, dtype=np.float32
+    )
+    return vectorizer.transform(rows)
+
+
+class ContentIndex:
+    def __init__(self, ids, base, idf, watermark=None):
+        import numpy as np
+        self.ids = ids                  # Sorted book ids, one per base row
+        self.base = base                # CSC (titles x N_FEATURES), rows L2-normalized
+        self.idf = idf                  # Per feature; 0 = dropped
+        self.watermark = watermark      # Newest books.updated_at already indexed
+        self.live = np.ones(len(ids), dtype=bool)
+        self.delta = {}                 # book_id -> 1-row CSR, titles changed since the base was built
+        self.delta_view = (np.empty(0, dtype=np.int64), None)  # (ids, CSC) snapshot for readers
+        self.base_view = (ids, base, self.live)                # Swapped in one assignment by merge()
+
+    @classmethod
+    def build(cls, ids, rows, watermark=None):
+        import numpy as np
+        counts = _counts(rows)
+        n = counts.shape[0]
+        df = np.bincount(counts.indices, minlength=N_FEATURES)
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        if n >= CONTENT_MAX_DF_MIN_TITLES:
+            idf[df > CONTENT_MAX_DF * n] = 0
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        index = cls(ids[order], None, idf, watermark)
+        index.base = index._weigh(counts)[order].tocsc()
+        index.base_view = (index.ids, index.base, index.live)
+        return index
+
+    def _weigh(self, counts):
+        from sklearn.preprocessing import normalize
+        counts.data *= self.idf[counts.indices]
+        counts.eliminate_zeros()
+        return normalize(counts, copy=False)
+
+    def vectorize(self, rows):
+        """L2-normalized TF-IDF rows (CSR) for (title, author, genre, description) tuples"""
+        return self._weigh(_counts(rows))
+
+    def upsert(self, book_ids, rows):
+        import numpy as np
+        vectors = self.vectorize(rows)
+        for i, book_id in enumerate(book_ids):
+            row = np.searchsorted(self.ids, book_id)
+            if row < len(self.ids) and self.ids[row] == book_id:
+                self.live[row] = False
+            self.delta[int(book_id)] = vectors[i]
+        self._publish_delta()
+
+    def remove(self, book_id):
+        import numpy as np
+        row = np.searchsorted(self.ids, book_id)
+        if row < len(self.ids) and self.ids[row] == book_id:
+            self.live[row] = False
+        if self.delta.pop(book_id, None) is not None:
+            self._publish_delta()
+
+    def _publish_delta(self):
+        import numpy as np
+        import scipy.sparse as sp
+        matrix = sp.vstack(list(self.delta.values())).tocsc() if self.delta else None
+        self.delta_view = (np.fromiter(self.delta, dtype=np.int64, count=len(self.delta)), matrix)
+
+    def merge(self):
+        """Folds the delta into a new base (readers keep using the old one until the swap)"""
+        import numpy as np
+        import scipy.sparse as sp
+        delta_ids = np.fromiter(self.delta, dtype=np.int64)
+        ids = np.concatenate([self.ids[self.live], delta_ids])
+        matrix = sp.vstack([self.base.tocsr()[self.live], *self.delta.values()]).tocsr()
+        order = np.argsort(ids, kind="stable")
+        self.ids, self.base = ids[order], matrix[order].tocsc()
+        self.live = np.ones(len(self.ids), dtype=bool)
+        self.base_view = (self.ids, self.base, self.live)
+        self.delta = {}
+        self.delta_view = (np.empty(0, dtype=np.int64), None)
+
+    def top_k(self, query, k, exclude=()):
+        """[(book_id, cosine)] best first, for a 1-row CSR query"""
+        import numpy as np
+        ids, base, live = self.base_view
+        delta_ids, delta = self.delta_view
+        if query.nnz == 0:
+            return []
+
+        # Inverted index: only the postings of the query's features are read
+        scores = base[:, query.indices] @ query.data
+        if not live.all():
+            scores[~live] = 0
+        wanted = min(k + len(exclude), len(scores))
+        candidates = []
+        if wanted:
+            top = np.argpartition(-scores, wanted - 1)[:wanted]
+            candidates = [(int(ids[r]), float(scores[r])) for r in top if scores[r] > 0]
+        if delta is not None:
+            delta_scores = delta[:, query.indices] @ query.data
+            candidates += [(int(b), float(s)) for b, s in zip(delta_ids, delta_scores) if s > 0]
+
+        candidates.sort(key=lambda c: -c[1])
+        results, seen = [], set(exclude)  # A title can be in both views for a moment during merge()
+        for book_id, score in candidates:
+            if book_id not in seen:
+                seen.add(book_id)
+                results.append((book_id, score))
+        return results[:k]
+
+    def save(self, path=CONTENT_INDEX_PATH):
+        import numpy as np
+        if self.delta:
+            self.merge()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"  # np.savez appends .npz otherwise
+        np.savez(
+            tmp, ids=self.ids, data=self.base.data, indices=self.base.indices, indptr=self.base.indptr,
+            shape=np.array(self.base.shape), idf=self.idf,
+            watermark=np.array(self.watermark.isoformat() if self.watermark else ""),
+        )
+        os.replace(tmp, path)  # Atomic: other workers never read a half-written file
+
+    @classmethod
+    def load(cls, path=CONTENT_INDEX_PATH):
+        import numpy as np
+        import scipy.sparse as sp
+        with np.load(path, allow_pickle=False) as f:
+            base = sp.csc_matrix((f["data"], f["indices"], f["indptr"]), shape=tuple(f["shape"]))
+            watermark = str(f["watermark"])
+            return cls(f["ids"], base, f["idf"], datetime.fromisoformat(watermark) if watermark else None)
+
+
+# ==========================================
+# Module-level index (one per worker process)
+# ==========================================
+
+def build_from_db(db, chunk=50000):
+    """Vectorizes the whole catalog"""
+    ids, rows = [], []
+    watermark = db.execute(select(func.max(models.Book.updated_at))).scalar()
+    for book_id, *fields in db.execute(
+        select(models.Book.id, *BOOK_FIELDS).execution_options(yield_per=chunk)
+    ):
+        ids.append(book_id)
+        rows.append(fields)
+    return ContentIndex.build(ids, rows, watermark)
+
+
+def _sync(index):
+    """Picks up titles added or edited (by any worker) since the index watermark"""
+    db = ReadSessionLocal()
+    try:
+        query = select(models.Book.id, *BOOK_FIELDS, models.Book.updated_at).where(models.Book.updated_at.is_not(None))
+        if index.watermark:
+            query = query.where(models.Book.updated_at >= index.watermark - timedelta(seconds=CONTENT_SYNC_LAG))
+        changed = db.execute(query).all()
+    finally:
+        db.close()
+    if changed:
+        index.upsert([row[0] for row in changed], [tuple(row[1:5]) for row in changed])
+        index.watermark = max(row[5] for row in changed)
+
+
+def _merge_later(index):
+    """Called with _index_lock held: starts the background merge once the delta is full"""
+    global _merging
+    if len(index.delta) >= CONTENT_DELTA_MAX and not _merging:
+        _merging = True
+        threading.Thread(target=_merge_and_save, args=(index,), name="content-index-merge", daemon=True).start()
+
+
+def _merge_and_save(index):
+    """Merges a copy of the delta into a new base and writes the file; changes made meanwhile stay in the delta"""
+    import numpy as np
+    global _merging
+    try:
+        with _index_lock:
+            ids, live, delta = index.ids, index.live.copy(), dict(index.delta)
+            merged = ContentIndex(ids, index.base, index.idf, index.watermark)
+        merged.live, merged.delta = live, delta
+        merged.merge()
+        merged.save()
+        with _index_lock:
+            # Titles upserted or removed while merging: masked in the new base, kept in the delta
+            stale = {b for b, vector in index.delta.items() if delta.get(b) is not vector}
+            stale |= set(delta) - set(index.delta)
+            stale |= set(ids[live & ~index.live].tolist())
+            index.ids, index.base = merged.ids, merged.base
+            index.live = np.ones(len(index.ids), dtype=bool)
+            rows = np.searchsorted(index.ids, np.fromiter(stale, dtype=np.int64, count=len(stale)))
+            rows = rows[rows < len(index.ids)]
+            index.live[rows[np.isin(index.ids[rows], list(stale))]] = False
+            index.base_view = (index.ids, index.base, index.live)
+            index.delta = {b: index.delta[b] for b in stale if b in index.delta}
+            index._publish_delta()
+    except Exception as e:
+        print(f"❌ Content index merge failed: {e!r}")
+    finally:
+        _merging = False
+
+
+def get_index():
+    """The worker's index, None until `python content_recommendation.py` has written the file"""
+    global _index, _last_sync, _missing_reported
+    if _index is None or time.monotonic() - _last_sync > CONTENT_SYNC_INTERVAL:
+        with _index_lock:
+            if _index is None:
+                if not os.path.exists(CONTENT_INDEX_PATH):
+                    if not _missing_reported:
+                        _missing_reported = True
+                        print("⚠️ No content index on disk: serving same-genre titles until "
+                              "`python content_recommendation.py` has built it")
+                    return None
+                _index = ContentIndex.load()
+            if time.monotonic() - _last_sync > CONTENT_SYNC_INTERVAL:
+                _sync(_index)
+                _merge_later(_index)
+                _last_sync = time.monotonic()
+    return _index
+
+
+def index_book(book):
+    """Called after create / import / update commit: visible at once in this worker"""
+    if _index is not None:
+        with _index_lock:
+            _index.upsert([book.id], [(book.title, book.author, book.genre, book.description)])
+            _merge_later(_index)
+
+
+def remove_book(book_id):
+    if _index is not None:
+        with _index_lock:
+            _index.remove(book_id)
+
+
+# ==========================================
+# Queries
+# ==========================================
+
+def similar_books(db, book, limit=5):
+    """book_ids most like this one, best first"""
+    index = get_index()
+    if index is None:
+        return same_genre_books(db, book, limit)
+    query = index.vectorize([(book.title, book.author, book.genre, book.description)])
+    return [book_id for book_id, _ in index.top_k(query, limit, exclude={book.id})]
+
+
+def same_genre_books(db, book, limit=5):
+    """Stand-in before the index file exists: the most popular titles of the book's genre, then any popular ones"""
+    ids = db.execute(
+        select(models.BookPopularity.book_id)
+        .join(models.Book, models.Book.id == models.BookPopularity.book_id)
+        .where(models.Book.genre == book.genre, models.Book.id != book.id)
+        .order_by(models.BookPopularity.score.desc()).limit(limit)
+    ).scalars().all() if book.genre else []
+    for book_id in popularity.popular_book_ids(limit + len(ids) + 1):
+        if len(ids) >= limit:
+            break
+        if book_id != book.id and book_id not in ids:
+            ids.append(book_id)
+    return ids
+
+
+def recommend_for_member(db, member_id, limit=5):
+    """Titles closest to the member's recent loans (x5) and views (x1); [] without history"""
+    import numpy as np
+    weights = {}
+    loans = db.execute(
+        select(models.BookItem.book_id)
+        .join(models.Loan, models.Loan.book_item_id == models.BookItem.barcode)
+        .where(models.Loan.member_id == member_id)
+        .order_by(models.Loan.id.desc()).limit(CONTENT_PROFILE_SIZE)
+    ).scalars().all()
+    views = db.execute(
+        select(models.BookView.book_id)
+        .where(models.BookView.member_id == member_id)
+        .order_by(models.BookView.id.desc()).limit(CONTENT_PROFILE_SIZE)
+    ).scalars().all()
+    for book_id, weight in [(b, LOAN_WEIGHT) for b in loans] + [(b, VIEW_WEIGHT) for b in views]:
+        weights[book_id] = weights.get(book_id, 0) + weight
+    if not weights:
+        return []
+
+    books = db.execute(select(models.Book.id, *BOOK_FIELDS).where(models.Book.id.in_(weights))).all()
+    index = get_index()
+    if not books or index is None:
+        return []
+    vectors = index.vectorize([tuple(b[1:]) for b in books])
+    profile = vectors.multiply(np.array([[weights[b[0]]] for b in books], dtype=np.float32)).sum(axis=0)
+    from sklearn.preprocessing import normalize
+    import scipy.sparse as sp
+    query = normalize(sp.csr_matrix(profile))
+    return [book_id for book_id, _ in index.top_k(query, limit, exclude=set(weights))]
+
+
+def blend(collaborative_ids, content_ids, limit=5, content_weight=BLEND_CONTENT_WEIGHT):
+    """Weighted reciprocal-rank fusion of two ranked id lists (the engines' scores aren't comparable)"""
+    scores = {}
+    for ids, weight in ((collaborative_ids, 1 - content_weight), (content_ids, content_weight)):
+        for rank, book_id in enumerate(ids):
+            scores[book_id] = scores.get(book_id, 0) + weight / (60 + rank)
+    return sorted(scores, key=lambda b: -scores[b])[:limit]
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=f"Vectorize the catalog into {CONTENT_INDEX_PATH}").parse_args()
+    started = time.perf_counter()
+    session = ReadSessionLocal()
+    try:
+        built = build_from_db(session)
+    finally:
+        session.close()
+    built.save()
+    print(f"✅ Content index: {len(built.ids)} titles, {built.base.nnz} features in {time.perf_counter() - started:.1f}s "
+          f"-> {CONTENT_INDEX_PATH}")
@@ -0,0 +1,174 @@
+"""
+Google Books lookups for the catalog import (main.import_book, bulk import, seed.py).
+
+- One pooled httpx.AsyncClient per event loop: keep-alive connections are reused across
+  lookups, and every request has a timeout.
+- Retries with exponential backoff (plus jitter) on timeouts, connection errors, 429 and 5xx;
+  Retry-After is honoured when Google sends it.
+- On-disk cache keyed by the normalized query (an ISBN lookup is the query "isbn:<digits>"):
+  found books are kept GOOGLE_BOOKS_CACHE_TTL, misses GOOGLE_BOOKS_MISS_TTL. Re-importing a list,
+  or reseeding, doesn't go back to Google.
+- fetch_books runs many lookups at once, at most GOOGLE_BOOKS_CONCURRENCY in flight.
+
+GOOGLE_BOOKS_URL can point at a local stub server (see benchmarks/google_import.py).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+
+import httpx
+
+import metrics
+
+GOOGLE_BOOKS_URL = os.getenv("GOOGLE_BOOKS_URL", "https://www.googleapis.com/books/v1/volumes")
+GOOGLE_BOOKS_API_KEY = os.getenv("GOOGLE_BOOKS_API_KEY")  # Optional: higher quota
+GOOGLE_BOOKS_CACHE_DIR = os.getenv("GOOGLE_BOOKS_CACHE_DIR", "data/google_books")
+GOOGLE_BOOKS_CACHE_TTL = 30 * 24 * 3600   # Seconds a found book is reused
+GOOGLE_BOOKS_MISS_TTL = 24 * 3600          # ... and a "not found" (the book may be added)
+GOOGLE_BOOKS_TIMEOUT = float(os.getenv("GOOGLE_BOOKS_TIMEOUT", "5"))   # Seconds per attempt
+GOOGLE_BOOKS_RETRIES = 3                   # Extra attempts after a retryable failure
+GOOGLE_BOOKS_BACKOFF = 0.5                 # Seconds before the first retry, doubled each time
+GOOGLE_BOOKS_MAX_BACKOFF = 10
+GOOGLE_BOOKS_CONCURRENCY = int(os.getenv("GOOGLE_BOOKS_CONCURRENCY", "8"))
+
+_client = None
+_client_loop = None
+
+
+class GoogleBooksError(Exception):
+    """Google Books didn't answer (after retries) or answered with an error"""
+
+
+def normalize_isbn(value: str) -> str:
+    """'978-0-14-044913-6' -> '9780140449136' (an ISBN-10 check digit may be X)"""
+    return re.sub(r"[^0-9X]", "", value.upper())
+
+
+def parse_volume(data):
+    """First result of a volumes search as Book columns; None when there is none"""
+    if not data.get("items"):
+        return None
+    info = data["items"][0]["volumeInfo"]
+    return {
+        "title": info.get("title"),
+        "author": ", ".join(info.get("authors", ["Unknown"])),
+        "isbn": next((id['identifier'] for id in info.get("industryIdentifiers", []) if id['type'] == 'ISBN_13'), None),
+        "publisher": info.get("publisher"),
+        "publication_year": info.get("publishedDate", "")[:4] if info.get("publishedDate") else None,
+        "description": info.get("description"),
+        "cover_image_url": info.get("imageLinks", {}).get("thumbnail"),
+        "genre": info.get("categories", ["General"])[0]
+    }
+
+
+# ==========================================
+# On-disk cache: one small JSON file per query
+# ==========================================
+
+def _cache_path(query):
+    key = hashlib.sha256(" ".join(query.lower().split()).encode()).hexdigest()
+    return os.path.join(GOOGLE_BOOKS_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def cached(query):
+    """(hit, book or None)"""
+    try:
+        with open(_cache_path(query)) as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return False, None
+    ttl = GOOGLE_BOOKS_CACHE_TTL if entry["book"] else GOOGLE_BOOKS_MISS_TTL
+    if time.time() - entry["fetched_at"] > ttl:
+        return False, None
+    return True, entry["book"]
+
+
+def _store(query, book):
+    path = _cache_path(query)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({"query": query, "fetched_at": time.time(), "book": book}, f)
+    os.replace(tmp, path)
+
+
+# ==========================================
+# HTTP
+# ==========================================
+
+def get_client():
+    """The pooled client of the running event loop (a client can't be shared between loops)"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=GOOGLE_BOOKS_TIMEOUT,
+            limits=httpx.Limits(max_connections=GOOGLE_BOOKS_CONCURRENCY, max_keepalive_connections=GOOGLE_BOOKS_CONCURRENCY),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close():
+    """Called on shutdown (main.lifespan) / after a script's last lookup"""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+        _client, _client_loop = None, None
+
+
+def _retry_delay(attempt, response=None):
+    if response is not None and response.headers.get("Retry-After", "").isdigit():
+        return min(float(response.headers["Retry-After"]), GOOGLE_BOOKS_MAX_BACKOFF)
+    return min(GOOGLE_BOOKS_BACKOFF * 2 ** attempt, GOOGLE_BOOKS_MAX_BACKOFF) * random.uniform(0.5, 1.5)
+
+
+async def _get(query):
+    params = {"q": query}
+    if GOOGLE_BOOKS_API_KEY:
+        params["key"] = GOOGLE_BOOKS_API_KEY
+    client = get_client()
+    for attempt in range(GOOGLE_BOOKS_RETRIES + 1):
+        response = None
+        try:
+            response = await client.get(GOOGLE_BOOKS_URL, params=params)
+        except httpx.TransportError as e:  # Timeouts, refused / dropped connections
+            error = f"{type(e).__name__}: {e}"
+        else:
+            if response.status_code == 200:
+                return response.json()
+            error = f"HTTP {response.status_code}"
+            if response.status_code != 429 and response.status_code < 500:
+                break  # Bad request / key: retrying won't help
+        if attempt < GOOGLE_BOOKS_RETRIES:
+            metrics.GOOGLE_BOOKS_LOOKUPS.labels("retried").inc()
+            await asyncio.sleep(_retry_delay(attempt, response))
+    metrics.GOOGLE_BOOKS_LOOKUPS.labels("failed").inc()
+    raise GoogleBooksError(f"Google Books lookup '{query}' failed: {error}")
+
+
+async def fetch_book(query: str):
+    """Book columns for the first match of a search ('isbn:...', 'intitle:...', free text); None if no match"""
+    hit, book = cached(query)
+    if hit:
+        metrics.GOOGLE_BOOKS_LOOKUPS.labels("cached").inc()
+        return book
+    book = parse_volume(await _get(query))
+    metrics.GOOGLE_BOOKS_LOOKUPS.labels("found" if book else "not_found").inc()
+    _store(query, book)
+    return book
+
+
+async def fetch_books(queries, concurrency=GOOGLE_BOOKS_CONCURRENCY):
+    """fetch_book for each query, at most `concurrency` at a time; a failed lookup yields its GoogleBooksError"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            return await fetch_book(query)
+
+    return await asyncio.gather(*(one(q) for q in queries), return_exceptions=True)
@@ -0,0 +1,92 @@
+"""
+HTTP caching for the catalog: ETag / If-None-Match on GET /api/books and GET /api/books/{id}.
+
+ETags derive from catalog_version, a single-row counter that is bumped in the
+same transaction as any flush that edits a Book or adds / removes / moves a
+BookItem. Copy status flips (issue, return, holds) don't bump it: that would
+lock the one counter row in every circulation transaction and expire every
+cached page on every loan. available_copies rides on a time window instead:
+the ETag also carries now // CATALOG_AVAILABILITY_MAX_AGE, so availability is
+at most that many seconds stale (0 turns the ETags off).
+
+Checking If-None-Match costs one primary-key read; a match answers 304 without
+running the catalog query. Writes that bypass the ORM unit of work (bulk
+INSERTs, synth.py's COPY) must call bump_catalog_version() themselves.
+"""
+import os
+import time
+import zlib
+from itertools import chain
+
+from fastapi import Response
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+import models
+
+CATALOG_CACHE_CONTROL = "no-cache"  # Keep a copy, but revalidate every time (a 304 is one PK read)
+CATALOG_AVAILABILITY_MAX_AGE = int(os.getenv("CATALOG_AVAILABILITY_MAX_AGE", "30"))  # Seconds
+
+
+def bump_catalog_version(connection):
+    connection.execute(
+        update(models.CatalogVersion).where(models.CatalogVersion.id == 1)
+        .values(version=models.CatalogVersion.version + 1)
+    )
+
+
+def _is_catalog_change(session, obj):
+    if obj not in session.dirty:
+        return isinstance(obj, (models.Book, models.BookItem))
+    if isinstance(obj, models.Book):
+        return session.is_modified(obj, include_collections=False)
+    if isinstance(obj, models.BookItem):
+        # A status flip is circulation, not a catalog edit (see the module docstring)
+        state = inspect(obj)
+        return any(state.attrs[attr.key].history.has_changes()
+                   for attr in state.mapper.column_attrs if attr.key != "status")
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_on_catalog_change(session, flush_context):
+    # new / dirty / deleted still hold the pre-flush state here
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if _is_catalog_change(session, obj):
+            bump_catalog_version(session.connection())
+            return
+
+
+async def catalog_etag(db, variant: str):
+    """Weak ETag for one catalog view (variant = query string / book id). None if there is no counter row."""
+    if CATALOG_AVAILABILITY_MAX_AGE <= 0:
+        return None
+    version = (await db.execute(
+        select(models.CatalogVersion.version).where(models.CatalogVersion.id == 1)
+    )).scalar()
+    if version is None:
+        return None
+    # Weak: the compression middleware serves different bytes for the same representation
+    window = int(time.time()) // CATALOG_AVAILABILITY_MAX_AGE
+    return f'W/"{version}.{window}-{zlib.crc32(variant.encode()):08x}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not etag or not header:
+        return False
+    if header.strip() == "*":
+        return True
+    wanted = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+
+def set_cache_headers(response, etag):
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return response
+
+
+def not_modified(etag):
+    return set_cache_headers(Response(status_code=304), etag)
@@ -0,0 +1,183 @@
+"""
+Per-request SQL instrumentation.
+
+SQLAlchemy cursor events record every statement issued while a request is
+being served (sync and async engines alike). At the end of the request the
+middleware:
+  - logs one structured JSON line (logger 'library.sql'),
+  - adds an X-SQL-Stats response header when asked to (opt-in),
+  - folds the numbers into a per-route table served at /api/admin/perf.
+Statements repeated N_PLUS_ONE_THRESHOLD+ times in one request are flagged as
+N+1 suspects (typically a lazy relationship load inside a loop).
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_STATS_HEADER = os.getenv("SQL_STATS_HEADER", "0") == "1"  # Always send X-SQL-Stats
+SQL_STATS_LOG = os.getenv("SQL_STATS_LOG", "1") == "1"        # One JSON log line per request
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+logger = logging.getLogger("library.sql")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RequestSQLStats:
+    """Statements issued while serving one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.db_time += elapsed
+        self.statements[statement] += 1
+
+    def n_plus_one_suspects(self):
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= N_PLUS_ONE_THRESHOLD]
+
+    def duplicate_statements(self):
+        """Executions beyond the first of each distinct statement"""
+        return sum(n - 1 for n in self.statements.values())
+
+
+_current_stats = contextvars.ContextVar("request_sql_stats", default=None)
+
+
+def start_request():
+    stats = RequestSQLStats()
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.record(statement, time.perf_counter() - started.pop())
+
+
+# --- Per-route aggregation ---
+
+class RouteTable:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def add(self, route: str, stats: RequestSQLStats, elapsed: float):
+        suspects = stats.n_plus_one_suspects()
+        with self.lock:
+            row = self.routes.setdefault(route, {
+                "requests": 0, "queries": 0, "max_queries": 0, "db_time": 0.0,
+                "total_time": 0.0, "duplicate_statements": 0, "n_plus_one_requests": 0,
+                "n_plus_one_suspects": Counter(),
+            })
+            row["requests"] += 1
+            row["queries"] += stats.count
+            row["max_queries"] = max(row["max_queries"], stats.count)
+            row["db_time"] += stats.db_time
+            row["total_time"] += elapsed
+            row["duplicate_statements"] += stats.duplicate_statements()
+            if suspects:
+                row["n_plus_one_requests"] += 1
+                for stmt, n in suspects:
+                    row["n_plus_one_suspects"][shorten(stmt)] = max(row["n_plus_one_suspects"][shorten(stmt)], n)
+
+    def report(self):
+        with self.lock:
+            rows = []
+            for route, row in self.routes.items():
+                rows.append({
+                    "route": route,
+                    "requests": row["requests"],
+                    "avg_queries": round(row["queries"] / row["requests"], 2),
+                    "max_queries": row["max_queries"],
+                    "avg_db_ms": round(row["db_time"] / row["requests"] * 1000, 3),
+                    "avg_total_ms": round(row["total_time"] / row["requests"] * 1000, 3),
+                    "db_time_share": round(row["db_time"] / row["total_time"], 3) if row["total_time"] else 0.0,
+                    "duplicate_statements": row["duplicate_statements"],
+                    "n_plus_one_requests": row["n_plus_one_requests"],
+                    "n_plus_one_suspects": [
+                        {"statement": stmt, "max_repeats": n}
+                        for stmt, n in row["n_plus_one_suspects"].most_common(5)
+                    ],
+                })
+        return sorted(rows, key=lambda r: r["avg_db_ms"] * r["requests"], reverse=True)
+
+    def reset(self):
+        with self.lock:
+            self.routes.clear()
+
+
+route_table = RouteTable()
+
+
+def shorten(statement: str, limit: int = 200) -> str:
+    flat = re.sub(r"\s+", " ", statement).strip()
+    return flat if len(flat) <= limit else flat[:limit] + "..."
+
+
+def route_name(request) -> str:
+    route = request.scope.get("route")
+    return f"{request.method} {route.path}" if route is not None else f"{request.method} <unmatched>"
+
+
+async def sql_stats_middleware(request, call_next):
+    stats, token = start_request()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        end_request(token)
+    elapsed = time.perf_counter() - started
+
+    route = route_name(request)
+    route_table.add(route, stats, elapsed)
+    suspects = stats.n_plus_one_suspects()
+
+    if SQL_STATS_HEADER or request.headers.get("x-sql-stats") == "1":
+        response.headers["X-SQL-Stats"] = (
+            f"queries={stats.count}; db_ms={stats.db_time * 1000:.2f}; "
+            f"duplicates={stats.duplicate_statements()}; n_plus_one={len(suspects)}"
+        )
+
+    if SQL_STATS_LOG:
+        logger.info(json.dumps({
+            "event": "request_sql",
+            "route": route,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(stats.db_time * 1000, 3),
+            "total_ms": round(elapsed * 1000, 3),
+            "duplicates": stats.duplicate_statements(),
+            "n_plus_one": [{"statement": shorten(stmt), "repeats": n} for stmt, n in suspects],
+        }))
+
+    return response
@@ -0,0 +1,174 @@
+"""
+Columnar snapshot of the recommender's training signal: one row per loan and per book view,
+
+    member_id (int32), book_id (int32), weight (float32), timestamp (int64, Unix seconds), view (bool)
+
+stored as plain .npy files that training memory-maps instead of querying Postgres. Loans are
+joined to book_items for the title; a loan's timestamp is its issue date at midnight UTC.
+
+    INTERACTION_SNAPSHOT_DIR/
+        MANIFEST        json: segments in order, weights used, per-table export state
+        seg-<n>/        one .npy per column; never modified once MANIFEST lists it
+
+Each export only appends what is new since the last one, as a new segment. Loans and views only
+ever get new rows with higher serial ids, so the state per table is the highest id exported plus
+the ids below it that weren't visible yet (a transaction can commit after a later id did); those
+are retried for SNAPSHOT_OVERLAP ids, then given up on (rolled back). Rows deleted later stay in
+the snapshot: main.cleanup_old_views drops book views after a day, so training_rows() keeps only
+the views of the last VIEW_WINDOW seconds, the same signal the live tables hold. Past SNAPSHOT_MAX_SEGMENTS the
+segments are compacted into one. A full export starts over: after --full, when the weights
+or columns changed, or when the tables went backwards (database reloaded).
+
+    python interaction_snapshot.py           # append since the last export
+    python interaction_snapshot.py --full    # rewrite from scratch
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+from sqlalchemy import select, func, cast, BigInteger, literal
+
+from database import ReadSessionLocal
+import models
+
+SNAPSHOT_DIR = os.getenv("INTERACTION_SNAPSHOT_DIR", "data/interactions")
+SNAPSHOT_OVERLAP = 1000      # Ids below the watermark still watched for late commits
+SNAPSHOT_MAX_SEGMENTS = 16   # Appends beyond this are compacted into one segment
+SNAPSHOT_CHUNK = 100_000     # Rows fetched per round trip
+VIEW_WINDOW = 24 * 3600      # Seconds of book views used for training (main.cleanup_old_views deletes older ones)
+COLUMNS = {"member_id": "int32", "book_id": "int32", "weight": "float32", "timestamp": "int64", "view": "bool"}
+
+
+def _sources(loan_weight, view_weight):
+    """{table: (id column, select of id + COLUMNS)}"""
+    loans = select(
+        models.Loan.id, models.Loan.member_id, models.BookItem.book_id, literal(loan_weight),
+        cast(func.extract("epoch", models.Loan.issue_date), BigInteger), literal(0),
+    ).join(models.BookItem, models.Loan.book_item_id == models.BookItem.barcode)\
+        .where(models.Loan.member_id.is_not(None), models.Loan.issue_date.is_not(None))
+    views = select(
+        models.BookView.id, models.BookView.member_id, models.BookView.book_id, literal(view_weight),
+        cast(func.extract("epoch", models.BookView.view_date), BigInteger), literal(1),
+    ).where(models.BookView.member_id.is_not(None), models.BookView.book_id.is_not(None),
+            models.BookView.view_date.is_not(None))
+    return {"loans": (models.Loan.id, loans), "book_views": (models.BookView.id, views)}
+
+
+def read_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, "MANIFEST")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, "MANIFEST")
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+    # Segments no longer listed (compacted, or from before a full export)
+    for name in os.listdir(snapshot_dir):
+        if name.startswith("seg-") and name not in manifest["segments"]:
+            shutil.rmtree(os.path.join(snapshot_dir, name), ignore_errors=True)
+
+
+def _write_segment(snapshot_dir, columns):
+    import numpy as np
+    name = f"seg-{time.time_ns()}"
+    os.makedirs(os.path.join(snapshot_dir, name))
+    for column, dtype in COLUMNS.items():
+        np.save(os.path.join(snapshot_dir, name, f"{column}.npy"), np.asarray(columns[column], dtype=dtype))
+    return name
+
+
+def _fetch(db, id_column, query, watermark, pending, chunk):
+    """New rows of one table as an (n, 1 + len(COLUMNS)) int64 array: id + COLUMNS"""
+    import numpy as np
+    condition = id_column > watermark
+    if pending:
+        condition = condition | id_column.in_(pending)
+    # Plain tuples: numpy is ~20x slower reading Row objects
+    parts = [np.array([tuple(r) for r in rows], dtype=np.int64).reshape(-1, 1 + len(COLUMNS))
+             for rows in db.execute(query.where(condition).execution_options(yield_per=chunk)).partitions()]
+    return np.concatenate(parts) if parts else np.empty((0, 1 + len(COLUMNS)), dtype=np.int64)
+
+
+def export(db, loan_weight, view_weight, full=False, snapshot_dir=SNAPSHOT_DIR, chunk=SNAPSHOT_CHUNK):
+    """Appends loans / views added since the last export as a new segment; returns the rows written"""
+    import numpy as np
+    weights = {"loans": loan_weight, "book_views": view_weight}
+    sources = _sources(loan_weight, view_weight)
+    manifest = None if full else read_manifest(snapshot_dir)
+    if manifest is not None:
+        stale = manifest["weights"] != weights or manifest.get("columns") != list(COLUMNS) or any(
+            (db.execute(select(func.max(id_column))).scalar() or 0) < manifest["tables"][table]["watermark"]
+            for table, (id_column, _) in sources.items()
+        )
+        if stale:
+            manifest = None
+    if manifest is None:
+        os.makedirs(snapshot_dir, exist_ok=True)
+        manifest = {"weights": weights, "columns": list(COLUMNS), "segments": [],
+                    "tables": {table: {"watermark": 0, "pending": []} for table in sources}}
+
+    fetched = []
+    for table, (id_column, query) in sources.items():
+        state = manifest["tables"][table]
+        rows = _fetch(db, id_column, query, state["watermark"], state["pending"], chunk)
+        ids = rows[:, 0]
+        watermark = max(state["watermark"], int(ids.max()) if len(ids) else 0)
+        # Ids that should exist by now but weren't visible: retried next time while still recent
+        expected = set(state["pending"]) | set(range(max(state["watermark"], watermark - SNAPSHOT_OVERLAP) + 1, watermark + 1))
+        state["pending"] = sorted(i for i in expected - set(ids.tolist()) if i > watermark - SNAPSHOT_OVERLAP)
+        state["watermark"] = watermark
+        fetched.append(rows)
+
+    rows = np.concatenate(fetched)
+    if len(rows):
+        manifest["segments"].append(_write_segment(snapshot_dir, dict(zip(COLUMNS, rows[:, 1:].T))))
+    if len(manifest["segments"]) > SNAPSHOT_MAX_SEGMENTS:
+        manifest["segments"] = [_write_segment(snapshot_dir, load(snapshot_dir, manifest))]
+    _write_manifest(snapshot_dir, manifest)
+    return len(rows)
+
+
+def load(snapshot_dir=SNAPSHOT_DIR, manifest=None):
+    """{column: array} memory-mapped (concatenated when there are several segments); None before the first export"""
+    import numpy as np
+    manifest = manifest or read_manifest(snapshot_dir)
+    if manifest is None or not manifest["segments"] or manifest.get("columns") != list(COLUMNS):
+        return None  # Nothing exported yet, or in an older layout (the next export rewrites it)
+    segments = [
+        {column: np.load(os.path.join(snapshot_dir, name, f"{column}.npy"), mmap_mode="r") for column in COLUMNS}
+        for name in manifest["segments"]
+    ]
+    if len(segments) == 1:
+        return segments[0]
+    return {column: np.concatenate([s[column] for s in segments]) for column in COLUMNS}
+
+
+def training_rows(columns, view_window=VIEW_WINDOW, now=None):
+    """Every loan plus the views of the last view_window seconds (what book_views still holds)"""
+    keep = ~columns["view"] | (columns["timestamp"] >= (now or time.time()) - view_window)
+    if keep.all():
+        return columns
+    return {column: values[keep] for column, values in columns.items()}
+
+
+if __name__ == "__main__":
+    from batch_recommendation import LOAN_POINTS, VIEW_POINTS
+    parser = argparse.ArgumentParser(description=f"Export loans / views to {SNAPSHOT_DIR} for training")
+    parser.add_argument("--full", action="store_true", help="Rewrite the snapshot from scratch")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    session = ReadSessionLocal()
+    try:
+        written = export(session, LOAN_POINTS, VIEW_POINTS, full=args.full)
+    finally:
+        session.close()
+    segments = read_manifest()["segments"]
+    print(f"✅ Interaction snapshot: {written:,} rows appended in {time.perf_counter() - started:.1f}s "
+          f"({len(segments)} segments) -> {SNAPSHOT_DIR}")
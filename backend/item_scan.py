@@ -0,0 +1,126 @@
+"""
+Barcode scan at the circulation desk (GET /api/items/{barcode}/details) in one query.
+
+The item, its title and the active loan with the borrower's name (Borrowed items) come from one
+statement; only a copy sitting on the hold shelf (Reserved) needs a second one for the members
+whose hold is waiting on it.
+
+Results are kept ITEM_SCAN_CACHE_TTL seconds (0 turns the cache off), per worker. Any commit
+that touched the item or one of its loans drops its entry; hold / member changes drop them all
+(they change reserved_for / names of other items). Both hooks are ORM session events, like
+http_cache.py, so issue / return / renew / cancel / the scheduler need no extra calls. Another
+worker's writes show up here after at most the TTL.
+"""
+import os
+from itertools import chain
+
+from sqlalchemy import and_, event, select
+from sqlalchemy.orm import Session
+
+from cache import Cache
+import models
+
+ITEM_SCAN_CACHE_TTL = float(os.getenv("ITEM_SCAN_CACHE_TTL", "10"))
+ITEM_SCAN_CACHE_SIZE = 10000      # Barcodes kept per worker
+
+item_scan_cache = Cache("item_scan", ttl=ITEM_SCAN_CACHE_TTL, max_entries=ITEM_SCAN_CACHE_SIZE)
+
+_TOUCHED = "item_scan_touched"
+_ALL = object()
+_generation = 0   # Bumped by every invalidation: a scan that raced a commit isn't cached
+
+
+def scan_query(barcode):
+    # Borrower name as a correlated subquery: a fourth joined table costs more to plan than it saves
+    borrower_name = (select(models.Member.full_name).where(models.Member.id == models.Loan.member_id)
+                     .scalar_subquery())
+    Item = models.BookItem
+    return (
+        select(Item.barcode, Item.status, Item.book_id, models.Book.title, models.Book.author,
+               models.Book.cover_image_url, models.Loan.member_id, borrower_name, models.Loan.due_date)
+        .join(models.Book, models.Book.id == Item.book_id)
+        .outerjoin(models.Loan, and_(models.Loan.book_item_id == Item.barcode, models.Loan.status == "Active",
+                                     Item.status.in_(["Borrowed", "Overdue"])))
+        .where(Item.barcode == barcode)
+    )
+
+
+def holders_query(book_id):
+    """Members whose hold on the title is waiting on the shelf (only asked for Reserved copies)"""
+    return (
+        select(models.Reservation.member_id, models.Member.full_name)
+        .join(models.Member, models.Member.id == models.Reservation.member_id)
+        .where(models.Reservation.book_id == book_id, models.Reservation.status == "Fulfilled")
+        .order_by(models.Reservation.reservation_date)
+    )
+
+
+def to_detail(row, holders=()):
+    """scan_query row + holders_query rows -> BookItemDetail dict"""
+    barcode, status, _, title, author, cover, borrower_id, borrower_name, due_date = row
+    return {
+        "barcode": barcode,
+        "status": status,
+        "book_title": title,
+        "book_author": author,
+        "book_cover": cover,
+        "reserved_for": [f"{name} (ID: {member_id})" for member_id, name in holders],
+        "current_borrower_id": borrower_id,
+        "current_borrower_name": borrower_name,
+        "due_date": due_date,
+    }
+
+
+async def resolve(db, barcode):
+    if ITEM_SCAN_CACHE_TTL > 0:
+        hit, detail = item_scan_cache.peek(barcode)
+        if hit:
+            return detail
+    generation = _generation
+    row = (await db.execute(scan_query(barcode))).first()
+    if row is None:
+        return None
+    holders = (await db.execute(holders_query(row.book_id))).all() if row.status == "Reserved" else ()
+    detail = to_detail(row, holders)
+    if ITEM_SCAN_CACHE_TTL > 0 and generation == _generation:
+        item_scan_cache.put(barcode, detail)
+    return detail
+
+
+# ==========================================
+# Invalidation
+# ==========================================
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched(session, flush_context):
+    touched = session.info.setdefault(_TOUCHED, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if obj in session.dirty and not session.is_modified(obj, include_collections=False):
+            continue
+        if isinstance(obj, models.BookItem):
+            touched.add(obj.barcode)
+        elif isinstance(obj, models.Loan):
+            touched.add(obj.book_item_id)
+        elif isinstance(obj, models.Reservation) and not (obj in session.new and obj.status == "Pending"):
+            touched.add(_ALL)  # A hold was fulfilled / completed / canceled: reserved_for of the title's copies
+        elif isinstance(obj, models.Member) and obj not in session.new:
+            touched.add(_ALL)  # Renamed borrower / holder
+
+
+@event.listens_for(Session, "after_commit")
+def _forget_touched(session):
+    global _generation
+    touched = session.info.pop(_TOUCHED, None)
+    if not touched:
+        return
+    _generation += 1
+    if _ALL in touched:
+        item_scan_cache.invalidate()
+    else:
+        for barcode in touched:
+            item_scan_cache.invalidate(barcode)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_touched(session):
+    session.info.pop(_TOUCHED, None)
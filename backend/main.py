@@ -1,23 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks # <--- 1. Add BackgroundTasks
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks, Query, Response, Request, UploadFile, File, Form # <--- 1. Add BackgroundTasks
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-import requests
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, or_, and_, select, case
+from sqlalchemy.exc import IntegrityError
 import os
-from typing import Union
+import base64
+import threading
+from collections import Counter
+from typing import Union, Optional
 
 
 from contextlib import asynccontextmanager # Add this
 from scheduler import scheduler            # Add this
 # Import our local modules
-from database import engine, Base, get_db
+from database import get_db, get_async_db, get_read_db, get_async_read_db, pool_stats, SessionLocal
 import models
 import schemas
 from passlib.context import CryptContext
 from datetime import timedelta, date, datetime
 import recommendation
+import instrumentation
+import metrics
+import streaming
+import http_cache
+import popularity
+import content_recommendation
+import google_books
+import catalog_import
+import member_search
+import item_scan
+import member_overview
+from compression import CompressionMiddleware, PrecompressedStaticFiles
 
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -32,18 +47,35 @@ MAX_LOANS_PER_MEMBER = 5
 MAX_FINE_THRESHOLD = 10.0 # If user owes > $10, block borrowing
 HOLD_EXPIRY_DAYS = 3      # Reservations expire after 3 days
 
-# Create Tables
-Base.metadata.create_all(bind=engine)
+# Workers load scikit-learn and start the recommender process pool on their first recommendation.
+# Set to 1 on workers dedicated to /api/recommendations to do both in the background at startup instead.
+PRELOAD_RECOMMENDER = os.getenv("PRELOAD_RECOMMENDER", "0") == "1"
+PRELOAD_MEMBER_INDEX = os.getenv("PRELOAD_MEMBER_INDEX", "0") == "1"  # Only used without pg_trgm
+
+RECOMMENDATION_LIMIT = 5  # Titles returned by /api/recommendations
+
+BULK_IMPORT_MAX = 1000    # ISBNs per POST /api/books/import/bulk
+
+NOTIFICATION_PAGE_SIZE = 20
+MAX_NOTIFICATION_PAGE_SIZE = 100
+
+# Schema is owned by Alembic (backend/migrations): run `alembic upgrade head` before starting the app
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- Startup ---
     print("🚀 System Starting... Initializing Scheduler...")
     scheduler.start()
+    if PRELOAD_RECOMMENDER:
+        threading.Thread(target=recommendation.warm_up, daemon=True).start()
+    if PRELOAD_MEMBER_INDEX:
+        threading.Thread(target=member_search.warm_up, daemon=True).start()
     yield
     # --- Shutdown ---
     print("🛑 System Shutting Down... Stopping Scheduler...")
     scheduler.shutdown()
+    recommendation.shutdown_pool()
+    await google_books.close()
 
 app = FastAPI(lifespan=lifespan)
 # CORS (Allowed for development)
@@ -53,7 +85,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Notification inbox paging, read by the browser across origins
 )
+# gzip / brotli for text responses >= COMPRESS_MIN_SIZE (see compression.py)
+app.add_middleware(CompressionMiddleware)
+# Per-request query count / DB time / N+1 detection (see instrumentation.py)
+app.middleware("http")(instrumentation.sql_stats_middleware)
+# Prometheus latency / status / in-flight metrics (see metrics.py)
+app.middleware("http")(metrics.metrics_middleware)
     
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -73,15 +112,14 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """
-    Decodes the token, extracts user ID/Role, and verifies they exist.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def decode_access_token(token: str):
+    """Returns (email, user model class) for a valid token"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -93,40 +131,54 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 
     # Check DB based on role
     if role == "Librarian" or role == "Admin":
-        user = db.query(models.Librarian).filter(models.Librarian.email == email).first()
-    else:
-        user = db.query(models.Member).filter(models.Member.email == email).first()
+        return email, models.Librarian
+    return email, models.Member
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """
+    Decodes the token, extracts user ID/Role, and verifies they exist.
+    """
+    email, user_model = decode_access_token(token)
+    user = db.query(user_model).filter(user_model.email == email).first()
         
     if user is None:
         raise credentials_exception
         
     return user
-  
-# --- Google Books Helper Function ---
-def fetch_google_book(query: str):
-    """Searches Google Books API and returns the first result formatted as a dict"""
-    api_url = f"https://www.googleapis.com/books/v1/volumes?q={query}"
-    response = requests.get(api_url)
-    data = response.json()
-
-    if "items" not in data:
-        return None
-
-    # Get first result
-    info = data["items"][0]["volumeInfo"]
-    
-    return {
-        "title": info.get("title"),
-        "author": ", ".join(info.get("authors", ["Unknown"])),
-        "isbn": next((id['identifier'] for id in info.get("industryIdentifiers", []) if id['type'] == 'ISBN_13'), None),
-        "publisher": info.get("publisher"),
-        "publication_year": info.get("publishedDate", "")[:4] if info.get("publishedDate") else None,
-        "description": info.get("description"),
-        "cover_image_url": info.get("imageLinks", {}).get("thumbnail"),
-        "genre": info.get("categories", ["General"])[0]
-    }
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Same as get_current_user, for the async endpoints"""
+    email, user_model = decode_access_token(token)
+    user = (await db.execute(select(user_model).filter(user_model.email == email))).scalars().first()
+
+    if user is None:
+        raise credentials_exception
+
+    return user
+
+def available_copies_query(book_ids):
+    return select(models.BookItem.book_id, func.count(models.BookItem.barcode))\
+        .filter(models.BookItem.book_id.in_(book_ids), models.BookItem.status == "Available")\
+        .group_by(models.BookItem.book_id)
+
+async def count_available_copies(db: AsyncSession, book_ids):
+    """{book_id: available copies} in one GROUP BY instead of loading every item"""
+    if not book_ids:
+        return {}
+    return dict((await db.execute(available_copies_query(book_ids))).all())
 
+def count_available_copies_sync(db: Session, book_ids):
+    """Same as count_available_copies, for endpoints on the sync engine"""
+    if not book_ids:
+        return {}
+    return dict(db.execute(available_copies_query(book_ids)).all())
+
+def available_copies_subquery():
+    """(book_id, available) per title, for outer-joining in column-only queries"""
+    return select(models.BookItem.book_id, func.count(models.BookItem.barcode).label("available"))\
+        .filter(models.BookItem.status == "Available")\
+        .group_by(models.BookItem.book_id).subquery()
+  
 # --- API Routes ---
 
 @app.get("/api/health")
@@ -134,28 +186,66 @@ def health_check():
     return {"status": "ok", "message": "Library System is running"}
 
 @app.get("/api/books", response_model=list[schemas.BookResponse])
-def get_books(
+async def get_books(
+    request: Request,
+    response: Response,
     search: str = "", 
     author: str = "", 
     genre: str = "",
-    db: Session = Depends(get_db)
+    stream: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    """BIM-006: Advanced Search"""
-    query = db.query(models.Book)
-    
+    """BIM-006: Advanced Search (?stream=true: orjson fast path, see streaming.py)"""
+    # Unchanged catalog -> 304 before running the search (see http_cache.py)
+    etag = await http_cache.catalog_etag(db, f"books?{request.url.query}")
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+
+    filters = []
     if search:
-        query = query.filter(models.Book.title.ilike(f"%{search}%"))
+        filters.append(models.Book.title.ilike(f"%{search}%"))
     if author:
-        query = query.filter(models.Book.author.ilike(f"%{author}%"))
+        filters.append(models.Book.author.ilike(f"%{author}%"))
     if genre:
-        query = query.filter(models.Book.genre.ilike(f"%{genre}%"))
+        filters.append(models.Book.genre.ilike(f"%{genre}%"))
+
+    if stream:
+        available = available_copies_subquery()
+        columns = [getattr(models.Book, field) for field in schemas.BookResponse.model_fields if field != "available_copies"]
+        return http_cache.set_cache_headers(streaming.stream_rows_async(
+            select(*columns, func.coalesce(available.c.available, 0).label("available_copies"))
+            .outerjoin(available, available.c.book_id == models.Book.id)
+            .filter(*filters)
+        ), etag)
         
-    books = query.all()
+    books = (await db.execute(select(models.Book).filter(*filters))).scalars().all()
     
     # Calculate available copies
+    available = await count_available_copies(db, [book.id for book in books])
     for book in books:
-        book.available_copies = len([item for item in book.items if item.status == 'Available'])
+        book.available_copies = available.get(book.id, 0)
+    
+    http_cache.set_cache_headers(response, etag)
+    return books
+
+# Declared before /api/books/{book_id}, which would otherwise capture 'popular' as an id
+@app.get("/api/books/popular", response_model=list[schemas.BookResponse])
+def get_top_popular_books(db: Session = Depends(get_read_db)):
+    """Top 5 titles by time-decayed loan score (cached ranking, see popularity.py)"""
+    popular_ids = recommendation.get_popular_books(db, limit=5)
+    
+    if not popular_ids:
+        # If no loans exist yet, just return the 5 newest books
+        books = db.query(models.Book).order_by(models.Book.id.desc()).limit(5).all()
+    else:
+        rank = {book_id: i for i, book_id in enumerate(popular_ids)}
+        books = sorted(db.query(models.Book).filter(models.Book.id.in_(popular_ids)).all(), key=lambda b: rank[b.id])
     
+    # Available copies for the badges, one GROUP BY for all of them
+    available = count_available_copies_sync(db, [book.id for book in books])
+    for book in books:
+        book.available_copies = available.get(book.id, 0)
+        
     return books
 
 # 2. Add Book (Manual)
@@ -171,29 +261,102 @@ def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
     db.add(db_book)
     db.commit()
     db.refresh(db_book)
+    content_recommendation.index_book(db_book)
     return db_book
 
 # 3. Import Book from Google (The "Magic" Button)
 @app.post("/api/books/import", response_model=schemas.BookResponse)
-def import_book(request: schemas.GoogleImportRequest, db: Session = Depends(get_db)):
-    # 1. Fetch from Google
-    book_data = fetch_google_book(request.query)
+async def import_book(request: schemas.GoogleImportRequest, db: AsyncSession = Depends(get_async_db)):
+    # 1. Fetch from Google (pooled client, cached, retried: see google_books.py)
+    try:
+        book_data = await google_books.fetch_book(request.query)
+    except google_books.GoogleBooksError:
+        raise HTTPException(status_code=502, detail="Google Books is not responding, try again later")
     if not book_data:
         raise HTTPException(status_code=404, detail="Book not found on Google Books")
 
     # 2. Check if already exists (by ISBN)
     if book_data.get("isbn"):
-        existing = db.query(models.Book).filter(models.Book.isbn == book_data["isbn"]).first()
+        existing = (await db.execute(select(models.Book).filter(models.Book.isbn == book_data["isbn"]))).scalars().first()
         if existing:
             return existing # Return existing if found
 
     # 3. Save to DB
     db_book = models.Book(**book_data)
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
+    await db.commit()
+    content_recommendation.index_book(db_book)
     return db_book
 
+# 3b. Bulk import by ISBN (a donation box at a time)
+@app.post("/api/books/import/bulk", response_model=schemas.BulkImportResponse)
+async def import_books_bulk(
+    request: schemas.BulkImportRequest,
+    current_user: Union[models.Member, models.Librarian] = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Looks the ISBNs up concurrently (GOOGLE_BOOKS_CONCURRENCY at a time) and adds the new titles in one transaction"""
+    if not isinstance(current_user, models.Librarian):
+        raise HTTPException(status_code=403, detail="Only staff members can import books")
+    isbns = list(dict.fromkeys(filter(None, map(google_books.normalize_isbn, request.isbns))))
+    if len(isbns) > BULK_IMPORT_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_IMPORT_MAX} ISBNs per import")
+
+    # 1. Titles we already have are not looked up at all
+    existing = {book.isbn: book for book in (await db.execute(
+        select(models.Book).filter(models.Book.isbn.in_(isbns))
+    )).scalars()} if isbns else {}
+    wanted = [isbn for isbn in isbns if isbn not in existing]
+
+    # 2. Google lookups, concurrently
+    results = await google_books.fetch_books([f"isbn:{isbn}" for isbn in wanted])
+    not_found, failed, found = [], [], {}
+    for isbn, result in zip(wanted, results):
+        if isinstance(result, Exception):
+            failed.append(isbn)
+        elif result is None:
+            not_found.append(isbn)
+        else:
+            # Google answers an ISBN-10 with the ISBN-13: dedupe on what gets stored
+            found.setdefault(result.get("isbn") or isbn, {**result, "isbn": result.get("isbn") or isbn})
+
+    # 3. ... which may match a title we have (ISBN-10 asked, ISBN-13 stored)
+    stored_as = set(found) - set(existing)
+    if stored_as:
+        for book in (await db.execute(select(models.Book).filter(models.Book.isbn.in_(stored_as)))).scalars():
+            existing[book.isbn] = book
+    new_books = [models.Book(**data) for isbn, data in found.items() if isbn not in existing]
+
+    # 4. One transaction for the lot
+    db.add_all(new_books)
+    await db.commit()
+    for book in new_books:
+        content_recommendation.index_book(book)
+    return {"imported": new_books, "existing": list(existing.values()), "not_found": not_found, "failed": failed}
+
+# 3c. Catalog + inventory import from a file (branch migration)
+@app.post("/api/books/import/file", response_model=schemas.CatalogImportResponse)
+def import_catalog_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),          # csv / marc; default from the file name
+    barcode_prefix: Optional[str] = Form(None),  # Generated barcodes for records without their own
+    barcode_start: int = Form(1),
+    default_copies: int = Form(1),
+    current_user: Union[models.Member, models.Librarian] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """CSV or MARC (ISO 2709) titles + copies, streamed in chunks; bad records are reported, not fatal (see catalog_import.py)"""
+    if not isinstance(current_user, models.Librarian):
+        raise HTTPException(status_code=403, detail="Only staff members can import the catalog")
+    fmt = format or ("marc" if (file.filename or "").lower().endswith((".mrc", ".marc")) else "csv")
+    if fmt not in ("csv", "marc"):
+        raise HTTPException(status_code=400, detail="format must be csv or marc")
+    try:
+        return catalog_import.import_file(db, file.file, fmt, barcode_prefix=barcode_prefix,
+                                          barcode_start=barcode_start, default_copies=default_copies)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable {fmt} file: {e}")
+
 # 4. Add Physical Copy (Item)
 @app.post("/api/books/{book_id}/items", response_model=schemas.BookItemResponse)
 def add_book_item(book_id: int, item: schemas.BookItemCreate, db: Session = Depends(get_db)):
@@ -212,6 +375,46 @@ def add_book_item(book_id: int, item: schemas.BookItemCreate, db: Session = Depe
     db.refresh(db_item)
     return db_item
 
+# 4b. Add many copies at once (a delivery of 40 copies of a bestseller)
+@app.post("/api/books/{book_id}/items/bulk", response_model=schemas.BookItemBulkResponse)
+def add_book_items_bulk(
+    book_id: int,
+    request: schemas.BookItemBulkCreate,
+    current_user: Union[models.Member, models.Librarian] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Copies from an explicit barcode list or a prefix + number range: one collision check, one insert, all or nothing"""
+    if not isinstance(current_user, models.Librarian):
+        raise HTTPException(status_code=403, detail="Only staff members can add copies")
+    if request.barcodes is not None:
+        barcodes = [b.strip() for b in request.barcodes if b.strip()]
+    elif request.prefix is not None and request.count > 0:
+        # count / width are bounded by the schema, so the range is never bigger than BULK_ITEMS_MAX
+        barcodes = catalog_import.barcode_range(request.prefix, request.start, request.count, request.width)
+    else:
+        raise HTTPException(status_code=400, detail="Give either barcodes or prefix + count")
+    if not barcodes:
+        raise HTTPException(status_code=400, detail="No barcodes given")
+    repeated = sorted(b for b, n in Counter(barcodes).items() if n > 1)
+    if repeated:
+        raise HTTPException(status_code=400, detail=f"Barcodes repeated in the request: {', '.join(repeated[:20])}")
+
+    if db.get(models.Book, book_id) is None:
+        raise HTTPException(status_code=404, detail="Book ID not found")
+    taken = catalog_import.taken_barcodes(db, barcodes)
+    if taken:
+        raise HTTPException(status_code=400, detail=f"Barcodes already exist: {', '.join(sorted(taken)[:20])}"
+                                                    + (f" (+{len(taken) - 20} more)" if len(taken) > 20 else ""))
+    try:
+        catalog_import.insert_items(db, [(barcode, book_id) for barcode in barcodes], request.status)
+        http_cache.bump_catalog_version(db.connection())  # Once for the batch (Core insert, no flush hook)
+        db.commit()
+    except IntegrityError:
+        # Someone added one of these barcodes between the check and the insert
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Barcode already exists")
+    return {"book_id": book_id, "created": barcodes}
+
 
 # --- Member Management Endpoints ---
 
@@ -235,22 +438,18 @@ def register_member(member: schemas.MemberCreate, db: Session = Depends(get_db))
     db.add(db_member)
     db.commit()
     db.refresh(db_member)
+    member_search.index_member(db_member)
     return db_member
 
 @app.get("/api/members/search", response_model=list[schemas.MemberResponse])
 def search_members(
-    q: str, 
+    q: str = "",
+    limit: int = member_search.MEMBER_SEARCH_LIMIT,
     current_user: models.Librarian = Depends(get_current_user), # RBAC: Librarians only
     db: Session = Depends(get_db)
 ):
-    """MEM-005: Search Members by Name, Email, or Phone"""
-    # ilike is case-insensitive
-    members = db.query(models.Member).filter(
-        (models.Member.full_name.ilike(f"%{q}%")) |
-        (models.Member.email.ilike(f"%{q}%")) |
-        (models.Member.phone_number.ilike(f"%{q}%"))
-    ).all()
-    return members
+    """MEM-005: Search Members by Name, Email, Phone or ID (exact hits first, else ranked fuzzy matches)"""
+    return member_search.search(db, q, limit)
 
 @app.get("/api/members/{member_id}", response_model=schemas.MemberResponse)
 def get_member(member_id: int, db: Session = Depends(get_db)):
@@ -326,8 +525,10 @@ def issue_book(request: schemas.LoanIssueRequest, db: Session = Depends(get_db))
     )
     item.status = "Borrowed"
     db.add(new_loan)
+    popularity.record_loan(db, item.book_id)
     db.commit()
     db.refresh(new_loan)
+    recommendation.record_interaction(new_loan.member_id)  # Fresh picks in the background
     return new_loan
 
 # --- Reservation Endpoints ---
@@ -443,15 +644,16 @@ def cancel_reservation(reservation_id: int, db: Session = Depends(get_db)):
 # --- Fine Management Endpoints ---
 # NEW:
 @app.get("/api/my/fines", response_model=list[schemas.FineResponse])
-def get_my_fines(
-    current_user: models.Member = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_my_fines(
+    current_user: models.Member = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """PORT-002: View Fines (Source of Truth: Database)"""
-    return db.query(models.Fine).filter(
+    result = await db.execute(select(models.Fine).filter(
         models.Fine.member_id == current_user.id,
         models.Fine.status.in_(["Unpaid", "Partial"])
-    ).all()
+    ))
+    return result.scalars().all()
 
 @app.post("/api/fines/{fine_id}/pay")
 def pay_fine(
@@ -515,27 +717,40 @@ def pay_fine(
     }
 
 @app.get("/api/recommendations", response_model=list[schemas.BookResponse])
-def get_recommendations(member_id: int, db: Session = Depends(get_db)):
+def get_recommendations(member_id: int, db: Session = Depends(get_read_db)):
     """
     PORT-005: View Recommendations
     Uses ML to find books based on borrowing history.
     """
-    # 1. Run the ML Engine
+    # 1. Run the ML Engines: collaborative (similar members) + content (similar titles, see content_recommendation.py)
+    # Collaborative picks precomputed by batch_recommendation.py win; the live model covers everyone else
+    book_ids = db.execute(
+        select(models.MemberRecommendation.book_id)
+        .filter(models.MemberRecommendation.member_id == member_id)
+        .order_by(models.MemberRecommendation.rank).limit(RECOMMENDATION_LIMIT)
+    ).scalars().all()
+    if not book_ids:
+        # In the recommender process pool, with a deadline: popular titles on timeout / overload / error
+        with metrics.RECOMMENDATION_LATENCY.labels("collaborative").time():
+            book_ids = recommendation.recommend_with_deadline(member_id, RECOMMENDATION_LIMIT)
     try:
-        book_ids = recommendation.recommend_books(db, member_id)
+        with metrics.RECOMMENDATION_LATENCY.labels("content").time():
+            content_ids = content_recommendation.recommend_for_member(db, member_id, RECOMMENDATION_LIMIT)
+        book_ids = content_recommendation.blend(book_ids, content_ids, RECOMMENDATION_LIMIT)
     except Exception as e:
-        print(f"ML Error: {e}")
-        book_ids = []
+        print(f"Content recommendation error: {e}")
 
     if not book_ids:
         return []
 
-    # 2. Fetch Book Objects from DB
-    books = db.query(models.Book).filter(models.Book.id.in_(book_ids)).all()
+    # 2. Fetch Book Objects from DB, in ranking order
+    rank = {book_id: i for i, book_id in enumerate(book_ids)}
+    books = sorted(db.query(models.Book).filter(models.Book.id.in_(book_ids)).all(), key=lambda b: rank[b.id])
 
     # --- FIX: Calculate Available Copies ---
+    available = count_available_copies_sync(db, book_ids)
     for book in books:
-        book.available_copies = len([item for item in book.items if item.status == 'Available'])
+        book.available_copies = available.get(book.id, 0)
     # ---------------------------------------
 
     return books
@@ -577,6 +792,7 @@ def log_book_view(
     view = models.BookView(member_id=member_id, book_id=book_id)
     db.add(view)
     db.commit()
+    recommendation.record_interaction(member_id)
     
     # 3. Schedule Cleanup (Runs after response is sent)
     background_tasks.add_task(cleanup_old_views, db)
@@ -601,23 +817,51 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     raise HTTPException(status_code=400, detail="Incorrect email or password")
 
 @app.get("/api/my/loans", response_model=schemas.LoanHistoryResponse)
-def get_my_loan_history(
-    current_user: models.Member = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_my_loan_history(
+    current_user: models.Member = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """PORT-001: View Borrowed Books & Loan History"""
-    active = db.query(models.Loan).filter(
+    loans = (await db.execute(select(models.Loan).filter(
         models.Loan.member_id == current_user.id,
-        models.Loan.status == "Active"
-    ).all()
+        models.Loan.status.in_(["Active", "Returned"])
+    ))).scalars().all()
     
-    past = db.query(models.Loan).filter(
-        models.Loan.member_id == current_user.id,
-        models.Loan.status == "Returned"
-    ).all()
+    active = [loan for loan in loans if loan.status == "Active"]
+    past = [loan for loan in loans if loan.status == "Returned"]
     
     return {"active_loans": active, "past_loans": past}
 
+def overview_limits(
+    loans_limit: int = Query(member_overview.OVERVIEW_LIMIT, ge=0, le=member_overview.OVERVIEW_MAX_LIMIT),
+    history_limit: int = Query(member_overview.OVERVIEW_HISTORY_LIMIT, ge=0, le=member_overview.OVERVIEW_MAX_LIMIT),
+    reservations_limit: int = Query(member_overview.OVERVIEW_LIMIT, ge=0, le=member_overview.OVERVIEW_MAX_LIMIT),
+    fines_limit: int = Query(member_overview.OVERVIEW_LIMIT, ge=0, le=member_overview.OVERVIEW_MAX_LIMIT),
+    history_offset: int = Query(0, ge=0),
+    reservations_offset: int = Query(0, ge=0),
+    fines_offset: int = Query(0, ge=0),
+):
+    """
+    Rows per section of the overview endpoints (0 skips the section, its total still comes back).
+    The offsets page through the sections that can outgrow one request; active loans are capped
+    at MAX_LOANS_PER_MEMBER anyway.
+    """
+    return {"loans_limit": loans_limit, "history_limit": history_limit,
+            "reservations_limit": reservations_limit, "fines_limit": fines_limit,
+            "history_offset": history_offset, "reservations_offset": reservations_offset,
+            "fines_offset": fines_offset}
+
+@app.get("/api/my/overview", response_model=schemas.MemberOverviewResponse)
+async def get_my_overview(
+    limits: dict = Depends(overview_limits),
+    current_user: models.Member = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """PORT-001/002: Loans, holds, fines and unread count for My Loans / Dashboard in one request"""
+    if not isinstance(current_user, models.Member):
+        raise HTTPException(status_code=403, detail="Members only")
+    return await member_overview.build(db, current_user.id, **limits)
+
 @app.put("/api/my/profile")
 def update_my_profile(
     profile_data: schemas.ProfileUpdate,
@@ -638,6 +882,8 @@ def update_my_profile(
             
     db.commit()
     db.refresh(current_user)
+    if isinstance(current_user, models.Member):
+        member_search.index_member(current_user)
     return {"message": "Profile updated", "full_name": current_user.full_name}
 
 @app.post("/api/my/password")
@@ -775,11 +1021,27 @@ def return_book(request: schemas.LoanReturnRequest, db: Session = Depends(get_db
 
 @app.get("/api/reports/overdue", response_model=list[schemas.OverdueReportItem])
 def get_overdue_report(
+    stream: bool = False,
     current_user: models.Librarian = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """ADMIN-001: Generate Report (Overdue Items)"""
     today = date.today()
+    if stream:
+        statement = select(
+            models.Loan.id.label("loan_id"),
+            func.coalesce(models.Book.title, "Unknown").label("book_title"),
+            models.Member.email.label("member_email"),
+            models.Loan.due_date,
+        ).join(models.Member, models.Member.id == models.Loan.member_id)\
+            .outerjoin(models.BookItem, models.BookItem.barcode == models.Loan.book_item_id)\
+            .outerjoin(models.Book, models.Book.id == models.BookItem.book_id)\
+            .filter(models.Loan.status == "Active", models.Loan.due_date < today)
+        return streaming.stream_rows(statement, to_dict=lambda row: {
+            "loan_id": row.loan_id, "book_title": row.book_title, "member_email": row.member_email,
+            "due_date": row.due_date, "days_overdue": (today - row.due_date).days,
+        })
+
     overdue_loans = db.query(models.Loan).filter(
         models.Loan.status == "Active",
         models.Loan.due_date < today
@@ -866,6 +1128,7 @@ def update_book(
     
     db.commit()
     db.refresh(book)
+    content_recommendation.index_book(book)
     return book
 
 @app.delete("/api/items/{barcode}")
@@ -892,7 +1155,7 @@ def delete_book_item(
 @app.get("/api/reports/stats", response_model=schemas.DashboardStats)
 def get_dashboard_stats(
     current_user: models.Librarian = Depends(get_current_user), 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """ADMIN-001: Generate Reports (Dashboard Stats)"""
     
@@ -967,14 +1230,64 @@ def mark_book_lost(
     db.commit()
     return {"message": "Book marked as lost and fine created"}
 
+def encode_notification_cursor(notif: models.Notification) -> str:
+    """Opaque keyset cursor: (created_at, id) of the last row on the page"""
+    raw = f"{notif.created_at.isoformat()}|{notif.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_notification_cursor(cursor: str):
+    try:
+        created_at, notif_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(notif_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/my/notifications", response_model=list[schemas.NotificationResponse])
-def get_my_notifications(
-    current_user: models.Member = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_my_notifications(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=MAX_NOTIFICATION_PAGE_SIZE),
+    current_user: models.Member = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return db.query(models.Notification).filter(
+    """
+    Newest-first inbox, one page at a time.
+    Pass the X-Next-Cursor header of the previous page as ?cursor= to continue.
+    """
+    query = select(models.Notification).filter(
         models.Notification.member_id == current_user.id
-    ).order_by(models.Notification.created_at.desc()).all()
+    )
+
+    # Keyset pagination: seek past the last row instead of OFFSET, so deep pages
+    # cost the same as the first one (served by ix_notifications_member_created)
+    if cursor:
+        last_created, last_id = decode_notification_cursor(cursor)
+        query = query.filter(or_(
+            models.Notification.created_at < last_created,
+            and_(models.Notification.created_at == last_created, models.Notification.id < last_id)
+        ))
+
+    page = (await db.execute(query.order_by(
+        models.Notification.created_at.desc(), models.Notification.id.desc()
+    ).limit(limit + 1))).scalars().all()
+
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = encode_notification_cursor(page[-1])
+
+    return page
+
+@app.get("/api/my/notifications/unread_count")
+async def get_my_unread_count(
+    current_user: models.Member = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Badge counter (served by the partial ix_notifications_member_unread index)"""
+    count = (await db.execute(select(func.count(models.Notification.id)).filter(
+        models.Notification.member_id == current_user.id,
+        models.Notification.is_read == False
+    ))).scalar()
+    return {"unread": count}
 
 @app.post("/api/maintenance/expire_holds")
 def expire_stale_reservations(
@@ -1017,9 +1330,23 @@ def expire_stale_reservations(
 
 @app.get("/api/reports/active_loans", response_model=list[schemas.ActiveLoanReportItem])
 def get_active_loans_report(
+    stream: bool = False,
     current_user: models.Librarian = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    if stream:
+        return streaming.stream_rows(
+            select(
+                models.Loan.id.label("loan_id"),
+                models.Book.title.label("book_title"),
+                models.Member.email.label("member_email"),
+                models.Loan.issue_date,
+                models.Loan.due_date,
+            ).join(models.BookItem, models.BookItem.barcode == models.Loan.book_item_id)
+            .join(models.Book, models.Book.id == models.BookItem.book_id)
+            .join(models.Member, models.Member.id == models.Loan.member_id)
+            .filter(models.Loan.status == "Active")
+        )
     loans = db.query(models.Loan).filter(models.Loan.status == "Active").all()
     report = []
     for loan in loans:
@@ -1034,9 +1361,30 @@ def get_active_loans_report(
 
 @app.get("/api/reports/member_activity", response_model=list[schemas.MemberActivityReportItem])
 def get_member_activity_report(
+    stream: bool = False,
     current_user: models.Librarian = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
+    if stream:
+        loan_totals = select(
+            models.Loan.member_id,
+            func.count(models.Loan.id).label("total"),
+            func.sum(case((models.Loan.status == "Active", 1), else_=0)).label("active"),
+        ).group_by(models.Loan.member_id).subquery()
+        fines_paid = select(
+            models.Fine.member_id, func.sum(models.Fine.amount_paid).label("paid")
+        ).group_by(models.Fine.member_id).subquery()
+        return streaming.stream_rows(
+            select(
+                models.Member.id.label("member_id"),
+                models.Member.full_name,
+                models.Member.email,
+                func.coalesce(loan_totals.c.total, 0).label("total_loans"),
+                func.coalesce(loan_totals.c.active, 0).label("active_loans_count"),
+                func.coalesce(fines_paid.c.paid, 0.0).label("total_fines_paid"),
+            ).outerjoin(loan_totals, loan_totals.c.member_id == models.Member.id)
+            .outerjoin(fines_paid, fines_paid.c.member_id == models.Member.id)
+        )
     members = db.query(models.Member).all()
     report = []
     for m in members:
@@ -1154,17 +1502,62 @@ def get_member_fines_staff(
         models.Fine.member_id == member_id
     ).all()
 
+@app.get("/api/members/{member_id}/overview", response_model=schemas.MemberOverviewResponse)
+async def get_member_overview(
+    member_id: int,
+    limits: dict = Depends(overview_limits),
+    current_user: models.Librarian = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Staff view of a member: profile, loans, holds and fines in one request (see member_overview.py)"""
+    if not isinstance(current_user, models.Librarian):
+        raise HTTPException(status_code=403, detail="Not authorized")
+    overview = await member_overview.build(db, member_id, **limits)
+    if overview is None:
+        raise HTTPException(status_code=404, detail="Member not found")
+    return overview
+
 @app.get("/api/books/{book_id}", response_model=schemas.BookResponse)
-def get_book_details(book_id: int, db: Session = Depends(get_db)):
+async def get_book_details(
+    book_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_read_db)
+):
     """Get detailed info for a single book"""
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    etag = await http_cache.catalog_etag(db, f"book-{book_id}")
+    if http_cache.etag_matches(request, etag):
+        return http_cache.not_modified(etag)
+
+    book = await db.get(models.Book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
     
     # Compute available copies on the fly
-    book.available_copies = len([item for item in book.items if item.status == 'Available'])
+    available = await count_available_copies(db, [book.id])
+    book.available_copies = available.get(book.id, 0)
+    http_cache.set_cache_headers(response, etag)
     return book
 
+@app.get("/api/books/{book_id}/similar", response_model=list[schemas.BookResponse])
+def get_similar_books(book_id: int, limit: int = Query(5, ge=1, le=50), db: Session = Depends(get_read_db)):
+    """"More like this": closest titles by content (see content_recommendation.py)"""
+    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+
+    with metrics.RECOMMENDATION_LATENCY.labels("similar").time():
+        similar_ids = content_recommendation.similar_books(db, book, limit)
+    if not similar_ids:
+        return []
+
+    rank = {similar_id: i for i, similar_id in enumerate(similar_ids)}
+    books = sorted(db.query(models.Book).filter(models.Book.id.in_(similar_ids)).all(), key=lambda b: rank[b.id])
+    available = count_available_copies_sync(db, similar_ids)
+    for similar in books:
+        similar.available_copies = available.get(similar.id, 0)
+    return books
+
 @app.get("/api/books/{book_id}/items", response_model=list[schemas.BookItemResponse])
 def get_book_items_list(
     book_id: int, 
@@ -1180,58 +1573,55 @@ def get_book_items_list(
     return db.query(models.BookItem).filter(models.BookItem.book_id == book_id).all()
 
 @app.get("/api/items/{barcode}/details", response_model=schemas.BookItemDetail)
-def get_item_details(
+async def get_item_details(
     barcode: str,
-    current_user: models.Librarian = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.Librarian = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    item = db.query(models.BookItem).filter(models.BookItem.barcode == barcode).first()
-    if not item:
+    """Everything the desk shows for a scanned copy, in one query (two for a copy on the hold shelf; cached briefly, see item_scan.py)"""
+    detail = await item_scan.resolve(db, barcode)
+    if detail is None:
         raise HTTPException(status_code=404, detail="Item barcode not found")
-    
-    response = {
-        "barcode": item.barcode,
-        "status": item.status,
-        "book_title": item.book.title,
-        "book_author": item.book.author,
-        "book_cover": item.book.cover_image_url,
-        "reserved_for": [],
-        "current_borrower_id": None,
-        "current_borrower_name": None,
-        "due_date": None
-    }
-    
-    # Logic 1: If Reserved, who is waiting?
-    if item.status == "Reserved":
-        candidates = db.query(models.Reservation).filter(
-            models.Reservation.book_id == item.book_id,
-            models.Reservation.status == "Fulfilled"
-        ).all()
-        response["reserved_for"] = [f"{res.member.full_name} (ID: {res.member_id})" for res in candidates]
-
-    # Logic 2: If Borrowed, who has it? (Auto-fill support)
-    if item.status == "Borrowed" or item.status == "Overdue": # "Overdue" isn't a status in DB (it's calc), but checking Borrowed covers it
-        active_loan = db.query(models.Loan).filter(
-            models.Loan.book_item_id == item.barcode,
-            models.Loan.status == "Active"
-        ).first()
-        
-        if active_loan:
-            response["current_borrower_id"] = active_loan.member_id
-            response["current_borrower_name"] = active_loan.member.full_name
-            response["due_date"] = active_loan.due_date
+    return detail
 
-    return response
-    
 @app.get("/api/admin/reservations/search", response_model=list[schemas.ReservationResponse])
 def search_all_reservations(
     q: str = "",
+    stream: bool = False,
     current_user: models.Librarian = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.role not in ["Librarian", "Admin"]:
         raise HTTPException(status_code=403, detail="Not authorized")
 
+    if stream:
+        # Queue position = 1 + pending holds placed strictly earlier on the same title (rank() keeps ties equal),
+        # computed over every pending hold, before the search filter narrows the rows
+        positions = select(
+            models.Reservation.id,
+            func.rank().over(partition_by=models.Reservation.book_id,
+                             order_by=models.Reservation.reservation_date).label("position"),
+        ).filter(models.Reservation.status == "Pending").subquery()
+        statement = select(
+            models.Reservation.id,
+            models.Reservation.book_id,
+            models.Reservation.member_id,
+            models.Reservation.reservation_date,
+            models.Reservation.status,
+            func.coalesce(positions.c.position, 0).label("queue_position"),
+            models.Member.full_name.label("member_name"),
+            models.Book.title.label("book_title"),
+        ).join(models.Member, models.Member.id == models.Reservation.member_id)\
+            .join(models.Book, models.Book.id == models.Reservation.book_id)\
+            .outerjoin(positions, positions.c.id == models.Reservation.id)
+        if q:
+            search = f"%{q}%"
+            statement = statement.filter(models.Member.full_name.ilike(search) | models.Book.title.ilike(search))
+        return streaming.stream_rows(
+            statement.order_by(models.Reservation.status.desc(), models.Reservation.reservation_date.desc()),
+            session_factory=SessionLocal,
+        )
+
     query = db.query(models.Reservation).join(models.Member).join(models.Book)
     
     if q:
@@ -1315,6 +1705,7 @@ def delete_book(
 
     db.delete(book)
     db.commit()
+    content_recommendation.remove_book(book_id)
     return {"message": "Book title removed from catalog"}
 
 @app.post("/api/my/notifications/read-all")
@@ -1376,30 +1767,43 @@ def delete_librarian(
     db.commit()
     return {"message": "Staff account removed"}
 
-@app.get("/api/books/popular", response_model=list[schemas.BookResponse])
-def get_top_popular_books(db: Session = Depends(get_db)):
-    """Fetch Top 5 most borrowed books across the whole library"""
-    # Use the helper function we wrote in recommendation.py
-    popular_ids = recommendation.get_popular_books(db, limit=5)
-    
-    if not popular_ids:
-        # If no loans exist yet, just return the 5 newest books
-        return db.query(models.Book).order_by(models.Book.id.desc()).limit(5).all()
-        
-    books = db.query(models.Book).filter(models.Book.id.in_(popular_ids)).all()
-    
-    # Calculate available copies for the badges
-    for book in books:
-        book.available_copies = len([item for item in book.items if item.status == 'Available'])
-        
-    return books
+@app.get("/api/admin/db_pool")
+def get_db_pool_stats(current_user: models.Librarian = Depends(get_current_user)):
+    """Connection pool utilization and checkout wait time for this worker"""
+    if current_user.role not in ["Librarian", "Admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return pool_stats()
+
+@app.get("/api/admin/perf")
+def get_perf_report(current_user: models.Librarian = Depends(get_current_user)):
+    """Per-route SQL statistics collected by this worker since startup (or the last reset)"""
+    if current_user.role not in ["Librarian", "Admin"]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "n_plus_one_threshold": instrumentation.N_PLUS_ONE_THRESHOLD,
+        "routes": instrumentation.route_table.report()
+    }
+
+@app.delete("/api/admin/perf")
+def reset_perf_report(current_user: models.Librarian = Depends(get_current_user)):
+    if current_user.role != "Admin":
+        raise HTTPException(status_code=403, detail="Only admins can reset statistics")
+    instrumentation.route_table.reset()
+    return {"message": "Statistics reset"}
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
 
 # --- Static File Serving (Keep this at the end) ---
 if os.path.exists("static_ui"):
-    app.mount("/assets", StaticFiles(directory="static_ui/assets"), name="assets")
+    # Hashed Vite bundles: immutable, precompressed .br/.gz served when accepted
+    app.mount("/assets", PrecompressedStaticFiles(directory="static_ui/assets"), name="assets")
 
     @app.get("/{full_path:path}")
     async def serve_react(full_path: str):
         if full_path.startswith("api"):
             return {"error": "API endpoint not found"}
-        return FileResponse("static_ui/index.html")
\ No newline at end of file
+        # index.html points at the current hashed bundles: always revalidate it
+        return FileResponse("static_ui/index.html", headers={"Cache-Control": "no-cache"})
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Member page in a fixed number of queries (GET /api/members/{id}/overview, GET /api/my/overview).
+
+MemberDetails.jsx used to fire four requests (member, loans, reservations, fines) that each
+authenticated again, and the endpoints behind them loaded titles / queue positions row by row.
+Here it's at most four statements, however long the member's history:
+
+    totals        the member's row plus scalar subqueries: section sizes, fines due, unread count
+    loans         active and past loans with titles, each cut to its own limit (row_number)
+    reservations  open holds with titles and queue positions (correlated count per hold)
+    fines         unpaid first, then newest
+
+A section asked for with limit 0 skips its query: the dashboard only needs the totals.
+Past loans, holds and fines also take an offset, so the pages can fetch the next slice of one
+section (the totals tell them how many there are).
+"""
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import aliased
+
+import models
+
+OVERVIEW_LIMIT = 50           # Rows per section unless the request asks for fewer / more
+OVERVIEW_HISTORY_LIMIT = 20   # Past loans
+OVERVIEW_MAX_LIMIT = 200
+
+OPEN_HOLDS = ("Pending", "Fulfilled")
+
+
+def totals_query(member_id):
+    def count(model, *criteria):
+        return select(func.count()).select_from(model)\
+            .where(model.member_id == member_id, *criteria).scalar_subquery()
+
+    unpaid = models.Fine.status != "Paid"
+    fines_due = select(func.coalesce(func.sum(models.Fine.amount - models.Fine.amount_paid), 0.0))\
+        .where(models.Fine.member_id == member_id, unpaid).scalar_subquery()
+    return select(
+        models.Member.id, models.Member.email, models.Member.full_name, models.Member.status,
+        count(models.Loan, models.Loan.status == "Active").label("active_loans_total"),
+        count(models.Loan, models.Loan.status == "Returned").label("past_loans_total"),
+        count(models.Reservation, models.Reservation.status.in_(OPEN_HOLDS)).label("reservations_total"),
+        count(models.Fine).label("fines_total"),
+        count(models.Fine, unpaid).label("unpaid_fines"),
+        fines_due.label("fines_due"),
+        count(models.Notification, models.Notification.is_read == False).label("unread_notifications"),
+    ).where(models.Member.id == member_id)
+
+
+def loans_query(member_id, active_limit, history_limit, history_offset=0):
+    """Active loans (newest first) and past loans (last returned first), each cut to its own page"""
+    Loan = models.Loan
+    ranked = select(
+        Loan.id, Loan.book_item_id, Loan.member_id, Loan.issue_date, Loan.due_date, Loan.return_date,
+        Loan.status, Loan.renewal_count, models.Book.id.label("book_id"), models.Book.title.label("book_title"),
+        func.row_number().over(
+            partition_by=Loan.status,
+            order_by=(func.coalesce(Loan.return_date, Loan.issue_date).desc(), Loan.id.desc()),
+        ).label("n"),
+    ).outerjoin(models.BookItem, models.BookItem.barcode == Loan.book_item_id)\
+        .outerjoin(models.Book, models.Book.id == models.BookItem.book_id)\
+        .where(Loan.member_id == member_id, Loan.status.in_(["Active", "Returned"])).subquery()
+    skip = case((ranked.c.status == "Active", 0), else_=history_offset)
+    cut = case((ranked.c.status == "Active", active_limit), else_=history_offset + history_limit)
+    return select(*[c for c in ranked.c if c.name != "n"])\
+        .where(ranked.c.n > skip, ranked.c.n <= cut).order_by(ranked.c.status, ranked.c.n)
+
+
+def reservations_query(member_id, limit, offset=0):
+    """Open holds, the ones waiting on the shelf first; queue position 0 = ready for pickup"""
+    Reservation, Earlier = models.Reservation, aliased(models.Reservation)
+    ahead = select(func.count()).select_from(Earlier).where(
+        Earlier.book_id == Reservation.book_id,
+        Earlier.status == "Pending",
+        Earlier.reservation_date < Reservation.reservation_date,
+    ).scalar_subquery()
+    return select(
+        Reservation.id, Reservation.book_id, Reservation.member_id, Reservation.reservation_date,
+        Reservation.status, case((Reservation.status == "Pending", ahead + 1), else_=0).label("queue_position"),
+        models.Book.title.label("book_title"),
+    ).outerjoin(models.Book, models.Book.id == Reservation.book_id)\
+        .where(Reservation.member_id == member_id, Reservation.status.in_(OPEN_HOLDS))\
+        .order_by(case((Reservation.status == "Fulfilled", 0), else_=1), Reservation.reservation_date, Reservation.id)\
+        .offset(offset).limit(limit)
+
+
+def fines_query(member_id, limit, offset=0):
+    Fine = models.Fine
+    return select(Fine.id, Fine.loan_id, Fine.amount, Fine.amount_paid, Fine.reason, Fine.status)\
+        .where(Fine.member_id == member_id)\
+        .order_by(case((Fine.status == "Paid", 1), else_=0), Fine.id.desc())\
+        .offset(offset).limit(limit)
+
+
+async def build(db, member_id, loans_limit=OVERVIEW_LIMIT, history_limit=OVERVIEW_HISTORY_LIMIT,
+                reservations_limit=OVERVIEW_LIMIT, fines_limit=OVERVIEW_LIMIT,
+                history_offset=0, reservations_offset=0, fines_offset=0):
+    """MemberOverviewResponse dict (None: no such member)"""
+    async def rows(query):
+        return [row._asdict() for row in (await db.execute(query)).all()]
+
+    totals = (await db.execute(totals_query(member_id))).first()
+    if totals is None:
+        return None
+    totals = totals._asdict()
+    member = {key: totals.pop(key) for key in ("id", "email", "full_name", "status")}
+    member["total_fines_due"] = totals.pop("fines_due")
+    loans = await rows(loans_query(member_id, loans_limit, history_limit, history_offset)) \
+        if loans_limit or history_limit else []
+    return {
+        "member": member,
+        "active_loans": [loan for loan in loans if loan["status"] == "Active"],
+        "past_loans": [loan for loan in loans if loan["status"] == "Returned"],
+        "reservations": await rows(reservations_query(member_id, reservations_limit, reservations_offset))
+        if reservations_limit else [],
+        "fines": await rows(fines_query(member_id, fines_limit, fines_offset)) if fines_limit else [],
+        **totals,
+    }
@@ -0,0 +1,287 @@
+"""
+Member lookup for the circulation desk and member management (GET /api/members/search).
+
+1. Exact fast paths, one indexed query: member id ("123" / "#123"), email, phone number
+   ("0912 345 678" finds 0912345678). When any of them hits, that's the answer.
+2. Otherwise a ranked fuzzy search, at most `limit` members:
+   - PostgreSQL with pg_trgm (migration 0009): word_similarity against full_name / email and a
+     substring match on phone_number, all answered from the GIN trigram indexes.
+   - Anything else (SQLite, or a server without the pg_trgm extension): MemberIndex, the same
+     trigrams kept in memory. Built on first use (or at startup with PRELOAD_MEMBER_INDEX=1),
+     new members are picked up every MEMBER_INDEX_SYNC_INTERVAL seconds (and at once by the
+     worker that registered or edited them), and everything is re-read in the background every
+     MEMBER_INDEX_MAX_AGE seconds.
+
+Typos are handled by trigram overlap, not edit distance: "Jhon Smiht" still shares "  j", "  s",
+" sm" and "smi" with "John Smith". MEMBER_SEARCH_THRESHOLD is the share of the query's trigrams a
+member must have.
+
+numpy is imported on first use (see recommendation.py).
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from functools import lru_cache
+
+from sqlalchemy import case, func, literal, or_, select, text
+
+from database import ReadSessionLocal
+import models
+
+MEMBER_SEARCH_LIMIT = 50          # Default page size
+MEMBER_SEARCH_MAX_LIMIT = 200
+MEMBER_SEARCH_THRESHOLD = 0.3     # pg_trgm's word_similarity_threshold is 0.6: too strict for typos
+MEMBER_PHONE_MIN_DIGITS = 7       # Shorter digit strings are ids (or phone fragments, fuzzily)
+MEMBER_INDEX_SYNC_INTERVAL = 30   # Seconds between catch-up queries for new members
+MEMBER_INDEX_MAX_AGE = 3600       # Seconds before a background rebuild (names / phones edited elsewhere)
+MEMBER_INDEX_MAX_DF = 0.1         # Query trigrams found in more than 10% of members are skipped...
+MEMBER_INDEX_MAX_DF_MIN = 1000    # ... once there are enough members for that to mean anything
+
+WORD = re.compile(r"[^\W_]+")
+PHONE = re.compile(r"[\d\s()+.-]+")
+MEMBER_ID = re.compile(r"#?(\d{1,9})")
+
+_trgm = {}     # engine -> pg_trgm installed?
+_index = None
+_index_lock = threading.Lock()
+_rebuilding = False
+
+
+def trigrams(text):
+    """pg_trgm's trigrams: lowercased alphanumeric words padded as '  word '"""
+    return set().union(*map(_word_trigrams, WORD.findall(text.lower()))) if text else set()
+
+
+@lru_cache(maxsize=2 ** 16)
+def _word_trigrams(word):
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def member_text(full_name, email, phone_number):
+    """What the fuzzy search matches: the name, the local part of the email, the phone digits"""
+    return " ".join((full_name or "", (email or "").split("@")[0], re.sub(r"\D", "", phone_number or "")))
+
+
+def exact_filter(q):
+    """OR of the exact-match conditions that apply to q; None when none does"""
+    conditions = []
+    id_match = MEMBER_ID.fullmatch(q)
+    if id_match:
+        conditions.append(models.Member.id == int(id_match.group(1)))
+    if "@" in q:
+        conditions.append(models.Member.email.in_({q, q.lower()}))
+    digits = re.sub(r"\D", "", q)
+    if len(digits) >= MEMBER_PHONE_MIN_DIGITS and PHONE.fullmatch(q):
+        conditions.append(models.Member.phone_number.in_({q, digits}))
+    return or_(*conditions) if conditions else None
+
+
+def has_trgm(db):
+    engine = db.get_bind()
+    if engine not in _trgm:
+        _trgm[engine] = engine.dialect.name == "postgresql" and bool(
+            db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar()
+        )
+    return _trgm[engine]
+
+
+def trigram_query(q, limit):
+    """Member ids, best first, via pg_trgm (`<%` uses pg_trgm.word_similarity_threshold, set by search())"""
+    Member = models.Member
+    name_score = func.word_similarity(q, Member.full_name)
+    email_score = func.word_similarity(q, Member.email)
+    conditions = [literal(q).op("<%")(Member.full_name), literal(q).op("<%")(Member.email)]
+    score = func.greatest(name_score, email_score)
+    digits = re.sub(r"\D", "", q)
+    if len(digits) >= 3 and PHONE.fullmatch(q):
+        phone_match = Member.phone_number.like(f"%{digits}%")
+        conditions.append(phone_match)
+        score = func.greatest(score, case((phone_match, 1.0), else_=0.0))
+    return select(Member.id).where(or_(*conditions)).order_by(score.desc(), Member.id).limit(limit)
+
+
+class MemberIndex:
+    """
+    Trigram postings (trigram -> rows), one row per indexed member version. The bulk of them is
+    one CSR-like array built at once (base); members added / edited afterwards go to small
+    per-trigram arrays (delta) and their old row is masked.
+    """
+
+    def __init__(self, ids, grams, indptr, postings):
+        self.ids = ids                  # Base row -> member id (int32)
+        self.grams = grams              # Trigram -> position in indptr
+        self.indptr = indptr            # Base rows of trigram g: postings[indptr[g]:indptr[g + 1]]
+        self.postings = postings
+        self.extra_ids = array("i")     # Delta row (len(ids) + i) -> member id
+        self.delta = {}                 # Trigram -> array of delta rows
+        self.row_of = {}                # Member id -> delta row, for members indexed since the build
+        self.dead = set()               # Rows superseded by a newer version of the member
+        self.max_id = int(ids.max()) if len(ids) else 0
+        self.built_at = self.synced_at = time.monotonic()
+
+    @classmethod
+    def build(cls, rows):
+        """(id, full_name, email, phone_number) rows, sorted by id -> index; the trigram sets are the only per-row Python work"""
+        import numpy as np
+        grams, flat, lengths, ids = {}, array("i"), array("i"), array("i")
+        for member_id, full_name, email, phone_number in rows:
+            row_grams = [grams.setdefault(g, len(grams)) for g in trigrams(member_text(full_name, email, phone_number))]
+            flat.extend(row_grams)
+            lengths.append(len(row_grams))
+            ids.append(member_id)
+        flat = np.frombuffer(flat, dtype=np.int32)
+        rows_of = np.repeat(np.arange(len(ids), dtype=np.int32), np.frombuffer(lengths, dtype=np.int32))
+        postings = rows_of[np.argsort(flat, kind="stable")]  # Rows ascending within each trigram
+        indptr = np.zeros(len(grams) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat, minlength=len(grams)), out=indptr[1:])
+        return cls(np.frombuffer(ids, dtype=np.int32), grams, indptr, postings)
+
+    @classmethod
+    def load(cls, db):
+        Member = models.Member
+        statement = select(Member.id, Member.full_name, Member.email, Member.phone_number)\
+            .order_by(Member.id).execution_options(yield_per=50000)
+        return cls.build(tuple(row) for row in db.execute(statement))
+
+    def catch_up(self, db):
+        """Members registered (by any worker) since the last look"""
+        Member = models.Member
+        for row in db.execute(select(Member.id, Member.full_name, Member.email, Member.phone_number)
+                              .where(Member.id > self.max_id).order_by(Member.id)):
+            self.add(*row)
+        self.synced_at = time.monotonic()
+
+    def add(self, member_id, full_name, email, phone_number):
+        import numpy as np
+        old = self.row_of.get(member_id)
+        if old is None:
+            old = int(np.searchsorted(self.ids, member_id))
+            old = old if old < len(self.ids) and self.ids[old] == member_id else None
+        if old is not None:
+            self.dead.add(old)
+        row = len(self.ids) + len(self.extra_ids)
+        self.extra_ids.append(member_id)
+        self.row_of[member_id] = row
+        self.max_id = max(self.max_id, member_id)
+        for gram in trigrams(member_text(full_name, email, phone_number)):
+            postings = self.delta.get(gram)
+            if postings is None:
+                postings = self.delta[gram] = array("i")
+            postings.append(row)
+
+    def _rows(self, gram):
+        import numpy as np
+        g = self.grams.get(gram)
+        base = self.postings[self.indptr[g]:self.indptr[g + 1]] if g is not None else self.postings[:0]
+        if gram in self.delta:
+            return np.concatenate([base, np.frombuffer(self.delta[gram], dtype=np.int32)])
+        return base
+
+    def search(self, q, limit, threshold=MEMBER_SEARCH_THRESHOLD):
+        """Member ids, best match first"""
+        import numpy as np
+        n = len(self.ids) + len(self.extra_ids)
+        query = trigrams(q)
+        postings = [rows for rows in map(self._rows, query) if len(rows)]
+        if not postings:
+            return []
+        need_of = len(query)
+        if n >= MEMBER_INDEX_MAX_DF_MIN:
+            # "  a", "mem", "ber"... match a large share of members and tell them apart from nothing
+            specific = [rows for rows in postings if len(rows) <= MEMBER_INDEX_MAX_DF * n]
+            if specific:
+                need_of -= len(postings) - len(specific)
+                postings = specific
+        counts = np.bincount(np.concatenate(postings), minlength=n)
+        if self.dead:
+            counts[list(self.dead)] = 0
+        candidates = np.flatnonzero(counts >= max(math.ceil(threshold * need_of), 1))
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-counts[candidates], limit - 1)[:limit]]
+        # Best score first, then oldest member (lowest row) among equals
+        candidates = candidates[np.lexsort((candidates, -counts[candidates]))]
+        ids = np.concatenate([self.ids, np.frombuffer(self.extra_ids, dtype=np.int32)])
+        return ids[candidates].tolist()
+
+
+def _rebuild():
+    """Full re-read in the background (edits made by other workers); the old index serves meanwhile"""
+    global _index, _rebuilding
+    db = ReadSessionLocal()
+    try:
+        started = time.perf_counter()
+        index = MemberIndex.load(db)
+        with _index_lock:
+            _index = index
+        print(f"🔎 Member search index: {len(index.ids):,} members in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+        _rebuilding = False
+
+
+def warm_up():
+    """PRELOAD_MEMBER_INDEX: build the in-memory index at startup instead of on the first search"""
+    db = ReadSessionLocal()
+    try:
+        if has_trgm(db):
+            return
+    finally:
+        db.close()
+    with _index_lock:
+        if _index is not None:
+            return
+    _rebuild()
+
+
+def get_index(db):
+    """The worker's MemberIndex (call under _index_lock): built on first use, caught up / rebuilt as needed"""
+    global _index, _rebuilding
+    if _index is None:
+        started = time.perf_counter()
+        _index = MemberIndex.load(db)
+        print(f"🔎 Member search index: {len(_index.ids):,} members in {time.perf_counter() - started:.1f}s")
+    now = time.monotonic()
+    if now - _index.built_at > MEMBER_INDEX_MAX_AGE and not _rebuilding:
+        _rebuilding = True
+        threading.Thread(target=_rebuild, daemon=True).start()
+    if now - _index.synced_at > MEMBER_INDEX_SYNC_INTERVAL:
+        _index.catch_up(db)
+    return _index
+
+
+def index_member(member):
+    """Registration / profile edit: visible to this worker's in-memory search at once (no-op until it's built)"""
+    with _index_lock:
+        if _index is not None:
+            _index.add(member.id, member.full_name, member.email, member.phone_number)
+
+
+def search(db, q, limit=MEMBER_SEARCH_LIMIT):
+    """Members matching q, best first: exact id / email / phone hits if any, else fuzzy; newest members for an empty q"""
+    Member = models.Member
+    q = q.strip()
+    limit = max(1, min(limit, MEMBER_SEARCH_MAX_LIMIT))
+    if not q:
+        return db.query(Member).order_by(Member.id.desc()).limit(limit).all()
+
+    exact = exact_filter(q)
+    if exact is not None:
+        members = db.query(Member).filter(exact).order_by(Member.id).limit(limit).all()
+        if members:
+            return members
+
+    if has_trgm(db):
+        db.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+                   {"t": str(MEMBER_SEARCH_THRESHOLD)})
+        ids = db.execute(trigram_query(q, limit)).scalars().all()
+    else:
+        with _index_lock:
+            ids = get_index(db).search(q, limit)
+    if not ids:
+        return []
+    rank = {member_id: i for i, member_id in enumerate(ids)}
+    members = db.query(Member).filter(Member.id.in_(ids)).all()  # Deleted since indexing: simply gone
+    return sorted(members, key=lambda m: rank[m.id])
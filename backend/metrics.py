@@ -0,0 +1,161 @@
+"""
+Prometheus metrics: HTTP routes, scheduler tasks, recommendations and DB pools.
+
+Single process: metrics live in the default registry.
+Several uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty directory
+shared by the workers (wipe it before every start). Each worker then writes
+its samples there and /metrics aggregates all of them, whichever worker
+answers the scrape.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event
+
+import database
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# --- HTTP ---
+REQUEST_LATENCY = Histogram(
+    "library_http_request_duration_seconds", "Request latency by route template",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    "library_http_requests_total", "Requests by route template and status code",
+    ["method", "route", "status"]
+)
+IN_FLIGHT = Gauge(
+    "library_http_requests_in_flight", "Requests currently being served",
+    multiprocess_mode="livesum"
+)
+
+# --- Scheduler ---
+SCHEDULER_TASK_DURATION = Histogram(
+    "library_scheduler_task_duration_seconds", "Duration of each maintenance task",
+    ["task"], buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+)
+SCHEDULER_TASK_ROWS = Counter(
+    "library_scheduler_task_rows_total", "Rows touched by each maintenance task", ["task"]
+)
+SCHEDULER_TASK_FAILURES = Counter(
+    "library_scheduler_task_failures_total", "Maintenance tasks that raised", ["task"]
+)
+
+# --- Recommendations ---
+RECOMMENDATION_LATENCY = Histogram(
+    "library_recommendation_duration_seconds", "Time to compute recommendations for one request",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+RECOMMENDATION_FALLBACKS = Counter(
+    "library_recommendation_fallbacks_total", "Requests served the popular titles instead (busy / timeout / error)",
+    ["reason"]
+)
+RECOMMENDATION_EVENTS = Counter(
+    "library_recommendation_events_total", "Loan / view events for incremental updates (applied / no_model / dropped / failed)",
+    ["result"]
+)
+
+# --- Caches (cache.py) ---
+CACHE_REQUESTS = Counter(
+    "library_cache_requests_total", "Cache lookups by outcome (hit / miss / background refresh)",
+    ["cache", "result"]
+)
+
+# --- Google Books (google_books.py) ---
+GOOGLE_BOOKS_LOOKUPS = Counter(
+    "library_google_books_lookups_total", "Lookups by outcome (cached / found / not_found / retried / failed)",
+    ["result"]
+)
+
+# --- DB connection pools ---
+POOL_CHECKED_OUT = Gauge(
+    "library_db_pool_checked_out", "Connections currently checked out", ["pool"], multiprocess_mode="livesum"
+)
+POOL_SIZE = Gauge(
+    "library_db_pool_size", "Configured pool size (excluding overflow)", ["pool"], multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge(
+    "library_db_pool_overflow", "Overflow connections currently open", ["pool"], multiprocess_mode="livesum"
+)
+POOL_WAIT = Histogram(
+    "library_db_pool_wait_seconds", "Time spent waiting for a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+POOL_TIMEOUTS = Counter(
+    "library_db_pool_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT", ["pool"]
+)
+
+
+def _observe_pool_checkout(name, waited, timed_out):
+    POOL_WAIT.labels(name).observe(waited)
+    if timed_out:
+        POOL_TIMEOUTS.labels(name).inc()
+
+
+def _watch_pool(name, engine):
+    def refresh(returning=0):
+        pool = engine.pool
+        POOL_CHECKED_OUT.labels(name).set(pool.checkedout() - returning)
+        POOL_SIZE.labels(name).set(pool.size())
+        POOL_OVERFLOW.labels(name).set(max(pool.overflow(), 0))
+
+    # 'checkin' fires before the connection is handed back, so it still counts as checked out
+    event.listen(engine, "checkout", lambda *_: refresh())
+    event.listen(engine, "checkin", lambda *_: refresh(returning=1))
+    refresh()
+
+
+database.pool_observers.append(_observe_pool_checkout)
+for _name, (_engine, _stats) in database.pool_registry.items():
+    _watch_pool(_name, _engine)
+
+
+@contextmanager
+def track_task(task):
+    """Times a scheduler task; set .rows on the yielded object to report rows touched"""
+    class Outcome:
+        rows = 0
+    outcome = Outcome()
+    started = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        SCHEDULER_TASK_FAILURES.labels(task).inc()
+        raise
+    finally:
+        SCHEDULER_TASK_DURATION.labels(task).observe(time.perf_counter() - started)
+        SCHEDULER_TASK_ROWS.labels(task).inc(outcome.rows)
+
+
+async def metrics_middleware(request, call_next):
+    IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        # Route templates keep label cardinality bounded (/api/books/{book_id}, not every id)
+        template = route.path if route is not None else "<unmatched>"
+        REQUEST_LATENCY.labels(request.method, template).observe(time.perf_counter() - started)
+        REQUESTS.labels(request.method, template, str(status_code)).inc()
+
+
+def render():
+    """(body, content type) for the /metrics endpoint"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
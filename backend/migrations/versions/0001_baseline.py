@@ -0,0 +1,133 @@
+"""Baseline schema (the tables main.py used to create with create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created before migrations existed already have these tables:
+    # adopt them as-is instead of failing on CREATE TABLE.
+    if sa.inspect(op.get_bind()).has_table("members"):
+        return
+
+    op.create_table(
+        "members",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("phone_number", sa.String(), nullable=True),
+        sa.Column("address", sa.String(), nullable=True),
+        sa.Column("date_registered", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("status", sa.String(), nullable=True),
+    )
+    op.create_index("ix_members_id", "members", ["id"])
+    op.create_index("ix_members_email", "members", ["email"], unique=True)
+
+    op.create_table(
+        "librarians",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String(), nullable=False),
+        sa.Column("role", sa.String(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_librarians_id", "librarians", ["id"])
+    op.create_index("ix_librarians_email", "librarians", ["email"], unique=True)
+
+    op.create_table(
+        "books",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String(), nullable=False),
+        sa.Column("author", sa.String(), nullable=False),
+        sa.Column("isbn", sa.String(), nullable=True),
+        sa.Column("publisher", sa.String(), nullable=True),
+        sa.Column("publication_year", sa.String(), nullable=True),
+        sa.Column("genre", sa.String(), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("cover_image_url", sa.String(), nullable=True),
+    )
+    op.create_index("ix_books_id", "books", ["id"])
+    op.create_index("ix_books_title", "books", ["title"])
+    op.create_index("ix_books_author", "books", ["author"])
+    op.create_index("ix_books_isbn", "books", ["isbn"], unique=True)
+
+    op.create_table(
+        "book_items",
+        sa.Column("barcode", sa.String(), primary_key=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+        sa.Column("date_acquired", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_book_items_barcode", "book_items", ["barcode"])
+
+    op.create_table(
+        "loans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("book_item_id", sa.String(), sa.ForeignKey("book_items.barcode"), nullable=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("issue_date", sa.Date(), nullable=True),
+        sa.Column("due_date", sa.Date(), nullable=False),
+        sa.Column("return_date", sa.Date(), nullable=True),
+        sa.Column("renewal_count", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+    )
+    op.create_index("ix_loans_id", "loans", ["id"])
+
+    op.create_table(
+        "reservations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("reservation_date", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("status", sa.String(), nullable=True),
+    )
+    op.create_index("ix_reservations_id", "reservations", ["id"])
+
+    op.create_table(
+        "book_views",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id"), nullable=True),
+        sa.Column("view_date", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_book_views_id", "book_views", ["id"])
+
+    op.create_table(
+        "fines",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("loan_id", sa.Integer(), sa.ForeignKey("loans.id"), nullable=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("amount_paid", sa.Float(), nullable=True),
+        sa.Column("reason", sa.String(), nullable=True),
+        sa.Column("status", sa.String(), nullable=True),
+    )
+    op.create_index("ix_fines_id", "fines", ["id"])
+
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("is_read", sa.Boolean(), nullable=True),
+    )
+    op.create_index("ix_notifications_id", "notifications", ["id"])
+
+
+def downgrade():
+    for table in ["notifications", "fines", "book_views", "reservations", "loans",
+                  "book_items", "books", "librarians", "members"]:
+        op.drop_table(table)
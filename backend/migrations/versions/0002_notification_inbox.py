@@ -0,0 +1,54 @@
+"""Notification inbox indexes, archive table and loan reminders
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("notifications") as batch:
+        batch.add_column(sa.Column("loan_id", sa.Integer(), nullable=True))
+        batch.add_column(sa.Column("kind", sa.String(), nullable=True))
+        batch.create_foreign_key("fk_notifications_loan_id", "loans", ["loan_id"], ["id"])
+
+    unread = sa.text("is_read = false")
+    read = sa.text("is_read = true")
+    has_loan = sa.text("loan_id IS NOT NULL")
+    op.create_index("ix_notifications_member_created", "notifications", ["member_id", "created_at"])
+    op.create_index("ix_notifications_member_unread", "notifications", ["member_id"],
+                    postgresql_where=unread, sqlite_where=unread)
+    op.create_index("ix_notifications_read_created", "notifications", ["created_at"],
+                    postgresql_where=read, sqlite_where=read)
+    op.create_index("uq_notifications_loan_kind", "notifications", ["loan_id", "kind"], unique=True,
+                    postgresql_where=has_loan, sqlite_where=has_loan)
+
+    op.create_table(
+        "notifications_archive",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("member_id", sa.Integer(), sa.ForeignKey("members.id"), nullable=True),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_notifications_archive_member_id", "notifications_archive", ["member_id"])
+
+
+def downgrade():
+    op.drop_table("notifications_archive")
+    op.drop_index("uq_notifications_loan_kind", table_name="notifications")
+    op.drop_index("ix_notifications_read_created", table_name="notifications")
+    op.drop_index("ix_notifications_member_unread", table_name="notifications")
+    op.drop_index("ix_notifications_member_created", table_name="notifications")
+    with op.batch_alter_table("notifications") as batch:
+        batch.drop_constraint("fk_notifications_loan_id", type_="foreignkey")
+        batch.drop_column("kind")
+        batch.drop_column("loan_id")
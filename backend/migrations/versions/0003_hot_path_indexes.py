@@ -0,0 +1,35 @@
+"""Composite indexes for the hot circulation / catalog filters
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    active = sa.text("status = 'Active'")
+    op.create_index("ix_loans_member_status", "loans", ["member_id", "status"])
+    op.create_index("ix_loans_item_status", "loans", ["book_item_id", "status"])
+    op.create_index("ix_loans_active_due_date", "loans", ["due_date"],
+                    postgresql_where=active, sqlite_where=active)
+    op.create_index("ix_book_items_book_status", "book_items", ["book_id", "status"])
+    op.create_index("ix_reservations_book_status_date", "reservations",
+                    ["book_id", "status", "reservation_date"])
+    op.create_index("ix_fines_member_status", "fines", ["member_id", "status"])
+
+
+def downgrade():
+    op.drop_index("ix_fines_member_status", table_name="fines")
+    op.drop_index("ix_reservations_book_status_date", table_name="reservations")
+    op.drop_index("ix_book_items_book_status", table_name="book_items")
+    op.drop_index("ix_loans_active_due_date", table_name="loans")
+    op.drop_index("ix_loans_item_status", table_name="loans")
+    op.drop_index("ix_loans_member_status", table_name="loans")
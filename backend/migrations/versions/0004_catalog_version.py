@@ -0,0 +1,30 @@
+"""Catalog version counter for HTTP ETags
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+import time
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table = op.create_table(
+        "catalog_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+    )
+    # Start from the current time rather than 1 so a rebuilt database never reuses an old ETag
+    op.bulk_insert(table, [{"id": 1, "version": int(time.time())}])
+
+
+def downgrade():
+    op.drop_table("catalog_version")
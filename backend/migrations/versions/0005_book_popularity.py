@@ -0,0 +1,54 @@
+"""Time-decayed popularity score per title, backfilled from the loan history
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+import math
+from collections import defaultdict
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# Frozen copies of popularity.POPULARITY_EPOCH / POPULARITY_HALF_LIFE_DAYS at the time of this revision.
+# If those change, run `python popularity.py` to rebuild the scores.
+EPOCH = date(2024, 1, 1)
+DECAY = math.log(2) / 30
+
+
+def upgrade():
+    table = op.create_table(
+        "book_popularity",
+        sa.Column("book_id", sa.Integer(), sa.ForeignKey("books.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("score", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_book_popularity_score", "book_popularity", ["score"])
+
+    loans = sa.table("loans", sa.column("book_item_id", sa.String), sa.column("issue_date", sa.Date))
+    items = sa.table("book_items", sa.column("barcode", sa.String), sa.column("book_id", sa.Integer))
+    per_day = op.get_bind().execute(
+        sa.select(items.c.book_id, loans.c.issue_date, sa.func.count())
+        .select_from(loans.join(items, items.c.barcode == loans.c.book_item_id))
+        .where(loans.c.issue_date.is_not(None))
+        .group_by(items.c.book_id, loans.c.issue_date)
+    )
+    scores = defaultdict(float)
+    for book_id, issued, count in per_day:
+        if isinstance(issued, str):  # SQLite without type processing
+            issued = date.fromisoformat(issued[:10])
+        scores[book_id] += count * math.exp(DECAY * (issued - EPOCH).days)
+    if scores:
+        op.bulk_insert(table, [{"book_id": book_id, "score": score} for book_id, score in scores.items()])
+
+
+def downgrade():
+    op.drop_index("ix_book_popularity_score", table_name="book_popularity")
+    op.drop_table("book_popularity")
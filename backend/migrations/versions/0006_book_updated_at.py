@@ -0,0 +1,26 @@
+"""books.updated_at, for incremental content-index updates
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Set by the ORM (default / onupdate). Existing rows stay NULL: no table rewrite, and the
+    # full index build covers them anyway (content_recommendation.py only syncs non-NULL rows)
+    op.add_column("books", sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index("ix_books_updated_at", "books", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_books_updated_at", table_name="books")
+    op.drop_column("books", "updated_at")
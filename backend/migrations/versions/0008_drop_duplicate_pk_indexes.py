@@ -0,0 +1,25 @@
+"""Drop ix_books_id / ix_book_items_barcode: copies of the primary key indexes
+
+Every insert into books / book_items (bulk catalog import) was maintaining one btree too many.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_books_id", table_name="books")
+    op.drop_index("ix_book_items_barcode", table_name="book_items")
+
+
+def downgrade():
+    op.create_index("ix_book_items_barcode", "book_items", ["barcode"])
+    op.create_index("ix_books_id", "books", ["id"])
@@ -0,0 +1,39 @@
+"""Member search: phone number index, pg_trgm GIN indexes on name / email / phone
+
+The trigram indexes need the pg_trgm extension (contrib). Where the server doesn't ship it
+(or on SQLite) only the phone index is created and member_search.py uses its in-memory index.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+TRGM_COLUMNS = ("full_name", "email", "phone_number")
+
+
+def upgrade():
+    op.create_index("ix_members_phone_number", "members", ["phone_number"])
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    if not bind.execute(sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar():
+        print("⚠️  pg_trgm isn't available on this server: member search will use its in-memory index")
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in TRGM_COLUMNS:
+        op.create_index(f"ix_members_{column}_trgm", "members", [column],
+                        postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"})
+
+
+def downgrade():
+    for column in TRGM_COLUMNS:
+        op.execute(f"DROP INDEX IF EXISTS ix_members_{column}_trgm")
+    op.drop_index("ix_members_phone_number", table_name="members")
@@ -0,0 +1,21 @@
+"""Index a member's holds (member overview / "my reservations" filter on member_id + status)
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_reservations_member_status", "reservations", ["member_id", "status"])
+
+
+def downgrade():
+    op.drop_index("ix_reservations_member_status", table_name="reservations")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, Float, DateTime, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, ForeignKey, Float, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -24,6 +24,12 @@ class Member(Base):
     reservations = relationship("Reservation", back_populates="member")
     fines = relationship("Fine", back_populates="member")
 
+    __table_args__ = (
+        # Circulation desk: exact phone lookup. The trigram indexes for fuzzy search (migration 0009)
+        # need pg_trgm, so they live in the migration only (see member_search.py)
+        Index("ix_members_phone_number", phone_number),
+    )
+
 class Librarian(Base):
     __tablename__ = "librarians"
 
@@ -43,7 +49,7 @@ class Book(Base):
     """The Abstract Book (Bibliographic Info)"""
     __tablename__ = "books"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)  # No extra index: the primary key is one (migration 0008)
     title = Column(String, index=True, nullable=False)
     author = Column(String, index=True, nullable=False)
     isbn = Column(String, unique=True, index=True, nullable=True)
@@ -52,16 +58,47 @@ class Book(Base):
     genre = Column(String, nullable=True)
     description = Column(Text, nullable=True)
     cover_image_url = Column(String, nullable=True)
+    # Set on every ORM insert / update: content_recommendation.py catches up on it
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
 
     # Relationships
     items = relationship("BookItem", back_populates="book")
     reservations = relationship("Reservation", back_populates="book")
 
+class CatalogVersion(Base):
+    """Single-row counter bumped on title edits and added / removed copies (catalog ETags, see http_cache.py)"""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+class BookPopularity(Base):
+    """Time-decayed loan score per title, maintained on every issue (see popularity.py)"""
+    __tablename__ = "book_popularity"
+
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_book_popularity_score", score),
+    )
+
+class MemberRecommendation(Base):
+    """Precomputed top-N picks per member, written by batch_recommendation.py"""
+    __tablename__ = "member_recommendations"
+
+    member_id = Column(Integer, ForeignKey("members.id", ondelete="CASCADE"), primary_key=True)
+    rank = Column(Integer, primary_key=True)  # 0 = best
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
 class BookItem(Base):
     """The Physical Copy on the shelf"""
     __tablename__ = "book_items"
 
-    barcode = Column(String, primary_key=True, index=True) # Physical barcode sticker
+    barcode = Column(String, primary_key=True) # Physical barcode sticker
     book_id = Column(Integer, ForeignKey("books.id"))
     
     # Status: 'Available', 'Borrowed', 'Lost', 'Maintenance'
@@ -72,6 +109,10 @@ class BookItem(Base):
     book = relationship("Book", back_populates="items")
     loans = relationship("Loan", back_populates="book_item")
 
+    __table_args__ = (
+        Index("ix_book_items_book_status", book_id, status),
+    )
+
 
 # --- Circulation (Transactions) ---
 
@@ -82,7 +123,7 @@ class Loan(Base):
     book_item_id = Column(String, ForeignKey("book_items.barcode"))
     member_id = Column(Integer, ForeignKey("members.id"))
     
-    issue_date = Column(Date, default=func.now())
+    issue_date = Column(Date, default=func.current_date())
     due_date = Column(Date, nullable=False)
     return_date = Column(Date, nullable=True)
     
@@ -96,6 +137,14 @@ class Loan(Base):
     member = relationship("Member", back_populates="loans")
     fine = relationship("Fine", back_populates="loan", uselist=False)
 
+    __table_args__ = (
+        Index("ix_loans_member_status", member_id, status),
+        Index("ix_loans_item_status", book_item_id, status),
+        # Scheduler scans (overdue fines, due-date reminders) only look at active loans
+        Index("ix_loans_active_due_date", due_date,
+              postgresql_where=(status == "Active"), sqlite_where=(status == "Active")),
+    )
+
 class Reservation(Base):
     __tablename__ = "reservations"
 
@@ -111,6 +160,13 @@ class Reservation(Base):
     book = relationship("Book", back_populates="reservations")
     member = relationship("Member", back_populates="reservations")
 
+    __table_args__ = (
+        # Queue lookups: next pending hold / position in line for a title
+        Index("ix_reservations_book_status_date", book_id, status, reservation_date),
+        # A member's open holds (member overview, "my reservations")
+        Index("ix_reservations_member_status", member_id, status),
+    )
+
 
     
 class BookView(Base):
@@ -143,6 +199,10 @@ class Fine(Base):
     loan = relationship("Loan", back_populates="fine")
     member = relationship("Member", back_populates="fines")
 
+    __table_args__ = (
+        Index("ix_fines_member_status", member_id, status),
+    )
+
 # --- New Notification Class ---
 class Notification(Base):
     __tablename__ = "notifications"
@@ -153,4 +213,32 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_read = Column(Boolean, default=False)
 
+    # Set for system reminders tied to a loan, e.g. kind='due_soon'
+    loan_id = Column(Integer, ForeignKey("loans.id"), nullable=True)
+    kind = Column(String, nullable=True)
+
     member = relationship("Member", back_populates="notifications")
+
+    __table_args__ = (
+        # One reminder of each kind per loan (makes the fan-out idempotent)
+        Index("uq_notifications_loan_kind", loan_id, kind, unique=True,
+              postgresql_where=(loan_id != None), sqlite_where=(loan_id != None)),
+        # Inbox: newest-first keyset pagination per member
+        Index("ix_notifications_member_created", member_id, created_at),
+        # Unread badge / "mark all as read" only touch the small unread slice
+        Index("ix_notifications_member_unread", member_id,
+              postgresql_where=(is_read == False), sqlite_where=(is_read == False)),
+        # Retention job: oldest read rows first
+        Index("ix_notifications_read_created", created_at,
+              postgresql_where=(is_read == True), sqlite_where=(is_read == True)),
+    )
+
+class NotificationArchive(Base):
+    """Read notifications moved out of the inbox by the retention job"""
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True) # Same id the row had in 'notifications'
+    member_id = Column(Integer, ForeignKey("members.id"), index=True)
+    message = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,107 @@
+"""
+Time-decayed title popularity, maintained incrementally.
+
+    score(book, now) = sum over its loans of exp(-λ (now - issue_date)),  λ = ln 2 / POPULARITY_HALF_LIFE_DAYS
+
+A loan issued one half-life ago counts half as much as one issued today.
+
+Decaying every score every day would rewrite the whole table. Each loan
+instead adds exp(λ (issue_date - POPULARITY_EPOCH)) to book_popularity.score.
+Every stored score is then the decayed score times the same factor
+exp(λ (now - epoch)), so ORDER BY score already gives the decayed ranking,
+and issuing a book touches a single row (one upsert). Doubles overflow after
+~1000 half-lives (80 years at 30 days); move the epoch forward and rebuild()
+long before that.
+
+The ranking is read through a stampede-protected cache (cache.py); it moves slowly.
+"""
+import argparse
+import math
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from cache import Cache
+from database import ReadSessionLocal, SessionLocal
+import models
+
+POPULARITY_HALF_LIFE_DAYS = 30
+POPULARITY_EPOCH = date(2024, 1, 1)
+DECAY = math.log(2) / POPULARITY_HALF_LIFE_DAYS
+
+POPULAR_CACHE_TTL = 300    # Seconds; refreshed in the background at 80%
+POPULAR_CACHE_SIZE = 50    # Ids ranked per cache entry, callers take a prefix
+
+popular_cache = Cache("popular_books", ttl=POPULAR_CACHE_TTL)
+
+
+def loan_weight(issued: date) -> float:
+    return math.exp(DECAY * (issued - POPULARITY_EPOCH).days)
+
+
+def current_score(stored: float, today: date = None) -> float:
+    """Stored (epoch-scaled) score -> decayed score as of today, in 'loans issued today' units"""
+    return stored / loan_weight(today or date.today())
+
+
+def record_loan(db, book_id: int, issued: date = None):
+    """Adds one loan to the title's score. Runs in the caller's transaction."""
+    table = models.BookPopularity.__table__
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(table).values(book_id=book_id, score=loan_weight(issued or date.today()))
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.book_id],
+        set_={"score": table.c.score + stmt.excluded.score, "updated_at": func.now()},
+    ))
+
+
+def _top_ids():
+    db = ReadSessionLocal()
+    try:
+        return db.execute(
+            select(models.BookPopularity.book_id)
+            .order_by(models.BookPopularity.score.desc())
+            .limit(POPULAR_CACHE_SIZE)
+        ).scalars().all()
+    finally:
+        db.close()
+
+
+def popular_book_ids(limit: int = 5):
+    """Most popular titles right now, best first (cached)"""
+    if limit > POPULAR_CACHE_SIZE:
+        return _top_ids()[:limit]
+    return popular_cache.get("top", _top_ids)[:limit]
+
+
+def rebuild(db, chunk=10000):
+    """Recomputes every score from the loan history (backfill, or after moving the epoch)"""
+    scores = defaultdict(float)
+    per_day = db.execute(
+        select(models.BookItem.book_id, models.Loan.issue_date, func.count(models.Loan.id))
+        .join(models.BookItem, models.BookItem.barcode == models.Loan.book_item_id)
+        .filter(models.Loan.issue_date.is_not(None))
+        .group_by(models.BookItem.book_id, models.Loan.issue_date)
+        .execution_options(yield_per=chunk)
+    )
+    for book_id, issued, loans in per_day:
+        scores[book_id] += loans * loan_weight(issued)
+
+    db.execute(delete(models.BookPopularity))
+    rows = [{"book_id": book_id, "score": score} for book_id, score in scores.items()]
+    for start in range(0, len(rows), chunk):
+        db.execute(insert(models.BookPopularity), rows[start:start + chunk])
+    db.commit()
+    popular_cache.invalidate()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Rebuild book_popularity from the loan history").parse_args()
+    session = SessionLocal()
+    try:
+        print(f"✅ Rebuilt popularity for {rebuild(session)} titles")
+    finally:
+        session.close()
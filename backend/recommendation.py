@@ -1,98 +1,282 @@
-import pandas as pd
-from sklearn.neighbors import NearestNeighbors
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+
+from sqlalchemy import select, func, literal, union_all
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from database import SessionLocal, ReadSessionLocal
 import models
+import popularity
+import metrics
+import batch_recommendation
+import interaction_snapshot
+
+# numpy / scipy / scikit-learn are imported on first use, not at module load: they cost ~1s of
+# import time and a few hundred MB per worker, and most workers never serve a recommendation.
+
+def preload():
+    """Import the ML stack ahead of time (dedicated recommendation workers, see PRELOAD_RECOMMENDER)"""
+    import scipy.sparse
+    import sklearn.feature_extraction.text
+    import sklearn.preprocessing
 
 def get_popular_books(db: Session, limit: int = 5):
-    """Fallback: Returns the book_ids with the most loans"""
-    # SQL: SELECT book_id, COUNT(*) FROM loans JOIN book_items ... GROUP BY book_id ORDER BY DESC
-    results = db.query(models.BookItem.book_id, func.count(models.Loan.id).label('count'))\
-        .join(models.Loan, models.Loan.book_item_id == models.BookItem.barcode)\
-        .group_by(models.BookItem.book_id)\
-        .order_by(func.count(models.Loan.id).desc())\
-        .limit(limit).all()
-    
-    # Extract just the IDs
-    return [r.book_id for r in results]
+    """Fallback: the book_ids with the highest time-decayed loan score (cached, see popularity.py)"""
+    return popularity.popular_book_ids(limit)
 
 def recommend_books(db: Session, member_id: int, limit: int = 5):
     """
-    Weighted Hybrid Recommendation:
-    - Loan = 5 points
-    - View = 1 point
+    Weighted Hybrid Recommendation (loan = 5 points, view = 1), until batch_recommendation.py has
+    saved a model: the same scoring against a model built from the interaction snapshot, so no
+    request reads the whole loans / book_views tables. Popular titles without a snapshot or history.
     """
-    
-    # 1. Fetch Loans (Strong Signal)
-    # Join Loan -> BookItem to get the Abstract Book ID
-    query_loans = db.query(
-        models.Loan.member_id, 
-        models.BookItem.book_id
-    ).join(models.BookItem, models.Loan.book_item_id == models.BookItem.barcode).statement
-    
-    df_loans = pd.read_sql(query_loans, db.bind)
-    df_loans['score'] = 5  # Assign weight
-
-    # 2. Fetch Views (Weak Signal)
-    query_views = db.query(
-        models.BookView.member_id,
-        models.BookView.book_id
-    ).statement
-
-    df_views = pd.read_sql(query_views, db.bind)
-    df_views['score'] = 1  # Assign weight
-
-    # 3. Merge Dataframes
-    df_all = pd.concat([df_loans, df_views])
-
-    if df_all.empty:
+    model = snapshot_model()
+    if model is None:
+        return get_popular_books(db, limit)
+    return score_member(db, member_id, model, limit) or get_popular_books(db, limit)
+
+def score_member(db: Session, member_id: int, model, limit: int = 5):
+    """book_ids from the member's nearest members in the model; [] without history or picks"""
+    interactions = member_interactions(db, member_id, model)
+    if not interactions.nnz:
         return []
+    members = model["members"]
+    row = members.searchsorted(member_id)
+    self_row = row if row < len(members) and members[row] == member_id else -1
+    return [book_id for book_id, _ in batch_recommendation.score_vectors(model, interactions, [self_row], limit)[0]]
 
-    # 4. Aggregate Scores
-    # If a user viewed a book 3 times (3 pts) and borrowed it (5 pts), total = 8 pts
-    df_weighted = df_all.groupby(['member_id', 'book_id'])['score'].sum().reset_index()
+_snapshot_model = None
 
-    # --- Check User History ---
-    # We check if the user has ANY interaction (View OR Loan)
-    user_history = df_weighted[df_weighted['member_id'] == member_id]
-    if len(user_history) == 0:
-        return get_popular_books(db, limit)
+def snapshot_model():
+    """Model trained in memory from the interaction snapshot, rebuilt after each export; None before the first one"""
+    global _snapshot_model
+    manifest = interaction_snapshot.read_manifest()
+    if manifest is None or not manifest["segments"]:
+        return None
+    if _snapshot_model is None or _snapshot_model["segments"] != manifest["segments"]:
+        trained = batch_recommendation.train()
+        if trained is None:
+            return None
+        _snapshot_model = batch_recommendation.attach_matrices(trained)
+        _snapshot_model["segments"] = manifest["segments"]
+    return _snapshot_model
 
-    # 5. Create Weighted Matrix
-    # Values are now Integers (e.g., 1, 5, 6), not just 0/1
-    pivot_table = df_weighted.pivot(index='member_id', columns='book_id', values='score').fillna(0)
-
-    # 6. Fit Model
-    model = NearestNeighbors(metric='cosine', algorithm='brute')
-    model.fit(pivot_table)
-
-    if member_id not in pivot_table.index:
-         return get_popular_books(db, limit)
-
-    # 7. Find Neighbors
-    user_vector = pivot_table.loc[member_id].values.reshape(1, -1)
-    distances, indices = model.kneighbors(user_vector, n_neighbors=min(4, len(pivot_table)))
-
-    # 8. Extract Recommendations
-    similar_users_indices = indices.flatten()
-    recommended_books = []
-    already_interacted = set(user_history['book_id']) # Don't recommend books they already saw/read
-
-    for idx in similar_users_indices:
-        neighbor_id = pivot_table.index[idx]
-        if neighbor_id == member_id:
-            continue
-            
-        # Get neighbor's top rated books (Sort by score descending)
-        neighbor_data = df_weighted[df_weighted['member_id'] == neighbor_id].sort_values('score', ascending=False)
-        
-        for book_id in neighbor_data['book_id']:
-            if book_id not in already_interacted and book_id not in recommended_books:
-                recommended_books.append(book_id)
-                if len(recommended_books) >= limit:
-                    return recommended_books
-
-    if not recommended_books:
-        return get_popular_books(db, limit)
-        
-    return recommended_books
\ No newline at end of file
+
+# ==========================================
+# Incremental updates (loan / view event stream)
+# ==========================================
+# batch_recommendation.py rebuilds every member's picks from a full model (run it nightly / weekly).
+# Between rebuilds, issue_book and log_book_view push the member onto a delta log; a background
+# thread re-reads that member's recent history, finds their nearest members in the current model
+# and rewrites their member_recommendations rows. The cost per event is bounded: at most
+# INCREMENTAL_PROFILE_SIZE titles, each visiting only the members who share it.
+# The log is in memory: events lost to a restart or a full queue wait for the next rebuild.
+
+INCREMENTAL_PROFILE_SIZE = 100  # Most recent titles (loans + views) per member
+EVENT_QUEUE_SIZE = 10000        # Pending events before new ones are dropped
+EVENT_BATCH = 200               # Events drained per round; repeated members are updated once
+MODEL_RELOAD_INTERVAL = 60      # Seconds between checks for a newer model on disk
+
+_events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+_consumer_lock = threading.Lock()
+_consumer = None
+_model = None
+_model_checked = 0.0
+
+def record_interaction(member_id: int):
+    """Called after a loan / view commits: refresh this member's picks in the background"""
+    global _consumer
+    if _consumer is None:
+        with _consumer_lock:
+            if _consumer is None:
+                _consumer = threading.Thread(target=_consume, name="recommendation-events", daemon=True)
+                _consumer.start()
+    try:
+        _events.put_nowait(member_id)
+    except queue.Full:
+        metrics.RECOMMENDATION_EVENTS.labels("dropped").inc()
+
+def current_model():
+    """The newest model from batch_recommendation.py (memory-mapped), None until one was trained"""
+    global _model, _model_checked
+    if time.monotonic() - _model_checked > MODEL_RELOAD_INTERVAL or _model is None:
+        _model_checked = time.monotonic()
+        try:
+            with open(f"{batch_recommendation.RECOMMENDER_MODEL_DIR}/CURRENT") as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if _model is None or not _model["path"].endswith(version):
+            _model = batch_recommendation.load_model()
+    return _model
+
+def member_interactions(db: Session, member_id: int, model):
+    """The member's recent loans (5) / views (1) as one CSR row over the model's books"""
+    import numpy as np
+    import scipy.sparse as sp
+    loans = select(
+        models.BookItem.book_id.label("book_id"), literal(batch_recommendation.LOAN_POINTS).label("points"),
+        models.Loan.id.label("recency"),
+    ).join(models.BookItem, models.Loan.book_item_id == models.BookItem.barcode)\
+     .where(models.Loan.member_id == member_id)\
+     .order_by(models.Loan.id.desc()).limit(INCREMENTAL_PROFILE_SIZE)
+    views = select(
+        models.BookView.book_id.label("book_id"), literal(batch_recommendation.VIEW_POINTS).label("points"),
+        models.BookView.id.label("recency"),
+    ).where(models.BookView.member_id == member_id)\
+     .order_by(models.BookView.id.desc()).limit(INCREMENTAL_PROFILE_SIZE)
+    events = union_all(loans.subquery().select(), views.subquery().select()).subquery()
+    rows = db.execute(
+        select(events.c.book_id, func.sum(events.c.points)).group_by(events.c.book_id)
+    ).all()
+
+    books = model["books"]
+    columns, points = [], []
+    for book_id, total in rows:
+        column = np.searchsorted(books, book_id)
+        if column < len(books) and books[column] == book_id:  # Titles newer than the model can't be compared
+            columns.append(column)
+            points.append(total)
+    return sp.csr_matrix(
+        (np.array(points, dtype=np.float32), (np.zeros(len(columns), dtype=np.int64), columns)),
+        shape=(1, len(books)),
+    )
+
+def update_member(db: Session, member_id: int, model=None):
+    """Recomputes one member's picks against the current model; False if there is no model"""
+    import numpy as np
+    model = model or current_model()
+    if model is None:
+        return False
+    interactions = member_interactions(db, member_id, model)
+    members = model["members"]
+    row = np.searchsorted(members, member_id)
+    self_row = row if row < len(members) and members[row] == member_id else -1
+    picks = batch_recommendation.score_vectors(model, interactions, [self_row])[0] if interactions.nnz else []
+
+    batch_recommendation.write_results(db, [(member_id, picks)], datetime.now(timezone.utc))
+    return True
+
+def _consume():
+    while True:
+        batch = [_events.get()]
+        while len(batch) < EVENT_BATCH:
+            try:
+                batch.append(_events.get_nowait())
+            except queue.Empty:
+                break
+        db = SessionLocal()
+        try:
+            for member_id in dict.fromkeys(batch):
+                # One bad member costs only its own update, not the rest of the batch
+                try:
+                    with metrics.RECOMMENDATION_LATENCY.labels("incremental").time():
+                        applied = update_member(db, member_id)
+                except Exception as e:
+                    print(f"⚠️ Incremental recommendation update failed for member {member_id}: {e}")
+                    db.rollback()
+                    metrics.RECOMMENDATION_EVENTS.labels("failed").inc()
+                    continue
+                metrics.RECOMMENDATION_EVENTS.labels("applied" if applied else "no_model").inc()
+        finally:
+            db.close()
+
+
+# ==========================================
+# Live path: process pool with a deadline
+# ==========================================
+# Scoring holds the GIL (numpy / scipy), so running it on the API's threadpool
+# stalls every other request in the worker. It runs in RECOMMENDER_PROCESSES separate processes
+# instead, which memory-map the batch model (one copy in the page cache for all of them).
+# The endpoint waits at most RECOMMENDATION_TIMEOUT seconds and then serves the popular titles;
+# beyond RECOMMENDATION_MAX_PENDING requests in flight it serves them straight away.
+
+RECOMMENDER_PROCESSES = int(os.getenv("RECOMMENDER_PROCESSES", "2"))
+RECOMMENDATION_TIMEOUT = float(os.getenv("RECOMMENDATION_TIMEOUT", "2.0"))  # Seconds
+RECOMMENDATION_MAX_PENDING = int(os.getenv("RECOMMENDATION_MAX_PENDING", str(RECOMMENDER_PROCESSES * 4)))
+RECOMMENDER_NICE = 10           # Lower CPU priority for the pool processes
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(RECOMMENDATION_MAX_PENDING)
+
+def _init_pool_worker():
+    if hasattr(os, "nice"):
+        os.nice(RECOMMENDER_NICE)  # The OS scheduler favours the API process when cores are short
+    preload()
+    current_model()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the API process has threads (scheduler, event consumer) and DB pools
+            _pool = ProcessPoolExecutor(
+                max_workers=RECOMMENDER_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pool_worker,
+            )
+        return _pool
+
+def warm_up():
+    """PRELOAD_RECOMMENDER: ML imports here (content engine) and every pool process started"""
+    preload()
+    pool = _get_pool()
+    for future in [pool.submit(time.sleep, 0) for _ in range(RECOMMENDER_PROCESSES)]:
+        future.result()
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def compute_recommendations(member_id: int, limit: int = 5):
+    """Runs in a pool process: scores against the batch model when there is one, else the snapshot (recommend_books)"""
+    db = ReadSessionLocal()
+    try:
+        model = current_model()
+        if model is None:
+            return recommend_books(db, member_id, limit)
+        picks = score_member(db, member_id, model, limit)
+        if picks:
+            return picks
+        # No history, or nothing new among the neighbours: refitting on the whole tables wouldn't find more
+        return popularity.popular_book_ids(limit)
+    finally:
+        db.close()
+
+def recommend_with_deadline(member_id: int, limit: int = 5, timeout: float = RECOMMENDATION_TIMEOUT):
+    """book_ids for the member, or the popular titles if the pool is saturated, too slow or failing"""
+    global _pool
+    if not _pending.acquire(blocking=False):
+        metrics.RECOMMENDATION_FALLBACKS.labels("busy").inc()
+        return popularity.popular_book_ids(limit)
+    try:
+        future = _get_pool().submit(compute_recommendations, member_id, limit)
+    except BaseException:
+        _pending.release()
+        raise
+    # Released when the work really ends, not when we stop waiting: a timed-out task still occupies a process
+    future.add_done_callback(lambda _: _pending.release())
+
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        metrics.RECOMMENDATION_FALLBACKS.labels("timeout").inc()
+        print(f"⚠️ Recommendations for member {member_id} took over {timeout}s: serving popular titles")
+    except BrokenProcessPool as e:
+        with _pool_lock:
+            _pool = None  # A pool process died: start a fresh pool on the next request
+        metrics.RECOMMENDATION_FALLBACKS.labels("error").inc()
+        print(f"❌ Recommendation pool crashed ({e}): serving popular titles")
+    except Exception as e:
+        metrics.RECOMMENDATION_FALLBACKS.labels("error").inc()
+        print(f"❌ Recommendations for member {member_id} failed: {e!r}")
+    return popularity.popular_book_ids(limit)
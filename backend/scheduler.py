@@ -1,13 +1,127 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta, date
+from sqlalchemy import insert, select, and_
+from sqlalchemy.dialects import postgresql, sqlite
 from database import SessionLocal
 import models
+import metrics
 
 # Settings
 HOLD_EXPIRY_DAYS = 3
 DAILY_FINE_AMOUNT = 1.0
+NOTIFICATION_RETENTION_DAYS = 90   # Read notifications older than this leave the inbox
+NOTIFICATION_ARCHIVE_BATCH = 5000  # Rows moved per transaction
+REMINDER_DAYS_BEFORE_DUE = 2
+REMINDER_BATCH = 5000              # Notifications written per transaction
+
+def _insert_ignoring_duplicates(db, table):
+    """INSERT that skips rows hitting uq_notifications_loan_kind (two workers racing)"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        stmt = postgresql.insert(table)
+    elif dialect == "sqlite":
+        stmt = sqlite.insert(table)
+    else:
+        return insert(table)
+    return stmt.on_conflict_do_nothing(
+        index_elements=["loan_id", "kind"],
+        index_where=table.c.loan_id.isnot(None)
+    )
+
+def send_due_date_reminders(db, days_before=REMINDER_DAYS_BEFORE_DUE):
+    """
+    Fan-out: one 'due_soon' notification per active loan due in `days_before` days.
+    Loans are read in id-ordered chunks through ix_loans_active_due_date and each
+    chunk is written with a single multi-row INSERT, then committed, so no
+    transaction stays open for the whole run. Loans that already got the
+    reminder are skipped, so re-running the job is safe.
+    """
+    kind = "due_soon"
+    target_date = date.today() + timedelta(days=days_before)
+    sent = 0
+    last_loan_id = 0
+
+    while True:
+        chunk = db.query(
+            models.Loan.id,
+            models.Loan.member_id,
+            models.Loan.due_date,
+            models.Book.title
+        ).join(models.BookItem, models.Loan.book_item_id == models.BookItem.barcode)\
+         .join(models.Book, models.BookItem.book_id == models.Book.id)\
+         .outerjoin(models.Notification, and_(
+             models.Notification.loan_id == models.Loan.id,
+             models.Notification.kind == kind
+         )).filter(
+            models.Loan.status == "Active",
+            models.Loan.due_date == target_date,
+            models.Loan.id > last_loan_id,
+            models.Notification.id.is_(None)
+        ).order_by(models.Loan.id).limit(REMINDER_BATCH).all()
+
+        if not chunk:
+            break
+
+        rows = [{
+            "member_id": loan.member_id,
+            "loan_id": loan.id,
+            "kind": kind,
+            "is_read": False,
+            "message": f"Reminder: '{loan.title}' is due on {loan.due_date}. Please return or renew it."
+        } for loan in chunk]
+        table = models.Notification.__table__
+        # Count what RETURNING gives back: rows skipped by ON CONFLICT (another worker got there first) weren't sent
+        inserted = db.execute(_insert_ignoring_duplicates(db, table).values(rows).returning(table.c.id)).fetchall()
+        db.commit()
+
+        sent += len(inserted)
+        last_loan_id = chunk[-1].id
+        if len(chunk) < REMINDER_BATCH:
+            break
+    return sent
+
+def archive_read_notifications(db):
+    """
+    Moves read notifications older than NOTIFICATION_RETENTION_DAYS into
+    notifications_archive. Works in batches, committing after each one, so
+    the inbox table is never locked for long.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=NOTIFICATION_RETENTION_DAYS)
+    archived = 0
+    while True:
+        batch_ids = [row.id for row in db.query(models.Notification.id).filter(
+            models.Notification.is_read == True,
+            models.Notification.created_at < cutoff
+        ).order_by(models.Notification.created_at).limit(NOTIFICATION_ARCHIVE_BATCH)]
+
+        if not batch_ids:
+            break
+
+        # INSERT ... SELECT + DELETE: one round trip each, no ORM objects
+        db.execute(insert(models.NotificationArchive).from_select(
+            ["id", "member_id", "message", "created_at"],
+            select(
+                models.Notification.id,
+                models.Notification.member_id,
+                models.Notification.message,
+                models.Notification.created_at
+            ).where(models.Notification.id.in_(batch_ids))
+        ))
+        db.query(models.Notification).filter(
+            models.Notification.id.in_(batch_ids)
+        ).delete(synchronize_session=False)
+        db.commit()
+
+        archived += len(batch_ids)
+        if len(batch_ids) < NOTIFICATION_ARCHIVE_BATCH:
+            break
+    return archived
 
 def run_daily_maintenance():
+    with metrics.track_task("daily_maintenance"):
+        _run_daily_maintenance()
+
+def _run_daily_maintenance():
     print(f"⏰ [Scheduler] Running Maintenance Task: {datetime.now()}")
     db = SessionLocal()
     try:
@@ -15,85 +129,102 @@ def run_daily_maintenance():
         # TASK 1: Expire Stale Reservations
         # ==========================================
           # ... (Task 1: Reservation Expiry)
-        expiry_limit = datetime.utcnow() - timedelta(days=HOLD_EXPIRY_DAYS)
-        stale_reservations = db.query(models.Reservation).filter(
-            models.Reservation.status == "Fulfilled",
-            models.Reservation.reservation_date < expiry_limit
-        ).all()
-        
-        for res in stale_reservations:
-            res.status = "Expired"
-            
-            # Find the item that was stuck in "Reserved"
-            stuck_item = db.query(models.BookItem).filter(
-                models.BookItem.book_id == res.book_id,
-                models.BookItem.status == "Reserved"
-            ).first()
-            
-            if stuck_item:
-                # --- NEW: SMART HANDOVER LOGIC ---
-                next_person = db.query(models.Reservation).filter(
-                    models.Reservation.book_id == res.book_id,
-                    models.Reservation.status == "Pending"
-                ).order_by(models.Reservation.reservation_date.asc()).first()
-                
-                if next_person:
-                    next_person.status = "Fulfilled"
-                    # Notify the next person
-                    msg = f"The book '{stuck_item.book.title}' is now ready for you! (The previous hold expired)."
-                    db.add(models.Notification(member_id=next_person.member_id, message=msg))
-                    # Item stays 'Reserved'
-                    print(f"♻️ Scheduler: Hold expired. Reassigned to Member {next_person.member_id}")
-                else:
-                    stuck_item.status = "Available"
-                    print(f"♻️ Scheduler: Hold expired. No one else waiting. Set to Available.")
+        with metrics.track_task("expire_holds") as task:
+            expiry_limit = datetime.utcnow() - timedelta(days=HOLD_EXPIRY_DAYS)
+            stale_reservations = db.query(models.Reservation).filter(
+                models.Reservation.status == "Fulfilled",
+                models.Reservation.reservation_date < expiry_limit
+            ).all()
+
+            for res in stale_reservations:
+                res.status = "Expired"
+
+                # Find the item that was stuck in "Reserved"
+                stuck_item = db.query(models.BookItem).filter(
+                    models.BookItem.book_id == res.book_id,
+                    models.BookItem.status == "Reserved"
+                ).first()
+
+                if stuck_item:
+                    # --- NEW: SMART HANDOVER LOGIC ---
+                    next_person = db.query(models.Reservation).filter(
+                        models.Reservation.book_id == res.book_id,
+                        models.Reservation.status == "Pending"
+                    ).order_by(models.Reservation.reservation_date.asc()).first()
+
+                    if next_person:
+                        next_person.status = "Fulfilled"
+                        # Notify the next person
+                        msg = f"The book '{stuck_item.book.title}' is now ready for you! (The previous hold expired)."
+                        db.add(models.Notification(member_id=next_person.member_id, message=msg))
+                        # Item stays 'Reserved'
+                        print(f"♻️ Scheduler: Hold expired. Reassigned to Member {next_person.member_id}")
+                    else:
+                        stuck_item.status = "Available"
+                        print(f"♻️ Scheduler: Hold expired. No one else waiting. Set to Available.")
+            task.rows = len(stale_reservations)
         
         
         # ==========================================
         # TASK 2: Calculate Daily Fines (FIXED)
         # ==========================================
-        today = date.today()
-        
-        # Find all Active loans that are Overdue
-        overdue_loans = db.query(models.Loan).filter(
-            models.Loan.status == "Active",
-            models.Loan.due_date < today
-        ).all()
-
-        fine_updates = 0
-        for loan in overdue_loans:
-            # 1. Calculate how much the fine SHOULD be right now
-            overdue_days = (today - loan.due_date).days
-            expected_amount = overdue_days * DAILY_FINE_AMOUNT
-
-            # 2. Find existing fine record
-            fine = db.query(models.Fine).filter(
-                models.Fine.loan_id == loan.id,
-                models.Fine.reason == "Overdue"
-            ).first()
-
-            if fine:
-                # OPTIMIZATION: Only update if the amount changed (i.e., a new day passed)
-                if fine.amount != expected_amount:
-                    fine.amount = expected_amount
-                    # If they paid it off previously, re-open the debt
-                    if fine.status == "Paid":
-                        fine.status = "Partial"
+        with metrics.track_task("overdue_fines") as task:
+            today = date.today()
+
+            # Find all Active loans that are Overdue
+            overdue_loans = db.query(models.Loan).filter(
+                models.Loan.status == "Active",
+                models.Loan.due_date < today
+            ).all()
+
+            fine_updates = 0
+            for loan in overdue_loans:
+                # 1. Calculate how much the fine SHOULD be right now
+                overdue_days = (today - loan.due_date).days
+                expected_amount = overdue_days * DAILY_FINE_AMOUNT
+
+                # 2. Find existing fine record
+                fine = db.query(models.Fine).filter(
+                    models.Fine.loan_id == loan.id,
+                    models.Fine.reason == "Overdue"
+                ).first()
+
+                if fine:
+                    # OPTIMIZATION: Only update if the amount changed (i.e., a new day passed)
+                    if fine.amount != expected_amount:
+                        fine.amount = expected_amount
+                        # If they paid it off previously, re-open the debt
+                        if fine.status == "Paid":
+                            fine.status = "Partial"
+                        fine_updates += 1
+                else:
+                    # Create new fine record
+                    fine = models.Fine(
+                        loan_id=loan.id,
+                        member_id=loan.member_id,
+                        amount=expected_amount,
+                        reason="Overdue",
+                        status="Unpaid"
+                    )
+                    db.add(fine)
                     fine_updates += 1
-            else:
-                # Create new fine record
-                fine = models.Fine(
-                    loan_id=loan.id,
-                    member_id=loan.member_id,
-                    amount=expected_amount,
-                    reason="Overdue",
-                    status="Unpaid"
-                )
-                db.add(fine)
-                fine_updates += 1
 
-        db.commit()
-        print(f"✅ [Scheduler] Maintenance Complete. Expired reservations: {len(stale_reservations)}. Updated fines: {fine_updates}.")
+            db.commit()
+            task.rows = fine_updates
+
+        # ==========================================
+        # TASK 3: Due-Date Reminders
+        # ==========================================
+        with metrics.track_task("due_date_reminders") as task:
+            reminders = task.rows = send_due_date_reminders(db)
+
+        # ==========================================
+        # TASK 4: Archive Old Read Notifications
+        # ==========================================
+        with metrics.track_task("archive_notifications") as task:
+            archived = task.rows = archive_read_notifications(db)
+
+        print(f"✅ [Scheduler] Maintenance Complete. Expired reservations: {len(stale_reservations)}. Updated fines: {fine_updates}. Reminders sent: {reminders}. Archived notifications: {archived}.")
         
     except Exception as e:
         print(f"❌ [Scheduler] Error: {e}")
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import date,datetime
 
 class BookBase(BaseModel):
@@ -35,9 +35,49 @@ class BookItemResponse(BookItemCreate):
     class Config:
         from_attributes = True
 
+BULK_ITEMS_MAX = 1000  # Copies per POST /api/books/{id}/items/bulk
+
+class BookItemBulkCreate(BaseModel):
+    # Either an explicit list of barcodes...
+    barcodes: Optional[List[str]] = Field(None, max_length=BULK_ITEMS_MAX)
+    # ... or a range: prefix + zero-padded number, e.g. BR2-000041 .. BR2-000080
+    prefix: Optional[str] = None
+    start: int = Field(1, ge=0)
+    count: int = Field(0, ge=0, le=BULK_ITEMS_MAX)
+    width: int = Field(6, ge=1, le=12)
+    status: Literal["Available", "Maintenance"] = "Available"  # A new copy can't be on loan / on hold yet
+
+class BookItemBulkResponse(BaseModel):
+    book_id: int
+    created: List[str]  # Barcodes, in order
+
 # --- External Import Schema ---
 class GoogleImportRequest(BaseModel):
     query: str # Can be ISBN or Title
+
+class BulkImportRequest(BaseModel):
+    isbns: List[str]  # ISBN-10 or -13, hyphens / spaces allowed
+
+class BulkImportResponse(BaseModel):
+    imported: List[BookResponse]
+    existing: List[BookResponse]  # Already in the catalog (by ISBN), left untouched
+    not_found: List[str]
+    failed: List[str]             # Google Books errors: safe to retry
+
+class CatalogImportError(BaseModel):
+    record: int                   # CSV line / MARC record number
+    isbn: Optional[str] = None
+    error: str
+
+class CatalogImportResponse(BaseModel):
+    records: int
+    titles_created: int
+    titles_matched: int           # Records whose ISBN was already in the catalog / earlier in the file
+    copies_created: int
+    error_count: int
+    errors: List[CatalogImportError]  # The first CATALOG_IMPORT_MAX_ERRORS
+    seconds: float
+    next_barcode: int             # Where the next import's --barcode-start should continue
     
 # --- Member Schemas ---
 class MemberCreate(BaseModel):
@@ -102,6 +142,7 @@ class ReservationResponse(BaseModel):
 # --- Fine Schemas ---
 class FineResponse(BaseModel):
     id: int
+    loan_id: Optional[int] = None
     amount: float
     amount_paid: float = 0.0  # <--- ADD THIS LINE
     reason: str
@@ -135,6 +176,25 @@ class PasswordChange(BaseModel):
 class LoanHistoryResponse(BaseModel):
     active_loans: List[LoanResponse]
     past_loans: List[LoanResponse]
+
+class OverviewLoan(LoanResponse):
+    book_id: Optional[int] = None
+    book_title: Optional[str] = None
+
+class MemberOverviewResponse(BaseModel):
+    """Member page in one request (GET /api/members/{id}/overview, GET /api/my/overview)"""
+    member: MemberResponse
+    active_loans: List[OverviewLoan]
+    past_loans: List[OverviewLoan]
+    reservations: List[ReservationResponse]
+    fines: List[FineResponse]
+    # Section sizes before the per-section limits
+    active_loans_total: int
+    past_loans_total: int
+    reservations_total: int
+    fines_total: int
+    unpaid_fines: int
+    unread_notifications: int
     
 class MemberStatusUpdate(BaseModel):
     status: str  # e.g., "Active", "Deactivated", "Blocked"
@@ -1,11 +1,17 @@
 from database import SessionLocal, engine, Base
 import models
+import content_recommendation
+import interaction_snapshot
+import google_books
 from passlib.context import CryptContext
 from datetime import date, timedelta, datetime
 from sqlalchemy import text
 import random
-import requests
-import time
+import asyncio
+import os
+import shutil
+from alembic import command
+from alembic.config import Config
 # Setup Password Hasher
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -32,28 +38,26 @@ SEARCH_QUERIES = [
     "intitle:Atomic Habits James Clear"
 ]
 
-def fetch_book_from_google(query):
-    """Helper to fetch data from Google Books API"""
-    try:
-        url = f"https://www.googleapis.com/books/v1/volumes?q={query}"
-        res = requests.get(url, timeout=5)
-        data = res.json()
-        if "items" not in data: return None
-        
-        info = data["items"][0]["volumeInfo"]
-        return {
-            "title": info.get("title"),
-            "author": ", ".join(info.get("authors", ["Unknown"])),
-            "isbn": next((id['identifier'] for id in info.get("industryIdentifiers", []) if id['type'] == 'ISBN_13'), str(random.randint(1000000000000, 9999999999999))),
-            "publisher": info.get("publisher"),
-            "publication_year": info.get("publishedDate", "")[:4] if info.get("publishedDate") else "2020",
-            "description": info.get("description", "No description available."),
-            "cover_image_url": info.get("imageLinks", {}).get("thumbnail"),
-            "genre": info.get("categories", ["General"])[0]
-        }
-    except Exception as e:
-        print(f"   [Error] Could not fetch {query}: {e}")
-        return None
+def fetch_books_from_google(queries):
+    """All the queries at once (google_books.py: concurrent, cached on disk, retried); None where nothing came back"""
+    async def fetch_all():
+        try:
+            return await google_books.fetch_books(queries)
+        finally:
+            await google_books.close()
+
+    books = []
+    for query, info in zip(queries, asyncio.run(fetch_all())):
+        if isinstance(info, Exception):
+            print(f"   [Error] Could not fetch {query}: {info}")
+            info = None
+        if info:
+            # Seed data wants every column filled
+            info["isbn"] = info["isbn"] or str(random.randint(1000000000000, 9999999999999))
+            info["publication_year"] = info["publication_year"] or "2020"
+            info["description"] = info["description"] or "No description available."
+        books.append(info)
+    return books
 
 
 def reset_db():
@@ -71,7 +75,14 @@ def reset_db():
         print(f"   (Note: Could not kill connections: {e})")
 
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    command.upgrade(Config(os.path.join(os.path.dirname(__file__), "alembic.ini")), "head")
+    # The content index describes the old catalog (ids are reused): rebuilt after seeding
+    if os.path.exists(content_recommendation.CONTENT_INDEX_PATH):
+        os.remove(content_recommendation.CONTENT_INDEX_PATH)
+    # Same for the exported loans / views: ids start over, so the next training run exports afresh
+    shutil.rmtree(interaction_snapshot.SNAPSHOT_DIR, ignore_errors=True)
     print("✅ Database reset complete.")
 
 def seed_db():
@@ -140,9 +151,8 @@ def seed_db():
             db.commit()
             
         books_created = []
-        for query in SEARCH_QUERIES:
-            print(f"   -> Fetching: {query}")
-            book_data = fetch_book_from_google(query)
+        print(f"   -> Fetching {len(SEARCH_QUERIES)} titles from Google Books...")
+        for book_data in fetch_books_from_google(SEARCH_QUERIES):
             if book_data:
                 # Check for existing title to avoid duplicates
                 existing = db.query(models.Book).filter(models.Book.title == book_data['title']).first()
@@ -158,7 +168,6 @@ def seed_db():
                         item = models.BookItem(barcode=barcode, book_id=book.id, status="Available")
                         db.add(item)
                     db.commit()
-            time.sleep(0.2) # Minor delay for API rate limits
 
         print(f"✅ Created {len(books_created)} unique book titles.")
 
@@ -319,6 +328,16 @@ def seed_db():
     finally:
         db.close()
 
+def build_content_index():
+    """API workers don't build the content index themselves (see content_recommendation.py)"""
+    db = SessionLocal()
+    try:
+        content_recommendation.build_from_db(db).save()
+    finally:
+        db.close()
+    print(f"✅ Content index written to {content_recommendation.CONTENT_INDEX_PATH}")
+
 if __name__ == "__main__":
     reset_db()
-    seed_db()
\ No newline at end of file
+    seed_db()
+    build_content_index()
\ No newline at end of file
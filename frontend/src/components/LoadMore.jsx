@@ -0,0 +1,17 @@
+// "Showing N of M" under a list that came back cut to a page, with a button for the next slice
+export default function LoadMore({ shown, total, onLoadMore, loading }) {
+  if (shown >= total) return null;
+
+  return (
+    <div className="p-3 flex justify-between items-center text-xs text-gray-500 border-t border-gray-100">
+      <span>Showing {shown} of {total}</span>
+      <button
+        onClick={onLoadMore}
+        disabled={loading}
+        className="text-blue-600 hover:underline font-medium disabled:opacity-50"
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+}
@@ -4,27 +4,72 @@ import { Bell } from 'lucide-react';
 
 export default function Notifications() {
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null); // X-Next-Cursor of the last page loaded
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isOpen, setIsOpen] = useState(false);
   const dropdownRef = useRef(null);
 
-  // Fetch notifications on mount
+  // The inbox is paged (newest 20 first), so the badge comes from the server-side count
+  const fetchUnreadCount = async () => {
+    try {
+      const res = await api.get('/my/notifications/unread_count');
+      setUnreadCount(res.data.unread);
+    } catch (error) {
+      // Silent fail (don't annoy user if notifs fail)
+      console.error("Notif error", error);
+    }
+  };
+
+  const fetchNotifs = async (cursor = null) => {
+    try {
+      const res = await api.get('/my/notifications', { params: cursor ? { cursor } : {} });
+      setNotifications(prev => (cursor ? [...prev, ...res.data] : res.data));
+      setNextCursor(res.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error("Notif error", error);
+    }
+  };
+
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    await fetchNotifs(nextCursor);
+    setLoadingMore(false);
+  };
+
+  const handleMarkAsRead = async (notif) => {
+    if (notif.is_read) return;
+    try {
+      await api.patch(`/my/notifications/${notif.id}/read`);
+      setNotifications(prev => prev.map(n => (n.id === notif.id ? { ...n, is_read: true } : n)));
+      setUnreadCount(count => Math.max(count - 1, 0));
+    } catch (error) {
+      console.error("Notif error", error);
+    }
+  };
+
+  const handleMarkAllRead = async () => {
+    try {
+      await api.post('/my/notifications/read-all');
+      setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
+      setUnreadCount(0);
+    } catch (error) {
+      console.error("Notif error", error);
+    }
+  };
+
+  // Badge on mount, then poll the (cheap) count every 30 seconds
   useEffect(() => {
-    const fetchNotifs = async () => {
-      try {
-        const res = await api.get('/my/notifications');
-        setNotifications(res.data);
-      } catch (error) {
-        // Silent fail (don't annoy user if notifs fail)
-        console.error("Notif error", error);
-      }
-    };
-    fetchNotifs();
-    
-    // Optional: Poll every 30 seconds
-    const interval = setInterval(fetchNotifs, 30000);
+    fetchUnreadCount();
+    const interval = setInterval(fetchUnreadCount, 30000);
     return () => clearInterval(interval);
   }, []);
 
+  // First page whenever the dropdown opens
+  useEffect(() => {
+    if (isOpen) fetchNotifs();
+  }, [isOpen]);
+
   // Close dropdown if clicking outside
   useEffect(() => {
     const handleClickOutside = (event) => {
@@ -36,8 +81,6 @@ export default function Notifications() {
     return () => document.removeEventListener("mousedown", handleClickOutside);
   }, []);
 
-  const unreadCount = notifications.filter(n => !n.is_read).length;
-
   return (
     <div className="relative" ref={dropdownRef}>
       <button 
@@ -56,7 +99,7 @@ export default function Notifications() {
             <h3 className="font-bold text-gray-700 text-sm">Notifications</h3>
             {unreadCount > 0 && (
               <button 
-                onClick={handleMarkAllRead} // Create this handler to call /read-all
+                onClick={handleMarkAllRead}
                 className="text-xs text-blue-600 hover:underline font-medium"
               >
                 Mark all as read
@@ -72,7 +115,7 @@ export default function Notifications() {
               notifications.map((notif) => (
                 <div 
                   key={notif.id} 
-                  onClick={() => handleMarkAsRead(notif.id)} // <--- NEW HANDLER
+                  onClick={() => handleMarkAsRead(notif)}
                   className={`p-4 border-b border-gray-50 cursor-pointer transition ${
                     notif.is_read ? 'bg-white opacity-60' : 'bg-blue-50 hover:bg-blue-100'
                   }`}
@@ -86,6 +129,15 @@ export default function Notifications() {
                 </div>
               ))
             )}
+            {nextCursor && (
+              <button
+                onClick={handleLoadMore}
+                disabled={loadingMore}
+                className="w-full p-3 text-xs text-blue-600 hover:bg-gray-50 font-medium disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load older notifications'}
+              </button>
+            )}
           </div>
         </div>
       )}
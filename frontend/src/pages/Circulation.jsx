@@ -43,7 +43,7 @@ export default function Circulation() {
     e.preventDefault();
     if (!memberQuery) return;
     try {
-      const res = await api.get(`/members/search?q=${memberQuery}`);
+      const res = await api.get('/members/search', { params: { q: memberQuery } });
       setFoundMembers(res.data);
       if (res.data.length === 0) toast("No members found");
     } catch (error) {
@@ -160,7 +160,7 @@ export default function Circulation() {
   const handleReturnMemberSearch = async (e) => {
     e.preventDefault();
     if (!retMemQuery) return;
-    const res = await api.get(`/members/search?q=${retMemQuery}`);
+    const res = await api.get('/members/search', { params: { q: retMemQuery } });
     setRetMemResults(res.data);
   };
 
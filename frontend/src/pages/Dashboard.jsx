@@ -29,18 +29,16 @@ export default function Dashboard() {
           const res = await api.get('/reports/stats');
           setStats(res.data);
         } else {
-          // Fetch Member Stats (Loans + Fines)
-          const [loansRes, finesRes] = await Promise.all([
-            api.get('/my/loans'),
-            api.get('/my/fines')
-          ]);
+          // Fetch Member Stats (Loans + Fines): totals only, no rows
+          const { data } = await api.get('/my/overview', {
+            params: { loans_limit: 0, history_limit: 0, reservations_limit: 0, fines_limit: 0 }
+          });
           
           setStats({
-            active_loans: loansRes.data.active_loans.length,
-            past_loans: loansRes.data.past_loans.length,
-            unpaid_fines: finesRes.data.length,
-            // Calculate total debt
-            total_debt: finesRes.data.reduce((sum, f) => sum + (f.amount - f.amount_paid), 0)
+            active_loans: data.active_loans_total,
+            past_loans: data.past_loans_total,
+            unpaid_fines: data.unpaid_fines,
+            total_debt: data.member.total_fines_due
           });
         }
       } catch (error) {
@@ -16,6 +16,7 @@ export default function ManageBook() {
   
   // Add Item State
   const [newBarcode, setNewBarcode] = useState('');
+  const [bulk, setBulk] = useState({ prefix: '', start: 1, count: 10 });
 
   // --- Fetch Data ---
   const loadData = async () => {
@@ -87,6 +88,24 @@ export default function ManageBook() {
     }
   };
 
+  // Many copies in one request: prefix + number range (e.g. BR2-000041 .. BR2-000080)
+  const handleAddBulk = async (e) => {
+    e.preventDefault();
+    if (!bulk.prefix || bulk.count < 1) return;
+    try {
+      const res = await api.post(`/books/${id}/items/bulk`, {
+        prefix: bulk.prefix, start: Number(bulk.start), count: Number(bulk.count)
+      });
+      toast.success(`${res.data.created.length} copies added to inventory`);
+      setBulk({ ...bulk, start: Number(bulk.start) + res.data.created.length });
+      loadData();
+    } catch (error) {
+      // 422 (count / status out of range) comes back as a list of validation errors
+      const detail = error.response?.data?.detail;
+      toast.error(typeof detail === 'string' ? detail : "Failed to add copies (at most 1000 per batch)");
+    }
+  };
+
   const handleDeleteItem = async (barcode) => {
     if (!window.confirm(`Permanently delete item ${barcode}?`)) return;
     try {
@@ -204,6 +223,30 @@ export default function ManageBook() {
                   <Plus size={18} /> Add Item
                 </button>
               </form>
+              <form onSubmit={handleAddBulk} className="flex gap-2 mt-3">
+                <input 
+                  type="text" 
+                  placeholder="Barcode prefix (e.g. BR2-)" 
+                  className="flex-1 border p-2 rounded"
+                  value={bulk.prefix}
+                  onChange={e => setBulk({ ...bulk, prefix: e.target.value })}
+                />
+                <input 
+                  type="number" min="0" title="First number"
+                  className="w-24 border p-2 rounded"
+                  value={bulk.start}
+                  onChange={e => setBulk({ ...bulk, start: e.target.value })}
+                />
+                <input 
+                  type="number" min="1" max="1000" title="Copies"
+                  className="w-20 border p-2 rounded"
+                  value={bulk.count}
+                  onChange={e => setBulk({ ...bulk, count: e.target.value })}
+                />
+                <button type="submit" className="bg-green-600 text-white px-4 py-2 rounded hover:bg-green-700 flex items-center gap-2">
+                  <Plus size={18} /> Add Copies
+                </button>
+              </form>
             </div>
 
             {/* Items List */}
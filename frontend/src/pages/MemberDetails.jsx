@@ -3,6 +3,9 @@ import { useParams, useNavigate } from 'react-router-dom';
 import api from '../api';
 import toast from 'react-hot-toast';
 import { User, BookOpen, Clock, AlertCircle, ArrowLeft, RefreshCw, Repeat, Trash2 } from 'lucide-react';
+import LoadMore from '../components/LoadMore';
+
+const PAGE = 50; // Holds / fines per "Load more"
 
 export default function MemberDetails() {
   const { id } = useParams(); // Get Member ID from URL
@@ -12,23 +15,22 @@ export default function MemberDetails() {
   const [loans, setLoans] = useState({ active_loans: [], past_loans: [] });
   const [reservations, setReservations] = useState([]);
   const [fines, setFines] = useState([]);
+  const [totals, setTotals] = useState({ reservations: 0, fines: 0, unpaid_fines: 0 });
+  const [loadingMore, setLoadingMore] = useState(null); // Section being paged
   const [loading, setLoading] = useState(true);
   const [payFineId, setPayFineId] = useState(null); // Which fine are we paying?
   const [payAmount, setPayAmount] = useState('');
   // Fetch all data for this member
   const fetchData = async () => {
     try {
-      const [memRes, loanRes, resRes, fineRes] = await Promise.all([
-        api.get(`/members/${id}`),
-        api.get(`/members/${id}/loans`),
-        api.get(`/members/${id}/reservations`),
-        api.get(`/members/${id}/fines_details`)
-      ]);
-      
-      setMember(memRes.data);
-      setLoans(loanRes.data);
-      setReservations(resRes.data);
-      setFines(fineRes.data);
+      // One request for the whole page (profile, loans, holds, fines); loan history isn't shown here
+      const { data } = await api.get(`/members/${id}/overview`, { params: { history_limit: 0 } });
+
+      setMember(data.member);
+      setLoans({ active_loans: data.active_loans, past_loans: data.past_loans });
+      setReservations(data.reservations);
+      setFines(data.fines);
+      setTotals({ reservations: data.reservations_total, fines: data.fines_total, unpaid_fines: data.unpaid_fines });
     } catch (error) {
       toast.error("Failed to load member details");
       navigate('/members'); // Go back if failed
@@ -37,6 +39,30 @@ export default function MemberDetails() {
     }
   };
 
+  // Next slice of holds or fines only (the other sections are skipped with limit 0)
+  const loadMore = async (section) => {
+    const params = { loans_limit: 0, history_limit: 0, reservations_limit: 0, fines_limit: 0 };
+    if (section === 'reservations') {
+      Object.assign(params, { reservations_limit: PAGE, reservations_offset: reservations.length });
+    } else {
+      Object.assign(params, { fines_limit: PAGE, fines_offset: fines.length });
+    }
+    setLoadingMore(section);
+    try {
+      const { data } = await api.get(`/members/${id}/overview`, { params });
+      if (section === 'reservations') {
+        setReservations(prev => [...prev, ...data.reservations]);
+      } else {
+        setFines(prev => [...prev, ...data.fines]);
+      }
+      setTotals({ reservations: data.reservations_total, fines: data.fines_total, unpaid_fines: data.unpaid_fines });
+    } catch (error) {
+      toast.error("Failed to load more");
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
   const handlePayFine = async (e) => {
     e.preventDefault();
     try {
@@ -120,8 +146,9 @@ export default function MemberDetails() {
         </div>
         <div className="text-right">
           <div className="text-sm text-gray-500">Unpaid Fines</div>
-          <div className={`text-2xl font-bold ${fines.some(f => f.status === 'Unpaid') ? 'text-red-600' : 'text-gray-800'}`}>
-            ${fines.filter(f => f.status !== 'Paid').reduce((sum, f) => sum + (f.amount - f.amount_paid), 0).toFixed(2)}
+          {/* From the server-side totals: the fines list below may only hold the first page */}
+          <div className={`text-2xl font-bold ${totals.unpaid_fines > 0 ? 'text-red-600' : 'text-gray-800'}`}>
+            ${member.total_fines_due.toFixed(2)}
           </div>
           <button 
             onClick={() => navigate('/circulation')}
@@ -148,6 +175,7 @@ export default function MemberDetails() {
                       <div className="font-mono text-xs bg-gray-100 px-2 py-1 rounded inline-block mb-1">
                         {loan.book_item_id}
                       </div>
+                      {loan.book_title && <div className="font-semibold text-gray-800">{loan.book_title}</div>}
                       <div className="text-sm font-medium">Due: {loan.due_date}</div>
                       <div className="text-xs text-gray-500">Renewals: {loan.renewal_count}/2</div>
                     </div>
@@ -185,7 +213,7 @@ export default function MemberDetails() {
                   <tbody className="divide-y divide-gray-100">
                     {reservations.map(res => (
                       <tr key={res.id}>
-                        <td className="p-3">#{res.book_id}</td>
+                        <td className="p-3">{res.book_title || `#${res.book_id}`}</td>
                         <td className="p-3">
                           <span className={`text-xs px-2 py-1 rounded ${res.status === 'Fulfilled' ? 'bg-green-100 text-green-800' : 'bg-yellow-100 text-yellow-800'}`}>
                             {res.status}
@@ -198,6 +226,12 @@ export default function MemberDetails() {
                     ))}
                   </tbody>
                 </table>
+                <LoadMore
+                  shown={reservations.length}
+                  total={totals.reservations}
+                  onLoadMore={() => loadMore('reservations')}
+                  loading={loadingMore === 'reservations'}
+                />
               </div>
             )}
           </div>
@@ -249,6 +283,12 @@ export default function MemberDetails() {
                   ))}
                 </tbody>
               </table>
+              <LoadMore
+                shown={fines.length}
+                total={totals.fines}
+                onLoadMore={() => loadMore('fines')}
+                loading={loadingMore === 'fines'}
+              />
             </div>
           </div>
             {/* --- NEW: Member Danger Zone --- */}
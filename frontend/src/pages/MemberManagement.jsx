@@ -16,8 +16,8 @@ export default function MemberManagement() {
   const fetchMembers = async (searchQ = '') => {
     try {
       setLoading(true);
-      // Backend: %{q}% matches everything if q is empty string
-      const res = await api.get(`/members/search?q=${searchQ}`);
+      // Empty q: the newest members
+      const res = await api.get('/members/search', { params: { q: searchQ } });
       setMembers(res.data);
     } catch (error) {
       console.error(error);
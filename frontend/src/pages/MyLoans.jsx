@@ -2,20 +2,25 @@ import { useState, useEffect } from 'react';
 import api from '../api';
 import toast from 'react-hot-toast';
 import { Clock, RefreshCw, CheckCircle, AlertTriangle, BookOpen } from 'lucide-react';
+import LoadMore from '../components/LoadMore';
+
+// Rows per "Load more" (the first page comes with the overview's default limits)
+const HISTORY_PAGE = 20;
+const RESERVATIONS_PAGE = 50;
 
 export default function MyLoans() {
   const [loans, setLoans] = useState({ active_loans: [], past_loans: [] });
   const [loading, setLoading] = useState(true);
   const [reservations, setReservations] = useState([]);
+  const [totals, setTotals] = useState({ past_loans: 0, reservations: 0 });
+  const [loadingMore, setLoadingMore] = useState(null); // Section being paged
 
   const fetchData = async () => {
     try {
-      const [loansRes, resRes] = await Promise.all([
-        api.get('/my/loans'),
-        api.get('/my/reservations')
-      ]);
-      setLoans(loansRes.data);
-      setReservations(resRes.data);
+      const { data } = await api.get('/my/overview', { params: { fines_limit: 0 } });
+      setLoans({ active_loans: data.active_loans, past_loans: data.past_loans });
+      setReservations(data.reservations);
+      setTotals({ past_loans: data.past_loans_total, reservations: data.reservations_total });
     } catch (error) {
       toast.error("Failed to load data");
     } finally {
@@ -23,6 +28,30 @@ export default function MyLoans() {
     }
   };
 
+  // Next slice of one section only (the other sections are skipped with limit 0)
+  const loadMore = async (section) => {
+    const params = { loans_limit: 0, history_limit: 0, reservations_limit: 0, fines_limit: 0 };
+    if (section === 'history') {
+      Object.assign(params, { history_limit: HISTORY_PAGE, history_offset: loans.past_loans.length });
+    } else {
+      Object.assign(params, { reservations_limit: RESERVATIONS_PAGE, reservations_offset: reservations.length });
+    }
+    setLoadingMore(section);
+    try {
+      const { data } = await api.get('/my/overview', { params });
+      if (section === 'history') {
+        setLoans(prev => ({ ...prev, past_loans: [...prev.past_loans, ...data.past_loans] }));
+      } else {
+        setReservations(prev => [...prev, ...data.reservations]);
+      }
+      setTotals({ past_loans: data.past_loans_total, reservations: data.reservations_total });
+    } catch (error) {
+      toast.error("Failed to load more");
+    } finally {
+      setLoadingMore(null);
+    }
+  };
+
   useEffect(() => {
     fetchData();
   }, []);
@@ -32,7 +61,7 @@ export default function MyLoans() {
     try {
       await api.post(`/loans/${loanId}/renew`);
       toast.success("Book Renewed! Due date extended.", { id: toastId });
-      fetchLoans(); // Refresh data to show new date
+      fetchData(); // Refresh data to show new date
     } catch (error) {
       toast.error(error.response?.data?.detail || "Renewal Failed", { id: toastId });
     }
@@ -163,6 +192,12 @@ export default function MyLoans() {
               )}
             </tbody>
           </table>
+          <LoadMore
+            shown={loans.past_loans.length}
+            total={totals.past_loans}
+            onLoadMore={() => loadMore('history')}
+            loading={loadingMore === 'history'}
+          />
         </div>
       </div>
       {/* --- Section 3: Reservations --- */}
@@ -187,7 +222,7 @@ export default function MyLoans() {
               ) : (
                 reservations.map(res => (
                   <tr key={res.id} className="border-b hover:bg-gray-50">
-                    <td className="p-4">#{res.book_id}</td>
+                    <td className="p-4">{res.book_title || `#${res.book_id}`}</td>
                     <td className="p-4">{new Date(res.reservation_date).toLocaleDateString()}</td>
                     <td className="p-4">
                       <div className="flex flex-col">
@@ -219,6 +254,12 @@ export default function MyLoans() {
               )}
             </tbody>
           </table>
+          <LoadMore
+            shown={reservations.length}
+            total={totals.reservations}
+            onLoadMore={() => loadMore('reservations')}
+            loading={loadingMore === 'reservations'}
+          />
         </div>
       </div>
     </div>